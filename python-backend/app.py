@@ -1,152 +1,772 @@
 #!/usr/bin/env python3
-from flask import Flask, request, send_file, jsonify
+from flask import Flask, Response, request, send_file, jsonify
 import logging
 import os
 import sys
 import json
+import multiprocessing
 import tempfile
 import argparse
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
-from aws_utils import get_instance_metrics
-from azure_utils import get_azure_metrics
-from report_generator import generate_pdf_report
+# aws_utils (boto3), azure_utils, metric_series (numpy) and report_generator
+# (reportlab, matplotlib) are imported where they are first used, so --test, /health and /metrics
+# start quickly and each report loads only the modules it needs
+from chart_renderer import CHART_FORMAT
+from client_cache import credentials_fingerprint
+from result_cache import get_report_cache, make_report_key
+from report_jobs import FAILED, SUCCEEDED, JobQueueFull, get_job_manager, remove_file
+from instrumentation import count, current_trace, start_trace, trace_path, write_trace
+from service_metrics import CONTENT_TYPE, REPORTS_IN_FLIGHT, Gauge, register, render_metrics, track_report
+from report_scheduler import REPORT_SCHEDULE_FILE, ReportScheduler, load_schedule_file, period_start
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Reports generated at the same time in --manifest batch mode
+REPORT_BATCH_CONCURRENCY = int(os.environ.get('REPORT_BATCH_CONCURRENCY', '4'))
+
+# Report processes in --worker mode; the Node bridge only overrides this when
+# PYTHON_REPORT_WORKERS is set, so the default lives here alone
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '2'))
+
 app = Flask(__name__)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'service': 'cloud-report-generator'})
 
+register(Gauge('report_jobs_pending', 'Report jobs queued or running in the job API.',
+               function=lambda: get_job_manager().pending_count()))
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Publish report, cloud API and process metrics in the Prometheus text format."""
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+@app.route('/discover-resources', methods=['POST'])
+def discover_aws_resources():
+    """Stream the EC2/RDS instances of an AWS account as newline-delimited JSON."""
+    data = request.json or {}
+    credentials = data.get('credentials', {})
+    aws_access_key = credentials.get('accessKeyId')
+    aws_secret_key = credentials.get('secretAccessKey')
+
+    if not aws_access_key or not aws_secret_key:
+        return jsonify({'error': 'AWS credentials are required'}), 400
+
+    from aws_utils import discover_resources
+    
+    def generate():
+        for resource in discover_resources(
+            aws_access_key,
+            aws_secret_key,
+            regions=data.get('regions'),
+            service_types=tuple(data.get('serviceTypes', ['EC2', 'RDS'])),
+            states=data.get('states'),
+            tags=data.get('tags')
+        ):
+            yield json.dumps(resource) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
 @app.route('/generate-report', methods=['POST'])
 def generate_report():
+    temp_path = None
     try:
         # Parse request data
         data = request.json
         
-        # Extract required parameters
+        # Validate inputs
+        error = validate_report_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
         cloud_provider = data.get('cloudProvider', 'AWS')
         report_type = data.get('reportType', 'utilization')
-        resources = data.get('resources', [])
         
-        if cloud_provider.upper() == 'AWS':
-            credentials = data.get('credentials', {})
-            aws_access_key = credentials.get('accessKeyId')
-            aws_secret_key = credentials.get('secretAccessKey')
-            # Try to get accountName from multiple potential locations
-            account_name = data.get('accountName', 
-                             credentials.get('accountName', 
-                                 data.get('name', 'AWS Account')))
-            
-            # Validate inputs
-            if not aws_access_key or not aws_secret_key:
-                return jsonify({'error': 'AWS credentials are required'}), 400
-            
-            if not resources and report_type == 'utilization':
-                return jsonify({'error': 'At least one resource must be selected for utilization reports'}), 400
-            
-            if report_type == 'utilization':
-                frequency = data.get('frequency', 'daily')
-                period_days = 1 if frequency == 'daily' else 7
-                
-                # Get metrics data for selected resources
-                logger.info(f"Fetching AWS metrics for {len(resources)} resources")
-                metrics_data = get_instance_metrics(aws_access_key, aws_secret_key, resources, period_days)
-                
-                if not metrics_data:
-                    return jsonify({'error': 'Failed to get metrics data'}), 500
-                
-                # Generate the PDF report
-                logger.info("Generating PDF report")
-                pdf_data = generate_pdf_report(account_name, metrics_data, cloud_provider, report_type)
-            
-            else:  # billing report
-                month = data.get('month', datetime.now().month)
-                year = data.get('year', datetime.now().year)
-                
-                # Generate billing report
-                logger.info(f"Generating AWS billing report for {month}/{year}")
-                # Stub for billing report - would use AWS Cost Explorer API in a real implementation
-                pdf_data = generate_pdf_report(account_name, [], cloud_provider, report_type, month=month, year=year)
-                
-        elif cloud_provider.upper() == 'AZURE':
-            credentials = data.get('credentials', {})
-            client_id = credentials.get('clientId')
-            client_secret = credentials.get('clientSecret')
-            tenant_id = credentials.get('tenantId')
-            subscription_id = credentials.get('subscriptionId')
-            # Try to get accountName from multiple potential locations
-            account_name = data.get('accountName', 
-                             credentials.get('accountName', 
-                                 data.get('name', 'Azure Account')))
-            
-            # Validate inputs
-            if not client_id or not client_secret or not tenant_id or not subscription_id:
-                return jsonify({'error': 'Azure credentials are required'}), 400
-            
-            if not resources and report_type == 'utilization':
-                return jsonify({'error': 'At least one resource must be selected for utilization reports'}), 400
-            
-            if report_type == 'utilization':
-                frequency = data.get('frequency', 'daily')
-                period_days = 1 if frequency == 'daily' else 7
-                
-                # Get metrics data for selected resources
-                logger.info(f"Fetching Azure metrics for {len(resources)} resources")
-                metrics_data = get_azure_metrics(client_id, client_secret, tenant_id, subscription_id, resources, period_days)
-                
-                if not metrics_data:
-                    return jsonify({'error': 'Failed to get metrics data'}), 500
-                
-                # Generate the PDF report
-                logger.info("Generating PDF report")
-                pdf_data = generate_pdf_report(account_name, metrics_data, cloud_provider, report_type)
-            
-            else:  # billing report
-                month = data.get('month', datetime.now().month)
-                year = data.get('year', datetime.now().year)
-                
-                # Generate billing report
-                logger.info(f"Generating Azure billing report for {month}/{year}")
-                # Stub for billing report - would use Azure Cost Management API in a real implementation
-                pdf_data = generate_pdf_report(account_name, [], cloud_provider, report_type, month=month, year=year)
-        else:
-            return jsonify({'error': f'Unsupported cloud provider: {cloud_provider}'}), 400
-            
-        # Create a temporary file to store the PDF
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.pdf')
-        os.close(temp_fd)
-        
-        with open(temp_path, 'wb') as f:
-            f.write(pdf_data)
+        # Generate the PDF report into a temporary file
+        logger.info(f"Generating {cloud_provider} {report_type} report")
+        temp_path = create_report_path()
+        with start_trace() as trace:
+            generate_report_data(data, output=temp_path)
+        logger.info(f"Report trace: {json.dumps(trace.summary())}")
         
         # Generate the report filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{cloud_provider.lower()}_{report_type}_report_{timestamp}.pdf"
         
-        # Return the PDF file
-        return send_file(
-            temp_path,
+        # Clean up the temp file right away; the open handle keeps the PDF
+        # readable until the response has been sent, then closing frees it
+        report_file = open(temp_path, 'rb')
+        remove_file(temp_path)
+        
+        # Return the PDF file, with the stage timings and API calls of the report
+        response = send_file(
+            report_file,
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=filename,
-            # Clean up the temp file after sending
-            attachment_filename=filename
+            download_name=filename
         )
+        response.headers['X-Report-Trace'] = json.dumps(trace.summary(), separators=(',', ':'))
+        return response
     
     except Exception as e:
         logger.error(f"Error generating report: {str(e)}")
+        if temp_path is not None:
+            remove_file(temp_path)
         return jsonify({'error': f'Failed to generate report: {str(e)}'}), 500
 
+def validate_report_request(data):
+    """Return an error message for an invalid report request, or None when it can be generated."""
+    cloud_provider = data.get('cloudProvider', 'AWS')
+    report_type = data.get('reportType', 'utilization')
+    credentials = data.get('credentials', {})
+    
+    if cloud_provider.upper() == 'AWS':
+        if not credentials.get('accessKeyId') or not credentials.get('secretAccessKey'):
+            return 'AWS credentials are required'
+    elif cloud_provider.upper() == 'AZURE':
+        if not all(credentials.get(key) for key in ('clientId', 'clientSecret', 'tenantId', 'subscriptionId')):
+            return 'Azure credentials are required'
+    else:
+        return f'Unsupported cloud provider: {cloud_provider}'
+    
+    if not data.get('resources') and report_type == 'utilization':
+        return 'At least one resource must be selected for utilization reports'
+    
+    return None
+
+def report_job_response(job):
+    """Return the JSON body describing a report job, with links to poll and download it."""
+    body = job.to_dict()
+    body['statusUrl'] = f'/reports/{job.id}'
+    body['downloadUrl'] = f'/reports/{job.id}/download'
+    return body
+
+@app.route('/reports', methods=['POST'])
+def submit_report():
+    """
+    Queue a report for generation and return its job immediately.
+    
+    Takes the same body as /generate-report. Poll GET /reports/<id> for the
+    status, progress and trace summary, then fetch the PDF from
+    GET /reports/<id>/download and the full trace from GET /reports/<id>/trace.
+    """
+    data = request.json or {}
+    
+    error = validate_report_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    cloud_provider = data.get('cloudProvider', 'AWS')
+    report_type = data.get('reportType', 'utilization')
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"{cloud_provider.lower()}_{report_type}_report_{timestamp}.pdf"
+    
+    def run(output_path, progress):
+        generate_report_data(data, output=output_path, progress=progress)
+    
+    output_path = create_report_path()
+    try:
+        job = get_job_manager().submit(run, output_path, filename)
+    except JobQueueFull as e:
+        remove_file(output_path)
+        response = jsonify({'error': f'Report queue is full: {str(e)}'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    logger.info(f"Queued report job {job.id} ({cloud_provider} {report_type})")
+    return jsonify(report_job_response(job)), 202
+
+@app.route('/reports/<job_id>', methods=['GET'])
+def report_status(job_id):
+    """Return the status and progress of a report job."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired report job'}), 404
+    return jsonify(report_job_response(job))
+
+@app.route('/reports/<job_id>/trace', methods=['GET'])
+def report_trace(job_id):
+    """Return the full per-stage timing and API-call trace of a report job."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired report job'}), 404
+    if job.trace is None:
+        return jsonify(report_job_response(job)), 409
+    return jsonify(job.trace.to_dict())
+
+@app.route('/reports/<job_id>/download', methods=['GET'])
+def download_report(job_id):
+    """Stream the PDF of a finished report job from disk."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired report job'}), 404
+    if job.status == FAILED:
+        return jsonify({'error': f'Report generation failed: {job.error}'}), 500
+    if job.status != SUCCEEDED:
+        return jsonify(report_job_response(job)), 409
+    
+    return send_file(
+        job.output_path,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=job.filename,
+        conditional=True
+    )
+
+@app.route('/schedules', methods=['GET'])
+def list_schedules():
+    """List the recurring reports that are precomputed every period."""
+    return jsonify({'schedules': [report.to_dict() for report in get_report_scheduler().list()]})
+
+@app.route('/schedules', methods=['POST'])
+def add_schedule():
+    """
+    Register a recurring utilization report.
+    
+    Takes the same body as /generate-report plus an optional id. Shortly
+    after every daily or weekly period boundary (per 'frequency') its metrics
+    are prefetched and the report is rendered in the background, and
+    /generate-report and /reports serve requests for it from the result.
+    Definitions added here are kept in memory only, since they hold
+    credentials; use REPORT_SCHEDULE_FILE for definitions that survive restarts.
+    """
+    data = request.json or {}
+    
+    error = validate_report_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+    if data.get('reportType', 'utilization') != 'utilization':
+        return jsonify({'error': 'Only utilization reports can be scheduled'}), 400
+    if get_report_cache() is None:
+        return jsonify({'error': 'Scheduled reports need the result cache (RESULT_CACHE_DIR)'}), 400
+    
+    params = {key: value for key, value in data.items() if key != 'id'}
+    report = get_report_scheduler().add(params, data.get('id'))
+    return jsonify(report.to_dict()), 201
+
+@app.route('/schedules/<schedule_id>', methods=['DELETE'])
+def remove_schedule(schedule_id):
+    """Stop precomputing a recurring report."""
+    if not get_report_scheduler().remove(schedule_id):
+        return jsonify({'error': 'Unknown schedule'}), 404
+    return '', 204
+
+def create_report_path():
+    """Create an empty temporary file for a generated report and return its path."""
+    temp_fd, temp_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(temp_fd)
+    return temp_path
+
+def rendering_progress(progress):
+    """Adapt a progress(stage, fraction) callback to the PDF rendering half of a report."""
+    if progress is None:
+        return None
+    return lambda fraction: progress('rendering', 0.5 + 0.5 * fraction)
+
+def get_account_name(params, default):
+    """Return the account name of a report request, trying the locations clients put it in."""
+    credentials = params.get('credentials', {})
+    return params.get('accountName', credentials.get('accountName', params.get('name', default)))
+
+def get_period_days(params):
+    """Return the length of the reporting window in days for a utilization report request."""
+    return 1 if params.get('frequency', 'daily') == 'daily' else 7
+
+def normalize_report_request(params):
+    """Return the fields that identify a report, with credentials reduced to an irreversible fingerprint."""
+    cloud_provider = params.get('cloudProvider', 'AWS').upper()
+    report_type = params.get('reportType', 'utilization')
+    credentials = params.get('credentials', {})
+    
+    if cloud_provider == 'AWS':
+        fingerprint = credentials_fingerprint(credentials.get('accessKeyId'), credentials.get('secretAccessKey'))
+    else:
+        fingerprint = credentials_fingerprint(credentials.get('clientId'), credentials.get('clientSecret'),
+                                              credentials.get('tenantId'), credentials.get('subscriptionId'))
+    
+    normalized = {
+        'cloudProvider': cloud_provider,
+        'reportType': report_type,
+        'accountName': get_account_name(params, f'{cloud_provider.title()} Account'),
+        'credentials': fingerprint
+    }
+    
+    if report_type == 'utilization':
+        normalized['periodDays'] = get_period_days(params)
+        # Reports list resources in the requested order, repeats included
+        normalized['resources'] = list(params.get('resources', []))
+        normalized['chartFormat'] = CHART_FORMAT
+    else:
+        normalized['month'] = params.get('month', datetime.now().month)
+        normalized['year'] = params.get('year', datetime.now().year)
+    return normalized
+
+def report_cache_key(params):
+    """
+    Return the result cache key of a report request.
+    
+    The reporting window is truncated to the metric period for utilization
+    reports (and to the day for billing reports, whose cover shows the
+    generation date), so repeated requests within one period share a key.
+    """
+    from metric_series import get_metric_period
+    
+    normalized = normalize_report_request(params)
+    if normalized['reportType'] == 'utilization':
+        period = get_metric_period(normalized['periodDays'])
+    else:
+        period = 86400
+    
+    now = int(time.time())
+    return make_report_key(normalized, now - now % period)
+
+def scheduled_report_key(params, start):
+    """Return the result cache key of the report precomputed for a schedule's period starting at start."""
+    return make_report_key(dict(normalize_report_request(params), scheduled=True), start)
+
+def generate_report_data(params, output=None, progress=None):
+    """
+    Generate the PDF report described by a parameters dict.
+    
+    The report is written to output (a path or file object) when given,
+    otherwise its bytes are returned. progress, when given, is called with
+    the current stage and the fraction of the report completed. Finished
+    reports are kept in the result cache (see get_report_cache), so repeated
+    requests are copied from there instead of being generated again.
+    Every report is counted in the service metrics (see track_report).
+    """
+    with track_report(params.get('cloudProvider', 'AWS').upper(), params.get('reportType', 'utilization'),
+                      current_trace()):
+        return generate_cached_report(params, output, progress)
+
+def collection_failures():
+    """Return how many resources or series the collectors failed to fetch in the current report trace."""
+    trace = current_trace()
+    return trace.counters.get('collectionFailures', 0) if trace is not None else 0
+
+def generate_cached_report(params, output=None, progress=None):
+    """
+    Serve a report from the result cache or build and cache it; see generate_report_data.
+    
+    Reports missing resources or series that failed to collect (e.g. after
+    throttling or a network error) are returned but not cached, so the next
+    request tries again instead of getting the partial report until the
+    period ends.
+    """
+    cache = get_report_cache()
+    if cache is None:
+        return build_report(params, output, progress)
+    if current_trace() is None:
+        # Collection failures are counted on the report trace
+        with start_trace():
+            return generate_cached_report(params, output, progress)
+    
+    # A report precomputed for the current period of a schedule is served as is
+    if params.get('reportType', 'utilization') == 'utilization':
+        scheduled_key = scheduled_report_key(params, period_start(get_period_days(params)))
+        if output is None:
+            pdf_data = cache.get(scheduled_key)
+            if pdf_data is not None:
+                count('scheduledReportHits')
+                return pdf_data
+        elif cache.copy_to(scheduled_key, output):
+            logger.info("Serving precomputed scheduled report")
+            count('scheduledReportHits')
+            return output
+    
+    key = report_cache_key(params)
+    
+    if output is None:
+        pdf_data = cache.get(key)
+        if pdf_data is not None:
+            count('reportCacheHits')
+        else:
+            failures = collection_failures()
+            pdf_data = build_report(params, None, progress)
+            if collection_failures() == failures:
+                cache.put(key, pdf_data)
+        return pdf_data
+    
+    if cache.copy_to(key, output):
+        logger.info("Serving report from the result cache")
+        count('reportCacheHits')
+        return output
+    
+    failures = collection_failures()
+    build_report(params, output, progress)
+    if collection_failures() != failures:
+        logger.warning("Not caching a report with resources that failed to collect")
+    # Reports written to file objects cannot be read back, so only paths are cached
+    elif isinstance(output, (str, os.PathLike)):
+        cache.put_file(key, output)
+    return output
+
+def build_report(params, output=None, progress=None, metrics_data=None):
+    """
+    Collect the metrics of a report request and render its PDF; see generate_report_data.
+    
+    Utilization reports are rendered from metrics_data when it is given
+    (see collect_report_metrics) instead of collecting the metrics again.
+    """
+    from report_generator import generate_pdf_report
+    
+    cloud_provider = params.get('cloudProvider', 'AWS')
+    report_type = params.get('reportType', 'utilization')
+    
+    if cloud_provider.upper() == 'AWS':
+        account_name = get_account_name(params, 'AWS Account')
+    else:
+        account_name = get_account_name(params, 'Azure Account')
+    
+    if report_type != 'utilization':
+        month = int(params.get('month', datetime.now().month))
+        year = int(params.get('year', datetime.now().year))
+        logger.info(f"Generating {cloud_provider} billing report for {month}/{year}")
+        billing_data = None
+        # Azure Cost Management is not supported yet; its report says so
+        if cloud_provider.upper() == 'AWS':
+            from cost_explorer import get_billing_data
+            credentials = params.get('credentials', {})
+            if progress is not None:
+                progress('collecting costs', 0.0)
+            billing_data = get_billing_data(credentials.get('accessKeyId'), credentials.get('secretAccessKey'),
+                                            month, year)
+        return generate_pdf_report(account_name, [], cloud_provider, report_type, month=month, year=year,
+                                   output=output, progress=rendering_progress(progress),
+                                   billing_data=billing_data)
+    
+    if metrics_data is None:
+        if progress is not None:
+            progress('collecting metrics', 0.0)
+        metrics_data = collect_report_metrics(params)
+    
+    return generate_pdf_report(account_name, metrics_data, cloud_provider, report_type, chart_format=CHART_FORMAT,
+                               output=output, progress=rendering_progress(progress))
+
+def collect_report_metrics(params):
+    """Collect the metrics of the resources of a utilization report request."""
+    cloud_provider = params.get('cloudProvider', 'AWS')
+    resources = params.get('resources', [])
+    credentials = params.get('credentials', {})
+    period_days = get_period_days(params)
+    
+    # Get metrics data for selected resources
+    logger.info(f"Fetching {cloud_provider} metrics for {len(resources)} resources")
+    if cloud_provider.upper() == 'AWS':
+        from aws_utils import get_instance_metrics
+        metrics_data = get_instance_metrics(credentials.get('accessKeyId'), credentials.get('secretAccessKey'),
+                                            resources, period_days)
+    else:
+        from azure_utils import get_azure_metrics
+        metrics_data = get_azure_metrics(credentials.get('clientId'), credentials.get('clientSecret'),
+                                         credentials.get('tenantId'), credentials.get('subscriptionId'),
+                                         resources, period_days)
+    
+    if not metrics_data:
+        raise ValueError('Failed to get metrics data')
+    return metrics_data
+
+def prefetch_scheduled_report(params):
+    """Collect the metrics of a scheduled report ahead of time; see ReportScheduler."""
+    with start_trace('scheduled-prefetch') as trace:
+        metrics_data = collect_report_metrics(params)
+    logger.info(f"Prefetched scheduled report metrics: {json.dumps(trace.summary())}")
+    # A partial report would be served for the whole period; see generate_cached_report
+    if trace.counters.get('collectionFailures', 0):
+        raise ValueError(f"Failed to collect {int(trace.counters['collectionFailures'])} resources or series")
+    return metrics_data
+
+def render_scheduled_report(params, metrics_data, start):
+    """Render a scheduled report from its prefetched metrics into the result cache; see ReportScheduler."""
+    cache = get_report_cache()
+    if cache is None:
+        raise ValueError('Scheduled reports need the result cache (RESULT_CACHE_DIR)')
+    
+    output_path = create_report_path()
+    try:
+        with start_trace('scheduled-render') as trace:
+            failures = collection_failures()
+            build_report(params, output_path, metrics_data=metrics_data)
+            if collection_failures() != failures:
+                raise ValueError(f"Failed to collect {int(collection_failures() - failures)} resources or series")
+        cache.put_file(scheduled_report_key(params, start), output_path)
+    finally:
+        remove_file(output_path)
+    logger.info(f"Rendered scheduled report: {json.dumps(trace.summary())}")
+
+# Worker-mode report jobs submitted and not finished yet
+_worker_jobs = set()
+_worker_jobs_lock = threading.Lock()
+
+def reports_busy():
+    """Return whether on-demand reports are being generated, here or in the worker processes."""
+    with _worker_jobs_lock:
+        if _worker_jobs:
+            return True
+    return REPORTS_IN_FLIGHT.value() > 0
+
+_report_scheduler = None
+_report_scheduler_lock = threading.Lock()
+
+def get_report_scheduler():
+    """Return the process-wide ReportScheduler, loading REPORT_SCHEDULE_FILE and starting it on first use."""
+    global _report_scheduler
+    with _report_scheduler_lock:
+        if _report_scheduler is None:
+            _report_scheduler = ReportScheduler(prefetch_scheduled_report, render_scheduled_report,
+                                                get_period_days, is_busy=reports_busy)
+            if REPORT_SCHEDULE_FILE:
+                for schedule_id, params in load_schedule_file(REPORT_SCHEDULE_FILE):
+                    _report_scheduler.add(params, schedule_id)
+                logger.info(f"Loaded {len(_report_scheduler.list())} scheduled reports")
+            _report_scheduler.start()
+        return _report_scheduler
+
+def generate_report_file(params, output_path):
+    """
+    Generate the PDF report described by a parameters dict into output_path.
+    
+    The report's trace of stage timings and API calls is written beside it
+    (see instrumentation.trace_path) and returned.
+    """
+    with start_trace() as trace:
+        generate_report_data(params, output=output_path)
+    write_trace(trace, output_path)
+    return trace
+
+def run_worker_job(job):
+    """Run one worker-mode job and return its response message."""
+    job_id = job.get('id')
+    try:
+        params = job.get('params')
+        if params is None:
+            with open(job['paramsPath'], 'r') as f:
+                params = json.load(f)
+        
+        trace = generate_report_file(params, job['output'])
+        return {'id': job_id, 'success': True, 'output': job['output'], 'trace': trace.summary(),
+                'tracePath': trace_path(job['output'])}
+    except Exception as e:
+        logger.error(f"Error generating report for job {job_id}: {str(e)}")
+        return {'id': job_id, 'success': False, 'error': str(e)}
+
+def init_worker_process():
+    """Keep the protocol's stdout, which spawned workers inherit, free of anything they print."""
+    sys.stdout = sys.stderr
+
+def run_worker(workers):
+    """
+    Serve report jobs over stdin/stdout until stdin is closed.
+    
+    Every input line is a JSON job, either
+    {"id": ..., "params": {...} or "paramsPath": "...", "output": "..."} or
+    a control command {"id": ..., "command": "test" | "status"}, and every job
+    is answered with one JSON line carrying the same id. Reports run on a pool
+    of `workers` processes that stay alive between jobs, so imports and client
+    pools are reused; with a single worker they run on one thread of this
+    process, one at a time. Control commands are answered right away on the
+    reading thread, so they never wait behind a long report.
+    """
+    # Keep stdout for the protocol; anything else printed goes to stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+    
+    def respond(message):
+        with write_lock:
+            protocol_out.write(json.dumps(message) + '\n')
+            protocol_out.flush()
+    
+    # Spawned rather than forked: the scheduler thread may already hold locks
+    # by the time the pool starts its workers on the first job
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=init_worker_process)
+    else:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-job')
+    if REPORT_SCHEDULE_FILE:
+        get_report_scheduler()
+    logger.info(f"Report worker started with {workers} worker process(es)")
+    
+    try:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                respond({'id': None, 'success': False, 'error': f'Invalid job: {str(e)}'})
+                continue
+            
+            command = job.get('command')
+            if command == 'test':
+                respond({'id': job.get('id'), 'status': 'running', 'service': 'cloud-report-generator'})
+            elif command == 'status':
+                with _worker_jobs_lock:
+                    jobs = len(_worker_jobs)
+                respond({'id': job.get('id'), 'status': 'running', 'workers': workers, 'jobs': jobs})
+            elif command is not None:
+                respond({'id': job.get('id'), 'success': False, 'error': f'Unknown command: {command}'})
+            else:
+                future = executor.submit(run_worker_job, job)
+                with _worker_jobs_lock:
+                    _worker_jobs.add(future)
+                
+                def job_done(f, job_id=job.get('id')):
+                    with _worker_jobs_lock:
+                        _worker_jobs.discard(f)
+                    respond(f.result() if not f.exception()
+                            else {'id': job_id, 'success': False, 'error': str(f.exception())})
+                
+                future.add_done_callback(job_done)
+    finally:
+        executor.shutdown(wait=True)
+
+def load_manifest(manifest_path, output_dir):
+    """
+    Read a batch manifest and return its reports as (name, params, output_path) tuples.
+    
+    The manifest is a JSON object {"defaults": {...}, "reports": [...]} (or
+    just the list of reports). Every report is {"name": ..., "params": {...}
+    or "paramsPath": "...", "output": "..."}; its params are laid over the
+    defaults, so shared settings such as reportType are given once. Relative
+    paths are resolved against the manifest's directory (params) and
+    output_dir (outputs), and the output defaults to <name>.pdf.
+    """
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {'reports': manifest}
+    
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = manifest.get('defaults', {})
+    reports = []
+    names = set()
+    for index, entry in enumerate(manifest.get('reports', [])):
+        name = str(entry.get('name') or f'report-{index + 1}')
+        if name in names:
+            raise ValueError(f'Duplicate report name in manifest: {name}')
+        names.add(name)
+        
+        params = entry.get('params')
+        if params is None and entry.get('paramsPath'):
+            with open(os.path.join(base_dir, entry['paramsPath']), 'r') as f:
+                params = json.load(f)
+        params = {**defaults, **(params or {})}
+        
+        filename = entry.get('output') or ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name) + '.pdf'
+        reports.append((name, params, os.path.join(output_dir, filename)))
+    return reports
+
+def write_json_atomic(path, data):
+    """Write data as JSON to path through a temporary file, so readers never see a partial file."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+def run_batch_report(name, params, output_path):
+    """Generate one report of a batch and return its summary entry; failures are recorded, not raised."""
+    entry = {'name': name, 'output': output_path, 'cloudProvider': params.get('cloudProvider', 'AWS'),
+             'reportType': params.get('reportType', 'utilization')}
+    started = time.perf_counter()
+    try:
+        error = validate_report_request(params)
+        if error:
+            raise ValueError(error)
+        
+        # Write to a temporary name so only complete reports appear under output_path
+        partial_path = f"{output_path}.part"
+        try:
+            with start_trace(name) as trace:
+                generate_report_data(params, output=partial_path)
+            os.replace(partial_path, output_path)
+        finally:
+            remove_file(partial_path)
+        write_trace(trace, output_path)
+        
+        entry.update(success=True, trace=trace.summary(), tracePath=trace_path(output_path))
+    except Exception as e:
+        logger.error(f"Error generating batch report {name}: {str(e)}")
+        entry.update(success=False, error=str(e))
+    entry['seconds'] = round(time.perf_counter() - started, 3)
+    return entry
+
+def run_batch(manifest_path, output_dir, summary_path=None, concurrency=REPORT_BATCH_CONCURRENCY):
+    """
+    Generate every report of a manifest (see load_manifest) in this process.
+    
+    At most `concurrency` reports run at once. They share this process's
+    cached cloud clients, connection pools and chart rendering pool, so the
+    accounts of a nightly run pay for imports and pools once instead of
+    once per report. Each PDF is moved into place as soon as it is done and
+    the summary file (default <output_dir>/summary.json) is rewritten after
+    every report, so an interrupted run leaves its finished reports and an
+    accurate summary behind. Returns the summary.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = summary_path or os.path.join(output_dir, 'summary.json')
+    reports = load_manifest(manifest_path, output_dir)
+    
+    started = time.perf_counter()
+    summary = {
+        'manifest': os.path.abspath(manifest_path),
+        'startedAt': datetime.now().isoformat(),
+        'finishedAt': None,
+        'total': len(reports),
+        'succeeded': 0,
+        'failed': 0,
+        'seconds': 0.0,
+        'reports': []
+    }
+    write_json_atomic(summary_path, summary)
+    logger.info(f"Generating {len(reports)} batch reports with concurrency {concurrency}")
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch-report') as executor:
+            futures = [executor.submit(run_batch_report, *report) for report in reports]
+            for future in as_completed(futures):
+                entry = future.result()
+                summary['reports'].append(entry)
+                summary['succeeded' if entry['success'] else 'failed'] += 1
+                summary['seconds'] = round(time.perf_counter() - started, 3)
+                write_json_atomic(summary_path, summary)
+                logger.info(f"Batch report {entry['name']} {'done' if entry['success'] else 'failed'} "
+                            f"in {entry['seconds']}s ({len(summary['reports'])}/{len(reports)})")
+    finally:
+        # Only a batch that rendered reports has a chart pool to stop
+        if 'report_generator' in sys.modules:
+            sys.modules['report_generator'].shutdown_chart_executor()
+    
+    summary['finishedAt'] = datetime.now().isoformat()
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    write_json_atomic(summary_path, summary)
+    return summary
+
 def process_command_line():
     parser = argparse.ArgumentParser(description='Cloud Report Generator')
     parser.add_argument('--params', type=str, help='Path to parameters JSON file')
     parser.add_argument('--output', type=str, help='Path for output PDF')
     parser.add_argument('--test', action='store_true', help='Test the Python backend')
+    parser.add_argument('--worker', action='store_true',
+                        help='Serve report jobs as JSON lines over stdin/stdout')
+    parser.add_argument('--workers', type=int, default=REPORT_WORKERS,
+                        help='Number of worker processes in --worker mode')
+    parser.add_argument('--manifest', type=str, help='Path to a batch manifest of reports to generate')
+    parser.add_argument('--output-dir', type=str, default='.', help='Directory for the reports in --manifest mode')
+    parser.add_argument('--summary', type=str, help='Path for the summary in --manifest mode '
+                                                   '(default <output-dir>/summary.json)')
+    parser.add_argument('--concurrency', type=int, default=REPORT_BATCH_CONCURRENCY,
+                        help='Reports generated at the same time in --manifest mode')
     
     args = parser.parse_args()
     
@@ -154,60 +774,26 @@ def process_command_line():
         print(json.dumps({"status": "running", "service": "cloud-report-generator"}))
         return
     
+    if args.worker:
+        run_worker(max(1, args.workers))
+        return
+    
+    if args.manifest:
+        summary = run_batch(args.manifest, args.output_dir, args.summary, args.concurrency)
+        print(json.dumps({key: summary[key] for key in ('total', 'succeeded', 'failed', 'seconds')}))
+        if summary['failed']:
+            exit(1)
+        return
+    
     if args.params and args.output:
         try:
             with open(args.params, 'r') as f:
                 params = json.load(f)
             
-            cloud_provider = params.get('cloudProvider', 'AWS')
-            report_type = params.get('reportType', 'utilization')
-            resources = params.get('resources', [])
-            
-            if cloud_provider.upper() == 'AWS':
-                credentials = params.get('credentials', {})
-                aws_access_key = credentials.get('accessKeyId')
-                aws_secret_key = credentials.get('secretAccessKey')
-                # Try to get accountName from multiple potential locations
-                account_name = params.get('accountName', 
-                                  credentials.get('accountName', 
-                                      'AWS Account'))
-                
-                if report_type == 'utilization':
-                    frequency = params.get('frequency', 'daily')
-                    period_days = 1 if frequency == 'daily' else 7
-                    
-                    metrics_data = get_instance_metrics(aws_access_key, aws_secret_key, resources, period_days)
-                    pdf_data = generate_pdf_report(account_name, metrics_data, cloud_provider, report_type)
-                else:
-                    month = params.get('month', datetime.now().month)
-                    year = params.get('year', datetime.now().year)
-                    pdf_data = generate_pdf_report(account_name, [], cloud_provider, report_type, month=month, year=year)
-            else:
-                credentials = params.get('credentials', {})
-                client_id = credentials.get('clientId')
-                client_secret = credentials.get('clientSecret')
-                tenant_id = credentials.get('tenantId')
-                subscription_id = credentials.get('subscriptionId')
-                # Try to get accountName from multiple potential locations
-                account_name = params.get('accountName',
-                                  credentials.get('accountName',
-                                      'Azure Account'))
-                
-                if report_type == 'utilization':
-                    frequency = params.get('frequency', 'daily')
-                    period_days = 1 if frequency == 'daily' else 7
-                    
-                    metrics_data = get_azure_metrics(client_id, client_secret, tenant_id, subscription_id, resources, period_days)
-                    pdf_data = generate_pdf_report(account_name, metrics_data, cloud_provider, report_type)
-                else:
-                    month = params.get('month', datetime.now().month)
-                    year = params.get('year', datetime.now().year)
-                    pdf_data = generate_pdf_report(account_name, [], cloud_provider, report_type, month=month, year=year)
-            
-            with open(args.output, 'wb') as f:
-                f.write(pdf_data)
+            trace = generate_report_file(params, args.output)
             
             print(f"Report successfully generated: {args.output}")
+            print(json.dumps({'trace': trace.summary(), 'tracePath': trace_path(args.output)}))
         except Exception as e:
             print(f"Error generating report: {str(e)}")
             exit(1)
@@ -217,5 +803,8 @@ if __name__ == '__main__':
     if len(sys.argv) > 1:
         process_command_line()
     else:
-        # Run as web service
-        app.run(host='0.0.0.0', port=8000, debug=True)
+        # Run as web service. Requests are served on their own threads so
+        # status polls and downloads are answered while reports are generated.
+        get_report_scheduler()
+        app.run(host='0.0.0.0', port=int(os.environ.get('PORT', '8000')),
+                debug=os.environ.get('FLASK_DEBUG', '0') == '1', threaded=True)
@@ -1,28 +1,143 @@
 import boto3
+from botocore.config import Config
 import logging
 from datetime import datetime, timedelta
 import pytz
 import json
 import os
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import instrumentation
+from concurrency_utils import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_REGION_CONCURRENCY,
+    THROTTLING_ERROR_CODES,
+    RegionLimiter,
+    call_with_retry,
+    run_ordered
+)
+from client_cache import TTLCache, credentials_fingerprint
+from metrics_cache import get_metrics_cache, make_series_key
+from metric_series import MetricSeries, get_metric_period
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_aws_client(service: str, region: str, aws_access_key: str, aws_secret_key: str):
-    """Create and return an AWS service client."""
-    try:
-        return boto3.client(
-            service,
-            region_name=region,
+# GetMetricData accepts at most 500 metric queries per request
+MAX_METRIC_DATA_QUERIES = 500
+
+# Number of IDs sent in one describe filter
+MAX_EC2_FILTER_VALUES = 200
+MAX_RDS_FILTER_VALUES = 100
+
+# Size and lifetime of the shared session and client caches
+CLIENT_CACHE_MAX_SIZE = int(os.environ.get('AWS_CLIENT_CACHE_SIZE', '256'))
+CLIENT_CACHE_TTL = float(os.environ.get('AWS_CLIENT_CACHE_TTL', '3600'))
+
+def _before_api_call(context: Dict[str, Any], **kwargs) -> None:
+    context['instrumentation_started'] = time.perf_counter()
+
+def _after_api_call(http_response, parsed: Dict[str, Any], model, context: Dict[str, Any],
+                    event_name: str, **kwargs) -> None:
+    """Record a finished call (with botocore's own retries) in the current report trace."""
+    started = context.pop('instrumentation_started', None)
+    if started is None:
+        return
+    error = parsed.get('Error', {}).get('Code')
+    metadata = parsed.get('ResponseMetadata', {})
+    # Event names look like after-call.cloudwatch.GetMetricData
+    instrumentation.record_api_call(
+        event_name.split('.')[1], model.name, time.perf_counter() - started, error,
+        throttled=error in THROTTLING_ERROR_CODES or metadata.get('HTTPStatusCode') == 429,
+        retries=metadata.get('RetryAttempts', 0)
+    )
+
+def instrument_client(client):
+    """Register handlers that time every call of a boto3 client into the current report trace."""
+    client.meta.events.register('before-call.*.*', _before_api_call)
+    client.meta.events.register('after-call.*.*', _after_api_call)
+    return client
+
+# Sessions and clients are cached per (credentials fingerprint, region, service, endpoint)
+# so botocore service models and HTTP connection pools are reused across
+# resources and reports in a long-lived process. Evicted clients are not
+# closed, since a report may still be using them.
+_session_cache = TTLCache(max_size=CLIENT_CACHE_MAX_SIZE, ttl=CLIENT_CACHE_TTL)
+_client_cache = TTLCache(max_size=CLIENT_CACHE_MAX_SIZE, ttl=CLIENT_CACHE_TTL)
+
+def _get_session_entry(aws_access_key: str, aws_secret_key: str) -> Tuple[Any, threading.Lock]:
+    """Return a cached (boto3 session, lock) pair; the lock guards client creation from the session."""
+    fingerprint = credentials_fingerprint(aws_access_key, aws_secret_key)
+    return _session_cache.get_or_create(
+        fingerprint,
+        lambda: (boto3.session.Session(
             aws_access_key_id=aws_access_key,
             aws_secret_access_key=aws_secret_key
+        ), threading.Lock())
+    )
+
+def get_aws_session(aws_access_key: str, aws_secret_key: str):
+    """Return a cached boto3 session for the given credentials."""
+    return _get_session_entry(aws_access_key, aws_secret_key)[0]
+
+def _create_aws_client(service: str, region: str, aws_access_key: str, aws_secret_key: str,
+                      endpoint_url: Optional[str] = None):
+    """Create an instrumented client from the cached session of the credentials."""
+    session, session_lock = _get_session_entry(aws_access_key, aws_secret_key)
+    # boto3 sessions are not thread-safe, so clients of one session are created one at a time
+    with session_lock:
+        client = session.client(
+            service,
+            region_name=region,
+            endpoint_url=endpoint_url or None,
+            # Let every collection thread keep its own pooled connection. botocore
+            # makes a single attempt per call: call_with_retry owns the retries, so
+            # throttled calls back off once with jitter instead of under two layers.
+            config=Config(max_pool_connections=max(10, DEFAULT_MAX_WORKERS),
+                          retries={'mode': 'standard', 'total_max_attempts': 1})
+        )
+    return instrument_client(client)
+
+def get_aws_client(service: str, region: str, aws_access_key: str, aws_secret_key: str,
+                   endpoint_url: Optional[str] = None):
+    """Return a cached AWS service client, creating it on first use; endpoint_url points it at a stub."""
+    fingerprint = credentials_fingerprint(aws_access_key, aws_secret_key)
+    try:
+        return _client_cache.get_or_create(
+            (fingerprint, region, service, endpoint_url),
+            lambda: _create_aws_client(service, region, aws_access_key, aws_secret_key, endpoint_url)
         )
     except Exception as e:
         logger.error(f"Failed to create AWS client for {service}: {str(e)}")
         raise
 
+def clear_aws_clients() -> None:
+    """Drop every cached session and client."""
+    _client_cache.clear()
+    _session_cache.clear()
+
+def paginate_with_retry(operation: Callable[..., Dict[str, Any]], token_key: str,
+                        **request) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the pages of a paginated AWS call, retrying each throttled page on its own.
+
+    token_key is the parameter and response key that carries the next page
+    token (NextToken for EC2, Marker for RDS). Unlike wrapping a whole
+    paginator in call_with_retry, a throttled page does not restart the
+    listing from its first page.
+    """
+    while True:
+        page = call_with_retry(lambda: operation(**request))
+        yield page
+        token = page.get(token_key)
+        if not token:
+            return
+        request[token_key] = token
+
 def get_all_regions(aws_access_key: str, aws_secret_key: str) -> List[str]:
     """Get a list of all available AWS regions."""
     try:
@@ -34,278 +149,584 @@ def get_all_regions(aws_access_key: str, aws_secret_key: str) -> List[str]:
         # Fallback to common regions if API fails
         return ['us-east-1', 'us-east-2', 'us-west-1', 'us-west-2', 'eu-west-1', 'eu-central-1', 'ap-south-1']
 
-def list_ec2_instances(aws_access_key: str, aws_secret_key: str, region: str) -> List[Dict[str, Any]]:
-    """List EC2 instances in the specified region."""
+def build_ec2_filters(states: Optional[List[str]] = None,
+                      tags: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Build server-side describe_instances filters.
+
+    tags maps a tag key to a value, a list of accepted values, or None to
+    match any instance that has the key at all.
+    """
+    filters = []
+    if states:
+        filters.append({'Name': 'instance-state-name', 'Values': list(states)})
+    for key, value in (tags or {}).items():
+        if value is None:
+            filters.append({'Name': 'tag-key', 'Values': [key]})
+        else:
+            values = value if isinstance(value, (list, tuple)) else [value]
+            filters.append({'Name': f"tag:{key}", 'Values': [str(v) for v in values]})
+    return filters
+
+def matches_tags(tag_list: List[Dict[str, str]], tags: Optional[Dict[str, Any]]) -> bool:
+    """Check a resource's Key/Value tag list against the same tag spec build_ec2_filters accepts."""
+    if not tags:
+        return True
+    resource_tags = {tag['Key']: tag['Value'] for tag in tag_list or []}
+    for key, value in tags.items():
+        if key not in resource_tags:
+            return False
+        if value is not None:
+            values = value if isinstance(value, (list, tuple)) else [value]
+            if resource_tags[key] not in [str(v) for v in values]:
+                return False
+    return True
+
+def list_ec2_instances(aws_access_key: str, aws_secret_key: str, region: str,
+                       states: Optional[List[str]] = None,
+                       tags: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """List EC2 instances in the specified region, optionally filtered by state and tags."""
     try:
         ec2_client = get_aws_client('ec2', region, aws_access_key, aws_secret_key)
-        response = ec2_client.describe_instances()
+        filters = build_ec2_filters(states, tags)
 
         instances = []
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                instance_name = 'Unnamed'
-                if 'Tags' in instance:
-                    for tag in instance['Tags']:
-                        if tag['Key'] == 'Name':
-                            instance_name = tag['Value']
-
-                platform = instance.get('Platform', 'Linux')
-                if platform is None:
-                    platform = 'Linux'
-
-                instance_data = {
-                    'id': instance['InstanceId'],
-                    'name': instance_name,
-                    'type': instance['InstanceType'],
-                    'os': platform,
-                    'state': instance['State']['Name'],
-                    'region': region,
-                    'service_type': 'EC2'
-                }
-                instances.append(instance_data)
-
+        for page in paginate_with_retry(ec2_client.describe_instances, 'NextToken', Filters=filters):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    instance_data = {
+                        'id': instance['InstanceId'],
+                        'name': get_instance_name(instance, 'Unnamed'),
+                        'type': instance['InstanceType'],
+                        'os': get_instance_platform(instance),
+                        'state': instance['State']['Name'],
+                        'region': region,
+                        'service_type': 'EC2'
+                    }
+                    instances.append(instance_data)
         return instances
     except Exception as e:
         logger.error(f"Failed to list EC2 instances in {region}: {str(e)}")
         return []
 
-def list_rds_instances(aws_access_key: str, aws_secret_key: str, region: str) -> List[Dict[str, Any]]:
-    """List RDS instances in the specified region."""
+def list_rds_instances(aws_access_key: str, aws_secret_key: str, region: str,
+                       states: Optional[List[str]] = None,
+                       tags: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    List RDS instances in the specified region, optionally filtered by status and tags.
+
+    describe_db_instances has no server-side status or tag filters, so those
+    are applied to each page as it arrives.
+    """
     try:
         rds_client = get_aws_client('rds', region, aws_access_key, aws_secret_key)
-        response = rds_client.describe_db_instances()
 
         instances = []
-        for instance in response['DBInstances']:
-            instance_data = {
-                'id': instance['DBInstanceIdentifier'],
-                'name': instance['DBInstanceIdentifier'],
-                'type': instance['DBInstanceClass'],
-                'status': instance['DBInstanceStatus'],
-                'engine': instance['Engine'],
-                'region': region,
-                'service_type': 'RDS'
-            }
-            instances.append(instance_data)
-
+        for page in paginate_with_retry(rds_client.describe_db_instances, 'Marker'):
+            for instance in page['DBInstances']:
+                if states and instance['DBInstanceStatus'] not in states:
+                    continue
+                if not matches_tags(instance.get('TagList', []), tags):
+                    continue
+                instance_data = {
+                    'id': instance['DBInstanceIdentifier'],
+                    'name': instance['DBInstanceIdentifier'],
+                    'type': instance['DBInstanceClass'],
+                    'status': instance['DBInstanceStatus'],
+                    'engine': instance['Engine'],
+                    'region': region,
+                    'service_type': 'RDS'
+                }
+                instances.append(instance_data)
         return instances
     except Exception as e:
         logger.error(f"Failed to list RDS instances in {region}: {str(e)}")
         return []
 
-def get_cloudwatch_metric_data(cloudwatch, metric_name: str, namespace: str, 
-                              dimensions: List[Dict[str, str]], period_days: int, statistic: str = 'Average') -> Dict[str, Any]:
-    """Get CloudWatch metric data for the specified period."""
-    end_time = datetime.utcnow()
-    start_time = end_time - timedelta(days=period_days)
-    logger.info(f"Fetching metrics for {metric_name} from {start_time} to {end_time}")
-
-    # Use 30-minute intervals for weekly reports, 5-minute intervals for daily
-    period = 1800 if period_days > 1 else 300
+def discover_resources(aws_access_key: str, aws_secret_key: str,
+                       regions: Optional[List[str]] = None,
+                       service_types: Tuple[str, ...] = ('EC2', 'RDS'),
+                       states: Optional[List[str]] = None,
+                       tags: Optional[Dict[str, Any]] = None,
+                       callback: Optional[Callable[[str, str, List[Dict[str, Any]]], None]] = None,
+                       max_workers: int = DEFAULT_MAX_WORKERS) -> Iterator[Dict[str, Any]]:
+    """
+    Discover EC2 and RDS instances across regions concurrently.
+
+    Every (region, service) listing runs on a bounded thread pool and the
+    instances are yielded as soon as their listing completes, so callers can
+    stream results instead of waiting for the slowest region. When callback
+    is given it is also called with (region, service_type, instances) for each
+    completed listing. All regions are scanned when regions is None.
+    """
+    if not regions:
+        regions = get_all_regions(aws_access_key, aws_secret_key)
+
+    listers = {'EC2': list_ec2_instances, 'RDS': list_rds_instances}
+    units = [(region, service_type.upper()) for region in regions for service_type in service_types
+             if service_type.upper() in listers]
+    if not units:
+        return
 
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(units))))
     try:
-        response = cloudwatch.get_metric_statistics(
-            Namespace=namespace,
-            MetricName=metric_name,
-            Dimensions=dimensions,
-            StartTime=start_time,
-            EndTime=end_time,
-            Period=period,
-            Statistics=[statistic]
-        )
-
-        return {
-            'Datapoints': response['Datapoints']
+        futures = {
+            executor.submit(listers[service_type], aws_access_key, aws_secret_key, region, states, tags): (region, service_type)
+            for region, service_type in units
         }
-    except Exception as e:
-        logger.error(f"Failed to get CloudWatch metric {metric_name}: {str(e)}")
-        return {
-            'Datapoints': []
+        for future in as_completed(futures):
+            region, service_type = futures[future]
+            instances = future.result()
+            if callback:
+                callback(region, service_type, instances)
+            for instance in instances:
+                yield instance
+    finally:
+        # Stop scanning if the consumer stops iterating early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_metric_data_chunk(cloudwatch, queries: List[Dict[str, Any]], start_time: datetime,
+                            end_time: datetime, period: int, statistic: str = 'Average') -> List[MetricSeries]:
+    """
+    Fetch up to MAX_METRIC_DATA_QUERIES series with one paginated GetMetricData request.
+
+    Returns a MetricSeries per query, in query order. Errors are raised to the
+    caller.
+    """
+    metric_data_queries = [
+        {
+            # Query ids must start with a lowercase letter
+            'Id': f"m{index}",
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': query['namespace'],
+                    'MetricName': query['metric_name'],
+                    'Dimensions': query['dimensions']
+                },
+                'Period': period,
+                'Stat': statistic
+            },
+            'ReturnData': True
+        }
+        for index, query in enumerate(queries)
+    ]
+
+    timestamps = [[] for _ in queries]
+    values = [[] for _ in queries]
+    next_token = None
+    while True:
+        request = {
+            'MetricDataQueries': metric_data_queries,
+            'StartTime': start_time,
+            'EndTime': end_time,
+            'ScanBy': 'TimestampAscending'
         }
+        if next_token:
+            request['NextToken'] = next_token
+
+        response = call_with_retry(lambda: cloudwatch.get_metric_data(**request))
+
+        # A series can be split across pages, so extend rather than assign
+        for result in response['MetricDataResults']:
+            index = int(result['Id'][1:])
+            timestamps[index].extend(int(timestamp.timestamp()) for timestamp in result['Timestamps'])
+            values[index].extend(result['Values'])
+
+        next_token = response.get('NextToken')
+        if not next_token:
+            return [MetricSeries(ts, vals) for ts, vals in zip(timestamps, values)]
+
+def get_metric_data_batch(cloudwatch, queries: List[Dict[str, Any]], period_days: int,
+                          statistic: str = 'Average') -> List[MetricSeries]:
+    """
+    Fetch many CloudWatch series with GetMetricData instead of one
+    get_metric_statistics call per series.
+
+    Queries are sent in chunks of MAX_METRIC_DATA_QUERIES and every chunk is
+    paginated with NextToken. Returns one MetricSeries per query, in query
+    order; series whose chunk failed are empty.
+    """
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(days=period_days)
+    period = get_metric_period(period_days)
+    logger.info(f"Fetching {len(queries)} metric series from {start_time} to {end_time}")
 
-def get_ec2_metrics(aws_access_key: str, aws_secret_key: str, instance_id: str, 
-                   region: str, period_days: int) -> Optional[Dict[str, Any]]:
-    """Get EC2 instance metrics from CloudWatch."""
-    try:
-        cloudwatch = get_aws_client('cloudwatch', region, aws_access_key, aws_secret_key)
-        ec2_client = get_aws_client('ec2', region, aws_access_key, aws_secret_key)
+    results = [MetricSeries() for _ in queries]
 
-        # Get instance details
-        response = ec2_client.describe_instances(InstanceIds=[instance_id])
-        instance = response['Reservations'][0]['Instances'][0]
-
-        instance_name = instance_id
-        if 'Tags' in instance:
-            for tag in instance['Tags']:
-                if tag['Key'] == 'Name':
-                    instance_name = tag['Value']
-
-        platform = instance.get('Platform', 'Linux')
-        if platform is None:
-            platform = 'Linux'
-
-        os_type = platform.lower()
-        dimensions = [{'Name': 'InstanceId', 'Value': instance_id}]
-
-        # Get CPU metrics
-        cpu_data = get_cloudwatch_metric_data(
-            cloudwatch, 
-            'CPUUtilization', 
-            'AWS/EC2',
-            dimensions,
-            period_days
-        )
+    for offset in range(0, len(queries), MAX_METRIC_DATA_QUERIES):
+        chunk = queries[offset:offset + MAX_METRIC_DATA_QUERIES]
+        try:
+            chunk_results = fetch_metric_data_chunk(cloudwatch, chunk, start_time, end_time, period, statistic)
+        except Exception as e:
+            logger.error(f"Failed to get CloudWatch metric data for {len(chunk)} series: {str(e)}")
+            instrumentation.count('collectionFailures', len(chunk))
+            continue
+        results[offset:offset + len(chunk)] = chunk_results
+
+    return results
+
+def get_cached_metric_data_batch(cloudwatch, queries: List[Dict[str, Any]], period_days: int,
+                                 account: str, region: str, statistic: str = 'Average') -> List[MetricSeries]:
+    """
+    get_metric_data_batch backed by the on-disk metrics cache.
+
+    Only the part of each series' window that the cache does not hold yet is
+    requested from CloudWatch; series sharing the same missing interval are
+    fetched together. Falls back to get_metric_data_batch when the cache is
+    disabled.
+    """
+    cache = get_metrics_cache()
+    if cache is None:
+        return get_metric_data_batch(cloudwatch, queries, period_days, statistic)
+
+    period = get_metric_period(period_days)
+    end = int(time.time())
+    # Align the window to the period so cached and newly fetched buckets line up
+    start = end - period_days * 86400
+    start -= start % period
+
+    keys = [
+        make_series_key(account, region, query['namespace'], query['metric_name'],
+                        query['dimensions'], period, statistic)
+        for query in queries
+    ]
+
+    # Group the series by the interval they are missing
+    pending = {}
+    for index, key in enumerate(keys):
+        interval = cache.missing_interval(key, start, end, period)
+        if interval:
+            pending.setdefault(interval[0], []).append(index)
+
+    logger.info(f"Metrics cache: {len(queries) - sum(len(v) for v in pending.values())} of "
+                f"{len(queries)} series up to date in {region}")
+
+    end_time = datetime.fromtimestamp(end, pytz.UTC)
+    for fetch_start, indices in pending.items():
+        start_time = datetime.fromtimestamp(fetch_start, pytz.UTC)
+        for offset in range(0, len(indices), MAX_METRIC_DATA_QUERIES):
+            chunk = indices[offset:offset + MAX_METRIC_DATA_QUERIES]
+            try:
+                chunk_results = fetch_metric_data_chunk(cloudwatch, [queries[i] for i in chunk],
+                                                        start_time, end_time, period, statistic)
+            except Exception as e:
+                # Nothing is stored, so these series are requested again next time
+                logger.error(f"Failed to get CloudWatch metric data for {len(chunk)} series: {str(e)}")
+                instrumentation.count('collectionFailures', len(chunk))
+                continue
+            cache.store_many([
+                (keys[i], list(zip(series.timestamps.tolist(), series.values.tolist())), fetch_start, end)
+                for i, series in zip(chunk, chunk_results)
+            ])
+
+    return [MetricSeries.from_pairs(rows) for rows in cache.load_many(keys, start, end)]
+
+def get_instance_name(instance: Dict[str, Any], default: str) -> str:
+    """Return the Name tag of an EC2 instance, or default when it has none."""
+    instance_name = default
+    if 'Tags' in instance:
+        for tag in instance['Tags']:
+            if tag['Key'] == 'Name':
+                instance_name = tag['Value']
+    return instance_name
+
+def get_instance_platform(instance: Dict[str, Any]) -> str:
+    """Return the platform of an EC2 instance, defaulting to Linux."""
+    platform = instance.get('Platform', 'Linux')
+    if platform is None:
+        platform = 'Linux'
+    return platform
+
+def build_ec2_metric_queries(instance_id: str, platform: str) -> List[Dict[str, Any]]:
+    """
+    Describe the CloudWatch series collected for an EC2 instance.
+
+    Each query carries a 'path' into the instance details that
+    collect_instance_metrics returns, e.g. ('cpu',) or ('disk_metrics', 'disk C').
+    """
+    os_type = platform.lower()
+    dimensions = [{'Name': 'InstanceId', 'Value': instance_id}]
+
+    # Memory metrics come from the CloudWatch agent and differ per platform
+    memory_metric = 'Memory % Committed Bytes In Use' if os_type == 'windows' else 'mem_used_percent'
+
+    queries = [
+        {'path': ('cpu',), 'metric_name': 'CPUUtilization', 'namespace': 'AWS/EC2', 'dimensions': dimensions},
+        {'path': ('memory',), 'metric_name': memory_metric, 'namespace': 'CWAgent', 'dimensions': dimensions}
+    ]
+
+    if os_type == 'windows':
+        # For Windows, get C:, D:, E: disks if present
+        for drive in ['C:', 'D:', 'E:']:
+            queries.append({
+                'path': ('disk_metrics', f"disk {drive[0]}"),
+                'metric_name': 'LogicalDisk % Free Space',
+                'namespace': 'CWAgent',
+                'dimensions': dimensions + [{'Name': 'instance', 'Value': drive}]
+            })
+    else:
+        # For Linux, just get root (/) disk
+        queries.append({
+            'path': ('disk_metrics', 'disk'),
+            'metric_name': 'disk_used_percent',
+            'namespace': 'CWAgent',
+            'dimensions': dimensions + [{'Name': 'path', 'Value': '/'}]
+        })
+
+    return queries
+
+def build_rds_metric_queries(instance_id: str) -> List[Dict[str, Any]]:
+    """Describe the CloudWatch series collected for an RDS instance."""
+    dimensions = [{'Name': 'DBInstanceIdentifier', 'Value': instance_id}]
+    return [
+        {'path': ('cpu',), 'metric_name': 'CPUUtilization', 'namespace': 'AWS/RDS', 'dimensions': dimensions},
+        # Available memory and storage, reported in bytes
+        {'path': ('memory',), 'metric_name': 'FreeableMemory', 'namespace': 'AWS/RDS', 'dimensions': dimensions},
+        {'path': ('disk',), 'metric_name': 'FreeStorageSpace', 'namespace': 'AWS/RDS', 'dimensions': dimensions}
+    ]
+
+def set_metric_result(instance_info: Dict[str, Any], path: Tuple[str, ...], data: MetricSeries) -> None:
+    """Store a fetched series in instance_info at the given query path."""
+    target = instance_info
+    for key in path[:-1]:
+        target = target.setdefault(key, {})
+    target[path[-1]] = data
+
+def get_ec2_instance_details(instance: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the report details of an EC2 instance from a describe_instances entry."""
+    instance_id = instance['InstanceId']
+    return {
+        'id': instance_id,
+        'name': get_instance_name(instance, instance_id),
+        'type': instance['InstanceType'],
+        'state': instance['State']['Name'],
+        'os': get_instance_platform(instance)
+    }
 
-        # Get memory metrics
-        memory_metric = 'Memory % Committed Bytes In Use' if os_type == 'windows' else 'mem_used_percent'
-        memory_data = get_cloudwatch_metric_data(
-            cloudwatch,
-            memory_metric,
-            'CWAgent',
-            dimensions,
-            period_days
-        )
+def get_rds_instance_details(instance: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the report details of an RDS instance from a describe_db_instances entry."""
+    instance_id = instance['DBInstanceIdentifier']
+    return {
+        'id': instance_id,
+        'name': instance_id,
+        'type': instance['DBInstanceClass'],
+        'status': instance['DBInstanceStatus'],
+        'engine': instance['Engine']
+    }
 
-        # Get disk metrics
-        disk_metrics = {}
-
-        if os_type == 'windows':
-            # For Windows, get C:, D:, E: disks if present
-            drives = ['C:', 'D:', 'E:']
-            for drive in drives:
-                drive_dimensions = dimensions + [
-                    {'Name': 'instance', 'Value': drive}
-                ]
-                drive_key = f"disk {drive[0]}"
-                disk_metrics[drive_key] = get_cloudwatch_metric_data(
-                    cloudwatch,
-                    'LogicalDisk % Free Space',
-                    'CWAgent',
-                    drive_dimensions,
-                    period_days
-                )
+def get_ec2_instance_index(ec2_client, instance_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Describe many EC2 instances of one region with paginated describe_instances calls.
+
+    IDs are passed as an instance-id filter rather than InstanceIds, so unknown
+    IDs are simply absent from the result instead of failing the whole call.
+    Returns the instance details indexed by instance ID.
+    """
+    index = {}
+    for offset in range(0, len(instance_ids), MAX_EC2_FILTER_VALUES):
+        chunk = instance_ids[offset:offset + MAX_EC2_FILTER_VALUES]
+        for page in paginate_with_retry(ec2_client.describe_instances, 'NextToken',
+                                        Filters=[{'Name': 'instance-id', 'Values': chunk}]):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    details = get_ec2_instance_details(instance)
+                    index[details['id']] = details
+    return index
+
+def get_rds_instance_index(rds_client, instance_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Describe many RDS instances of one region with paginated describe_db_instances calls.
+
+    Returns the instance details indexed by DB instance identifier.
+    """
+    index = {}
+    for offset in range(0, len(instance_ids), MAX_RDS_FILTER_VALUES):
+        chunk = instance_ids[offset:offset + MAX_RDS_FILTER_VALUES]
+        for page in paginate_with_retry(rds_client.describe_db_instances, 'Marker',
+                                        Filters=[{'Name': 'db-instance-id', 'Values': chunk}]):
+            for instance in page['DBInstances']:
+                details = get_rds_instance_details(instance)
+                index[details['id']] = details
+    return index
+
+def collect_instance_metrics(aws_access_key: str, aws_secret_key: str,
+                             resources: List[Tuple[str, str, str]], period_days: int,
+                             max_workers: int = DEFAULT_MAX_WORKERS,
+                             region_concurrency: int = DEFAULT_REGION_CONCURRENCY) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    """
+    Collect details and metrics for (service_type, instance_id, region) resources concurrently.
+
+    Work fans out over a bounded thread pool in two stages: the instances of
+    each region are described in bulk into an in-memory index, then each
+    region's series are fetched with batched GetMetricData calls. A
+    RegionLimiter caps the in-flight calls per region and throttled calls are
+    retried with jittered backoff, so a report takes about as long as its
+    slowest region. Returns the instance details keyed by
+    resource, with every fetched MetricSeries stored at its query path.
+    Instances that cannot be described are left out.
+    """
+    region_limit = RegionLimiter(region_concurrency)
+
+    # Clients are thread-safe, so each region's clients are shared by its tasks;
+    # a region only gets the describe client of the services it has resources of
+    clients = {}
+    for service_type, _, region in resources:
+        region_clients = clients.setdefault(region, {})
+        for service in ('cloudwatch', 'ec2' if service_type == 'EC2' else 'rds'):
+            if service not in region_clients:
+                region_clients[service] = get_aws_client(service, region, aws_access_key, aws_secret_key)
+
+    # Metadata stage: one paginated describe call per region and service
+    groups = {}
+    for service_type, instance_id, region in resources:
+        groups.setdefault((region, service_type), []).append(instance_id)
+
+    def describe_task(region, service_type, instance_ids):
+        region_clients = clients[region]
+        try:
+            with region_limit(region):
+                if service_type == 'EC2':
+                    return get_ec2_instance_index(region_clients['ec2'], instance_ids)
+                return get_rds_instance_index(region_clients['rds'], instance_ids)
+        except Exception as e:
+            logger.error(f"Failed to describe {service_type} instances in {region}: {str(e)}")
+            return {}
+
+    group_keys = list(groups)
+    with instrumentation.span('describe_instances', groups=len(group_keys)):
+        indexes = run_ordered([lambda key=key: describe_task(key[0], key[1], groups[key]) for key in group_keys],
+                              max_workers)
+    instance_index = dict(zip(group_keys, indexes))
+
+    # Metric stage: build the queries from the index
+    instances = {}
+    region_queries = {}
+    for resource in resources:
+        service_type, instance_id, region = resource
+        details = instance_index[(region, service_type)].get(instance_id)
+        if details is None:
+            logger.error(f"Failed to get {service_type} details for {instance_id}: instance not found in {region}")
+            instrumentation.count('collectionFailures')
+            continue
+
+        instance_info = dict(details, region=region)
+        if service_type == 'EC2':
+            instance_info['disk_metrics'] = {}
+            instance_queries = build_ec2_metric_queries(instance_id, instance_info['os'])
         else:
-            # For Linux, just get root (/) disk
-            disk_dimensions = dimensions + [
-                {'Name': 'path', 'Value': '/'}
-            ]
-            disk_metrics['disk'] = get_cloudwatch_metric_data(
-                cloudwatch,
-                'disk_used_percent',
-                'CWAgent',
-                disk_dimensions,
-                period_days
-            )
-
-        return {
-            'id': instance_id,
-            'name': instance_name,
-            'type': instance['InstanceType'],
-            'state': instance['State']['Name'],
-            'os': platform,
-            'region': region,
-            'cpu': cpu_data,
-            'memory': memory_data,
-            'disk_metrics': disk_metrics
-        }
-    except Exception as e:
-        logger.error(f"Failed to get EC2 metrics for {instance_id}: {str(e)}")
-        return None
+            instance_queries = build_rds_metric_queries(instance_id)
 
-def get_rds_metrics(aws_access_key: str, aws_secret_key: str, instance_id: str, 
-                   region: str, period_days: int) -> Optional[Dict[str, Any]]:
-    """Get RDS instance metrics from CloudWatch."""
-    try:
-        cloudwatch = get_aws_client('cloudwatch', region, aws_access_key, aws_secret_key)
-        rds_client = get_aws_client('rds', region, aws_access_key, aws_secret_key)
+        instances[resource] = instance_info
+        for query in instance_queries:
+            region_queries.setdefault(region, []).append((resource, query))
 
-        # Get instance details
-        response = rds_client.describe_db_instances(DBInstanceIdentifier=instance_id)
-        instance = response['DBInstances'][0]
+    # One task per region and GetMetricData chunk, so large regions fetch in parallel too
+    chunks = []
+    for region, owned_queries in region_queries.items():
+        for offset in range(0, len(owned_queries), MAX_METRIC_DATA_QUERIES):
+            chunks.append((region, owned_queries[offset:offset + MAX_METRIC_DATA_QUERIES]))
 
-        dimensions = [{'Name': 'DBInstanceIdentifier', 'Value': instance_id}]
+    account = credentials_fingerprint(aws_access_key)
 
-        # Get CPU metrics
-        cpu_data = get_cloudwatch_metric_data(
-            cloudwatch, 
-            'CPUUtilization', 
-            'AWS/RDS',
-            dimensions,
-            period_days
-        )
+    def fetch_task(region, owned_queries):
+        with region_limit(region):
+            return get_cached_metric_data_batch(clients[region]['cloudwatch'],
+                                                [query for _, query in owned_queries],
+                                                period_days, account, region)
 
-        # Get memory metrics (available memory)
-        memory_data = get_cloudwatch_metric_data(
-            cloudwatch,
-            'FreeableMemory',
-            'AWS/RDS',
-            dimensions,
-            period_days
-        )
+    instrumentation.count('metricSeries', sum(len(owned_queries) for _, owned_queries in chunks))
+    with instrumentation.span('fetch_metrics', batches=len(chunks)):
+        fetched = run_ordered([lambda chunk=chunk: fetch_task(*chunk) for chunk in chunks], max_workers)
 
-        # Get disk metrics (available storage)
-        disk_data = get_cloudwatch_metric_data(
-            cloudwatch,
-            'FreeStorageSpace',
-            'AWS/RDS',
-            dimensions,
-            period_days
-        )
+    # Split the batched results back into the per-instance structure
+    for (region, owned_queries), results in zip(chunks, fetched):
+        for (resource, query), data in zip(owned_queries, results):
+            set_metric_result(instances[resource], query['path'], data)
 
-        return {
-            'id': instance_id,
-            'name': instance_id,
-            'type': instance['DBInstanceClass'],
-            'status': instance['DBInstanceStatus'],
-            'engine': instance['Engine'],
-            'region': region,
-            'cpu': cpu_data,
-            'memory': memory_data,
-            'disk': disk_data
-        }
+    return instances
+
+def process_metric_data(metric_data: Optional[MetricSeries]) -> MetricSeries:
+    """Return a fetched series for report generation, or an empty one when it was not collected."""
+    return metric_data if metric_data is not None else MetricSeries()
+
+def parse_resource(resource: str) -> Optional[Tuple[str, str, str]]:
+    """Parse a 'SERVICE|instance_id|region' resource string into its parts."""
+    try:
+        parts = resource.split('|')
+        if len(parts) != 3:
+            # Try to infer the format if possible (for backward compatibility)
+            if len(parts) == 1:
+                # This is just an instance ID, try to determine if it's EC2 or RDS
+                resource_id = parts[0]
+                if resource_id.startswith('i-'):
+                    # Most likely an EC2 instance
+                    service_type = 'EC2'
+                    instance_id = resource_id
+                    region = 'us-east-1'  # Default to us-east-1
+                    logger.warning(f"Resource format inferred for {resource_id} as EC2 in us-east-1")
+                else:
+                    # Assume it's RDS
+                    service_type = 'RDS'
+                    instance_id = resource_id
+                    region = 'us-east-1'  # Default to us-east-1
+                    logger.warning(f"Resource format inferred for {resource_id} as RDS in us-east-1")
+            else:
+                logger.error(f"Invalid resource format: {resource}")
+                return None
+        else:
+            service_type, instance_id, region = parts
+
+        # Validate parts
+        if not service_type or not instance_id or not region:
+            logger.error(f"Invalid resource format: {resource}")
+            return None
     except Exception as e:
-        logger.error(f"Failed to get RDS metrics for {instance_id}: {str(e)}")
+        logger.error(f"Error parsing resource format: {resource} - {str(e)}")
         return None
 
-def convert_bytes_to_gb(data: Dict[str, Any]) -> None:
-    """Convert byte values to gigabytes in the data structure"""
-    if 'Datapoints' not in data or not data['Datapoints']:
-        return
-
-    for point in data['Datapoints']:
-        if 'Average' in point:
-            point['Average'] = point['Average'] / (1024 * 1024 * 1024)
-        if 'Minimum' in point:
-            point['Minimum'] = point['Minimum'] / (1024 * 1024 * 1024)
-        if 'Maximum' in point:
-            point['Maximum'] = point['Maximum'] / (1024 * 1024 * 1024)
-
-def process_metric_data(metric_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Process metric data for report generation"""
-    if not metric_data or 'Datapoints' not in metric_data or not metric_data['Datapoints']:
-        return {
-            'timestamps': [],
-            'values': [],
-            'average': 0,
-            'min': 0,
-            'max': 0
+    return service_type.upper(), instance_id, region
+
+def format_ec2_metrics(instance_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert EC2 instance details to the format expected by the report generator."""
+    metrics = {
+        'id': instance_info['id'],
+        'name': instance_info['name'],
+        'type': instance_info['type'],
+        'platform': instance_info['os'],
+        'state': instance_info['state'],
+        'region': instance_info['region'],
+        'service_type': 'EC2',
+        'metrics': {
+            'cpu': process_metric_data(instance_info['cpu']),
+            'memory': process_metric_data(instance_info['memory']),
+            'disk': process_metric_data(instance_info['disk_metrics'].get('disk'))
         }
+    }
 
-    datapoints = sorted(metric_data['Datapoints'], key=lambda x: x['Timestamp'])
-
-    timestamps = [point['Timestamp'] for point in datapoints]
-    values = [point.get('Average', 0) for point in datapoints]
+    # Add Windows-specific disk metrics if present
+    if instance_info['os'].lower() == 'windows':
+        for drive_key, drive_data in instance_info['disk_metrics'].items():
+            if drive_key != 'disk':
+                metrics['metrics'][drive_key] = process_metric_data(drive_data)
 
-    avg_value = sum(values) / len(values) if values else 0
-    min_value = min(values) if values else 0
-    max_value = max(values) if values else 0
+    return metrics
 
+def format_rds_metrics(instance_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert RDS instance details to the format expected by the report generator."""
     return {
-        'timestamps': timestamps,
-        'values': values,
-        'average': avg_value,
-        'min': min_value,
-        'max': max_value
+        'id': instance_info['id'],
+        'name': instance_info['name'],
+        'type': instance_info['type'],
+        'engine': instance_info['engine'],
+        'state': instance_info['status'],
+        'region': instance_info['region'],
+        'service_type': 'RDS',
+        'metrics': {
+            'cpu': process_metric_data(instance_info['cpu']),
+            # For memory and disk, convert from bytes to GB
+            'memory': process_metric_data(instance_info['memory']).bytes_to_gb(),
+            'disk': process_metric_data(instance_info['disk']).bytes_to_gb()
+        }
     }
 
 def get_instance_metrics(aws_access_key: str, aws_secret_key: str, 
@@ -316,95 +737,29 @@ def get_instance_metrics(aws_access_key: str, aws_secret_key: str,
         logger.error("AWS credentials are missing")
         raise ValueError("AWS credentials are required")
 
-    metrics_data = []
-
+    parsed_resources = []
     for resource in resource_list:
-        try:
-            parts = resource.split('|')
-            if len(parts) != 3:
-                # Try to infer the format if possible (for backward compatibility)
-                if len(parts) == 1:
-                    # This is just an instance ID, try to determine if it's EC2 or RDS
-                    resource_id = parts[0]
-                    if resource_id.startswith('i-'):
-                        # Most likely an EC2 instance
-                        service_type = 'EC2'
-                        instance_id = resource_id
-                        region = 'us-east-1'  # Default to us-east-1
-                        logger.warning(f"Resource format inferred for {resource_id} as EC2 in us-east-1")
-                    else:
-                        # Assume it's RDS
-                        service_type = 'RDS' 
-                        instance_id = resource_id
-                        region = 'us-east-1'  # Default to us-east-1
-                        logger.warning(f"Resource format inferred for {resource_id} as RDS in us-east-1")
-                else:
-                    logger.error(f"Invalid resource format: {resource}")
-                    continue
-            else:
-                service_type, instance_id, region = parts
+        parsed = parse_resource(resource)
+        if parsed and parsed[0] in ('EC2', 'RDS'):
+            parsed_resources.append(parsed)
 
-            # Validate parts
-            if not service_type or not instance_id or not region:
-                logger.error(f"Invalid resource format: {resource}")
-                continue
-        except Exception as e:
-            logger.error(f"Error parsing resource format: {resource} - {str(e)}")
-            continue
+    # Each instance is collected once even if it was requested twice
+    unique_resources = list(dict.fromkeys(parsed_resources))
+    with instrumentation.span('collect_metrics', provider='AWS', resources=len(unique_resources)):
+        collected = collect_instance_metrics(aws_access_key, aws_secret_key, unique_resources, period_days)
 
-        service_type = service_type.upper()
-
-        if service_type == 'EC2':
-            instance_info = get_ec2_metrics(aws_access_key, aws_secret_key, instance_id, region, period_days)
-            if instance_info:
-                # Convert to the format expected by the report generator
-                metrics = {
-                    'id': instance_id,
-                    'name': instance_info['name'],
-                    'type': instance_info['type'],
-                    'platform': instance_info['os'],
-                    'state': instance_info['state'],
-                    'region': region,
-                    'service_type': 'EC2',
-                    'metrics': {
-                        'cpu': process_metric_data(instance_info['cpu']),
-                        'memory': process_metric_data(instance_info['memory']),
-                        'disk': process_metric_data(instance_info['disk_metrics'].get('disk', {'Datapoints': []}))
-                    }
-                }
-
-                # Add Windows-specific disk metrics if present
-                if instance_info['os'].lower() == 'windows':
-                    for drive_key, drive_data in instance_info['disk_metrics'].items():
-                        if drive_key != 'disk':
-                            metrics['metrics'][drive_key] = process_metric_data(drive_data)
-
-                metrics_data.append(metrics)
-
-        elif service_type == 'RDS':
-            instance_info = get_rds_metrics(aws_access_key, aws_secret_key, instance_id, region, period_days)
-            if instance_info:
-                # For memory and disk, convert from bytes to GB
-                if 'memory' in instance_info:
-                    convert_bytes_to_gb(instance_info['memory'])
-
-                if 'disk' in instance_info:
-                    convert_bytes_to_gb(instance_info['disk'])
-
-                metrics = {
-                    'id': instance_id,
-                    'name': instance_info['name'],
-                    'type': instance_info['type'],
-                    'engine': instance_info['engine'],
-                    'state': instance_info['status'],
-                    'region': region,
-                    'service_type': 'RDS',
-                    'metrics': {
-                        'cpu': process_metric_data(instance_info['cpu']),
-                        'memory': process_metric_data(instance_info['memory']),
-                        'disk': process_metric_data(instance_info['disk'])
-                    }
-                }
-                metrics_data.append(metrics)
+    # Keep the report in the order the resources were requested
+    metrics_data = []
+    formatted = {}
+    for resource_key in parsed_resources:
+        instance_info = collected.get(resource_key)
+        if not instance_info:
+            continue
+        if resource_key not in formatted:
+            if resource_key[0] == 'EC2':
+                formatted[resource_key] = format_ec2_metrics(instance_info)
+            else:
+                formatted[resource_key] = format_rds_metrics(instance_info)
+        metrics_data.append(formatted[resource_key])
 
-    return metrics_data
\ No newline at end of file
+    return metrics_data
@@ -0,0 +1,314 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import numpy as np
+import urllib3
+
+import instrumentation
+from client_cache import credentials_fingerprint
+from concurrency_utils import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_REGION_CONCURRENCY,
+    RegionLimiter,
+    call_with_retry,
+    run_ordered
+)
+from metric_series import BYTES_PER_GB, MetricSeries
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Endpoints; point both at azure_monitor_stub to run without Azure
+AZURE_AUTHORITY_HOST = os.environ.get('AZURE_AUTHORITY_HOST', 'https://login.microsoftonline.com').rstrip('/')
+AZURE_METRICS_ENDPOINT = os.environ.get('AZURE_METRICS_ENDPOINT', 'https://{region}.metrics.monitor.azure.com')
+AZURE_METRICS_SCOPE = 'https://metrics.monitor.azure.com/.default'
+AZURE_METRICS_API_VERSION = '2023-10-01'
+
+# metrics:getBatch accepts at most 50 resource IDs per request
+MAX_BATCH_RESOURCES = 50
+
+# Tokens are refreshed this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+
+HTTP_TIMEOUT = urllib3.Timeout(connect=10, read=60)
+
+# Metrics fetched per service type: namespace and, per report metric, the
+# Azure metric name and how its values map to the report's units. VMs have
+# no guest disk usage metric without the monitoring agent, so the OS disk
+# bandwidth utilisation is the closest host metric.
+METRIC_DEFINITIONS = {
+    'VM': {
+        'namespace': 'Microsoft.Compute/virtualMachines',
+        'metrics': {
+            'cpu': ('Percentage CPU', 'percent'),
+            'memory': ('Available Memory Percentage', 'inverse_percent'),
+            'disk': ('OS Disk Bandwidth Consumed Percentage', 'percent')
+        }
+    },
+    'DATABASE': {
+        'namespace': 'Microsoft.Sql/servers/databases',
+        'metrics': {
+            'cpu': ('cpu_percent', 'percent'),
+            'memory': ('sql_instance_memory_percent', 'percent'),
+            'disk': ('storage', 'bytes')
+        }
+    }
+}
+
+class AzureMonitorError(Exception):
+    """An error response from Azure AD or Azure Monitor; status 429 marks throttling."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+# One pool manager for every host: it keeps connections alive across
+# requests, reports and threads
+_http = urllib3.PoolManager(maxsize=max(10, DEFAULT_MAX_WORKERS), retries=False, timeout=HTTP_TIMEOUT)
+
+def request_json(operation: str, method: str, url: str, **kwargs) -> Dict[str, Any]:
+    """
+    Send a request and return its decoded JSON body, raising AzureMonitorError for error statuses.
+
+    The call is recorded as azure.<operation> in the current report trace.
+    """
+    started = time.perf_counter()
+    response = _http.request(method, url, **kwargs)
+    instrumentation.record_api_call('azure', operation, time.perf_counter() - started,
+                                    error=str(response.status) if response.status >= 400 else None,
+                                    throttled=response.status == 429)
+    if response.status >= 400:
+        raise AzureMonitorError(
+            f"{method} {url.split('?')[0]} failed with HTTP {response.status}: {response.data[:500]!r}",
+            response.status
+        )
+    return json.loads(response.data)
+
+class TokenCache:
+    """
+    Caches Azure AD access tokens per credentials until shortly before they expire.
+
+    Keys are credentials fingerprints, so client secrets are never kept as
+    dictionary keys. Concurrent callers for the same credentials wait for a
+    single token request; every credential has its own lock, so a slow
+    request for one tenant never holds up lookups for the others.
+    """
+
+    def __init__(self, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        # Guards the dicts only; never held during a token request
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+
+    def _cached(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._tokens.get(key)
+        if entry is not None and time.time() < entry[1] - self.refresh_margin:
+            return entry[0]
+        return None
+
+    def get_token(self, client_id: str, client_secret: str, tenant_id: str,
+                  authority_host: Optional[str] = None) -> str:
+        authority_host = (authority_host or AZURE_AUTHORITY_HOST).rstrip('/')
+        key = credentials_fingerprint(client_id, client_secret, tenant_id, authority_host)
+        token = self._cached(key)
+        if token is not None:
+            return token
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another caller may have fetched the token while this one waited
+            token = self._cached(key)
+            if token is not None:
+                return token
+
+            body = call_with_retry(lambda: request_json(
+                'token',
+                'POST',
+                f"{authority_host}/{tenant_id}/oauth2/v2.0/token",
+                fields={
+                    'grant_type': 'client_credentials',
+                    'client_id': client_id,
+                    'client_secret': client_secret,
+                    'scope': AZURE_METRICS_SCOPE
+                },
+                encode_multipart=False
+            ))
+            token = body['access_token']
+            with self._lock:
+                self._tokens[key] = (token, time.time() + float(body.get('expires_in', 3600)))
+            return token
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+
+_token_cache = TokenCache()
+
+def get_access_token(client_id: str, client_secret: str, tenant_id: str,
+                     authority_host: Optional[str] = None) -> str:
+    """Return a cached Azure Monitor access token for a service principal (from AZURE_AUTHORITY_HOST by default)."""
+    return _token_cache.get_token(client_id, client_secret, tenant_id, authority_host)
+
+def format_time(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def get_metric_interval(period_days: int) -> str:
+    """Return the ISO 8601 aggregation interval for a report window, matching the CloudWatch periods."""
+    return 'PT30M' if period_days > 1 else 'PT5M'
+
+def fetch_metrics_batch(token: str, subscription_id: str, region: str, namespace: str,
+                        metric_names: List[str], resource_ids: List[str], start: int, end: int,
+                        interval: str, metrics_endpoint: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch the average of metric_names for up to MAX_BATCH_RESOURCES resources
+    of one region and namespace with a single metrics:getBatch call.
+
+    Returns the response's per-resource 'values' entries. Throttled calls are
+    retried with jittered backoff. metrics_endpoint defaults to
+    AZURE_METRICS_ENDPOINT.
+    """
+    url = (f"{(metrics_endpoint or AZURE_METRICS_ENDPOINT).format(region=region).rstrip('/')}"
+           f"/subscriptions/{subscription_id}/metrics:getBatch")
+    fields = {
+        'starttime': format_time(start),
+        'endtime': format_time(end),
+        'interval': interval,
+        'metricnamespace': namespace,
+        'metricnames': ','.join(metric_names),
+        'aggregation': 'average',
+        'api-version': AZURE_METRICS_API_VERSION
+    }
+    body = call_with_retry(lambda: request_json(
+        'getBatch',
+        'POST',
+        f"{url}?{urlencode(fields)}",
+        body=json.dumps({'resourceids': resource_ids}).encode('utf-8'),
+        headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    ))
+    return body.get('values', [])
+
+def parse_metric_values(metric: Dict[str, Any], conversion: str) -> MetricSeries:
+    """Turn one metric of a getBatch response into a MetricSeries in the report's units."""
+    points = [point for timeseries in metric.get('timeseries', [])
+              for point in timeseries.get('data', [])
+              if point.get('average') is not None]
+    if not points:
+        return MetricSeries()
+
+    timestamps = np.fromiter(
+        (datetime.fromisoformat(point['timeStamp'].replace('Z', '+00:00')).timestamp() for point in points),
+        dtype=np.float64, count=len(points)
+    ).astype(np.int64)
+    values = np.fromiter((point['average'] for point in points), dtype=np.float64, count=len(points))
+
+    if conversion == 'inverse_percent':
+        values = 100 - values
+    elif conversion == 'bytes':
+        values = values / BYTES_PER_GB
+    return MetricSeries(timestamps, values)
+
+def get_resource_name(resource_id: str) -> str:
+    return resource_id.rstrip('/').split('/')[-1]
+
+def collect_azure_metrics(client_id: str, client_secret: str, tenant_id: str, subscription_id: str,
+                          resources: List[Tuple[str, str, str]], period_days: int,
+                          max_workers: int = DEFAULT_MAX_WORKERS,
+                          region_concurrency: int = DEFAULT_REGION_CONCURRENCY,
+                          authority_host: Optional[str] = None,
+                          metrics_endpoint: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Collect metrics for (service_type, resource_id, region) resources from Azure Monitor.
+
+    Resources are grouped by region and service type and fetched
+    MAX_BATCH_RESOURCES at a time with metrics:getBatch. The batches fan out
+    over a bounded thread pool with at most region_concurrency calls per
+    region, share one cached token and reuse pooled connections. Returns the
+    resource metrics objects in resource order, in the same shape as the demo
+    data of azure_utils; resources whose batch failed are left out. Azure
+    Monitor knows nothing of power state or OS, so 'state' and 'platform'
+    are left unset and the report shows them as unknown.
+    authority_host and metrics_endpoint override AZURE_AUTHORITY_HOST and
+    AZURE_METRICS_ENDPOINT, e.g. to point one run at azure_monitor_stub.
+    """
+    token = get_access_token(client_id, client_secret, tenant_id, authority_host)
+    end = int(time.time())
+    start = end - period_days * 86400
+    interval = get_metric_interval(period_days)
+    region_limit = RegionLimiter(region_concurrency)
+
+    groups: Dict[Tuple[str, str], List[str]] = {}
+    for service_type, resource_id, region in resources:
+        groups.setdefault((region, service_type), []).append(resource_id)
+
+    batches = []
+    for (region, service_type), resource_ids in groups.items():
+        for offset in range(0, len(resource_ids), MAX_BATCH_RESOURCES):
+            batches.append((region, service_type, resource_ids[offset:offset + MAX_BATCH_RESOURCES]))
+
+    def fetch_task(region, service_type, resource_ids):
+        definition = METRIC_DEFINITIONS[service_type]
+        metric_names = [name for name, _ in definition['metrics'].values()]
+        try:
+            with region_limit(region):
+                return fetch_metrics_batch(token, subscription_id, region, definition['namespace'],
+                                           metric_names, resource_ids, start, end, interval, metrics_endpoint)
+        except Exception as e:
+            # Its resources are counted as collection failures below
+            logger.error(f"Failed to get Azure {service_type} metrics in {region}: {str(e)}")
+            return []
+
+    with instrumentation.span('fetch_metrics', batches=len(batches)):
+        fetched = run_ordered([lambda batch=batch: fetch_task(*batch) for batch in batches], max_workers)
+
+    # Index the per-resource results by (lower-cased) resource ID
+    results: Dict[str, Dict[str, MetricSeries]] = {}
+    for (region, service_type, _), values in zip(batches, fetched):
+        metric_keys = {name.lower(): (key, conversion)
+                       for key, (name, conversion) in METRIC_DEFINITIONS[service_type]['metrics'].items()}
+        for entry in values:
+            series = results.setdefault(entry.get('resourceid', '').lower(), {})
+            for metric in entry.get('value', []):
+                mapping = metric_keys.get(metric.get('name', {}).get('value', '').lower())
+                if mapping is not None:
+                    series[mapping[0]] = parse_metric_values(metric, mapping[1])
+
+    metrics_data = []
+    for service_type, resource_id, region in resources:
+        series = results.get(resource_id.lower())
+        if series is None:
+            logger.error(f"No Azure metrics returned for {resource_id}")
+            instrumentation.count('collectionFailures')
+            continue
+
+        name = get_resource_name(resource_id)
+        if service_type == 'VM':
+            resource = {
+                'id': resource_id,
+                'name': f"VM-{name}",
+                'type': 'Virtual Machine',
+                'region': region,
+                'service_type': 'VM'
+            }
+        else:
+            resource = {
+                'id': resource_id,
+                'name': f"DB-{name}",
+                'type': 'SQL Database',
+                'engine': 'SQL',
+                'region': region,
+                'service_type': 'Database'
+            }
+        resource['metrics'] = {key: series.get(key, MetricSeries()) for key in ('cpu', 'memory', 'disk')}
+        metrics_data.append(resource)
+
+    return metrics_data
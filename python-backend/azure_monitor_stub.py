@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Azure AD and the Azure Monitor metrics batch API.
+
+Serves the token endpoint and metrics:getBatch with recorded or synthetic
+responses so the Azure collector can be run, tested and benchmarked offline:
+
+    python azure_monitor_stub.py --port 8765
+    AZURE_AUTHORITY_HOST=http://127.0.0.1:8765 \\
+    AZURE_METRICS_ENDPOINT=http://127.0.0.1:8765/{region} AZURE_METRICS_SOURCE=monitor ...
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from synthetic_metrics import generate_series_batch, get_rng
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (min, max) bounds of the synthetic values of known metrics
+METRIC_BOUNDS = {
+    'percentage cpu': (10, 80),
+    'available memory percentage': (20, 60),
+    'os disk bandwidth consumed percentage': (5, 50),
+    'cpu_percent': (20, 60),
+    'sql_instance_memory_percent': (30, 80),
+    'storage': (20 * 1024 ** 3, 100 * 1024 ** 3)
+}
+DEFAULT_BOUNDS = (0, 100)
+
+def parse_duration(interval: str) -> int:
+    """Return the seconds of an ISO 8601 PT..H..M duration such as PT5M."""
+    seconds = 0
+    number = ''
+    for char in interval.upper().lstrip('PT'):
+        if char.isdigit():
+            number += char
+        else:
+            seconds += int(number or 0) * {'H': 3600, 'M': 60, 'S': 1}.get(char, 0)
+            number = ''
+    return seconds or 300
+
+def parse_time(value: str) -> int:
+    return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+
+def format_time(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+class StubState:
+    """Configuration and counters shared by the request handlers."""
+
+    def __init__(self, recordings: Optional[Dict[str, Dict[str, Any]]] = None, latency: float = 0.0,
+                 throttle_rate: float = 0.0, seed: Optional[int] = None, shape: Optional[str] = None):
+        self.recordings = recordings or {}
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.shape = shape
+        self.rng = get_rng(seed)
+        self.lock = threading.Lock()
+        self.calls = {'token': 0, 'getBatch': 0, 'throttled': 0}
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.calls[name] += 1
+
+def synthetic_values(state: StubState, resource_ids: List[str], metric_names: List[str],
+                     start: int, end: int, interval: int) -> List[Dict[str, Any]]:
+    """Build the getBatch 'values' entries for resources with synthetic data, drawn in one batch."""
+    timestamps = np.arange(start - start % interval, end, interval, dtype=np.int64)
+    bounds = [METRIC_BOUNDS.get(name.lower(), DEFAULT_BOUNDS)
+              for _ in resource_ids for name in metric_names]
+    with state.lock:
+        values = generate_series_batch(timestamps, bounds, state.shape, state.rng)
+
+    times = [format_time(int(ts)) for ts in timestamps]
+    entries = []
+    row = 0
+    for resource_id in resource_ids:
+        metrics = []
+        for name in metric_names:
+            metrics.append({
+                'id': f"{resource_id}/providers/Microsoft.Insights/metrics/{name}",
+                'type': 'Microsoft.Insights/metrics',
+                'name': {'value': name, 'localizedValue': name},
+                'unit': 'Bytes' if name.lower() == 'storage' else 'Percent',
+                'timeseries': [{
+                    'metadatavalues': [],
+                    'data': [{'timeStamp': ts, 'average': value} for ts, value in zip(times, values[row].tolist())]
+                }],
+                'errorCode': 'Success'
+            })
+            row += 1
+        entries.append({
+            'starttime': format_time(start),
+            'endtime': format_time(end),
+            'interval': f'PT{interval // 60}M',
+            'value': metrics,
+            'resourceid': resource_id
+        })
+    return entries
+
+def make_handler(state: StubState):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def send_json(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = self.rfile.read(length)
+            url = urlparse(self.path)
+
+            if state.latency:
+                time.sleep(state.latency)
+
+            if url.path.endswith('/oauth2/v2.0/token'):
+                state.count('token')
+                self.send_json(200, {'token_type': 'Bearer', 'expires_in': 3599,
+                                     'access_token': f'stub-token-{time.time():.0f}'})
+                return
+
+            if url.path.endswith('/metrics:getBatch'):
+                if state.throttle_rate and random.random() < state.throttle_rate:
+                    state.count('throttled')
+                    self.send_json(429, {'error': {'code': 'TooManyRequests', 'message': 'Throttled by stub'}})
+                    return
+
+                state.count('getBatch')
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                resource_ids = json.loads(payload or b'{}').get('resourceids', [])
+                metric_names = [name for name in query.get('metricnames', '').split(',') if name]
+                start = parse_time(query['starttime'])
+                end = parse_time(query['endtime'])
+                interval = parse_duration(query.get('interval', 'PT5M'))
+
+                recorded = [state.recordings[rid.lower()] for rid in resource_ids if rid.lower() in state.recordings]
+                missing = [rid for rid in resource_ids if rid.lower() not in state.recordings]
+                values = recorded + synthetic_values(state, missing, metric_names, start, end, interval)
+                self.send_json(200, {'values': values})
+                return
+
+            self.send_json(404, {'error': {'code': 'NotFound', 'message': url.path}})
+
+    return StubHandler
+
+def load_recordings(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load recorded getBatch responses (a response body or a list of 'values' entries) keyed by resource ID."""
+    with open(path, 'r') as f:
+        recorded = json.load(f)
+    if isinstance(recorded, dict):
+        recorded = recorded.get('values', [])
+    return {entry['resourceid'].lower(): entry for entry in recorded}
+
+def start_stub_server(host: str = '127.0.0.1', port: int = 0, state: Optional[StubState] = None):
+    """
+    Start the stub on a background thread and return (server, state).
+
+    With port 0 a free port is chosen; it is available as server.server_port.
+    Call server.shutdown() to stop it.
+    """
+    state = state or StubState()
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Azure Monitor metrics batch API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--recordings', help='JSON file of recorded getBatch responses')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='Fraction of getBatch calls answered with HTTP 429')
+    parser.add_argument('--seed', type=int, help='Seed for reproducible synthetic data')
+    parser.add_argument('--shape', choices=['uniform', 'realistic'], help='Shape of synthetic series')
+    args = parser.parse_args()
+
+    state = StubState(
+        recordings=load_recordings(args.recordings) if args.recordings else None,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+        shape=args.shape
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    logger.info(f"Azure Monitor stub listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Calls served: {state.calls}")
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,72 @@
 import logging
-from datetime import datetime, timedelta
-import json
+import os
 from typing import List, Dict, Any, Optional, Tuple
 
+import numpy as np
+
+import instrumentation
+from metric_series import MetricSeries
+from synthetic_metrics import demo_timestamps, generate_resource_series, generate_series_batch, get_rng
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Where metrics come from: 'demo' generates synthetic data, 'monitor' queries
+# the Azure Monitor metrics batch API (see azure_monitor)
+AZURE_METRICS_SOURCE = os.environ.get('AZURE_METRICS_SOURCE', 'demo').lower()
+
+# (min, max) bounds of the demo cpu, memory and disk series per service type
+VM_METRIC_BOUNDS = [(10, 80), (40, 80), (30, 70)]
+DATABASE_METRIC_BOUNDS = [(20, 60), (2, 8), (20, 100)]  # memory and disk in GB
+
+def parse_azure_resource(resource: str) -> Optional[Tuple[str, str, str]]:
+    """Parse a 'service_type|resource_id|region' resource string, or None when it is invalid."""
+    try:
+        parts = resource.split('|')
+        if len(parts) != 3:
+            # Try to infer the format if possible (for backward compatibility)
+            if len(parts) == 1:
+                # This is just a resource ID, try to infer type from format
+                resource_id = parts[0]
+                # Azure VM IDs often contain 'virtualMachines'
+                if 'virtualmachines' in resource_id.lower():
+                    service_type = 'VM'
+                    region = 'eastus'  # Default to East US
+                    logger.warning(f"Resource format inferred for {resource_id} as VM in eastus")
+                else:
+                    # Assume it's a database
+                    service_type = 'Database'
+                    region = 'eastus'  # Default to East US
+                    logger.warning(f"Resource format inferred for {resource_id} as Database in eastus")
+            else:
+                logger.error(f"Invalid resource format: {resource}")
+                return None
+        else:
+            service_type, resource_id, region = parts
+        
+        # Validate parts
+        if not service_type or not resource_id or not region:
+            logger.error(f"Invalid resource format: {resource}")
+            return None
+    except Exception as e:
+        logger.error(f"Error parsing resource format: {resource} - {str(e)}")
+        return None
+    
+    return service_type.upper(), resource_id, region
+
 def get_azure_metrics(client_id: str, client_secret: str, tenant_id: str, 
-                     subscription_id: str, resource_list: List[str], period_days: int) -> List[Dict[str, Any]]:
+                     subscription_id: str, resource_list: List[str], period_days: int,
+                     seed: Optional[int] = None, source: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Get metrics for the selected Azure resources.
     
-    In a real implementation, this would use the Azure SDK to get metrics for each resource.
-    For this sample, we'll generate mock data that has the same structure as the AWS metrics.
+    With source (default AZURE_METRICS_SOURCE) 'monitor' the metrics are
+    fetched from Azure Monitor in batches (see collect_azure_metrics).
+    Otherwise mock data with the same structure as the AWS metrics is
+    generated: the series of every resource share one timestamp array and are
+    drawn in a single batch (see synthetic_metrics), reproducibly when seed
+    is given.
     """
     logger.info(f"Getting Azure metrics with period: {period_days} days")
     
@@ -22,98 +75,51 @@ def get_azure_metrics(client_id: str, client_secret: str, tenant_id: str,
         logger.error("Azure credentials are missing")
         raise ValueError("Azure credentials are required")
     
-    metrics_data = []
-    
+    resources = []
     for resource in resource_list:
-        try:
-            parts = resource.split('|')
-            if len(parts) != 3:
-                # Try to infer the format if possible (for backward compatibility)
-                if len(parts) == 1:
-                    # This is just a resource ID, try to infer type from format
-                    resource_id = parts[0]
-                    # Azure VM IDs often contain 'virtualMachines'
-                    if 'virtualmachines' in resource_id.lower():
-                        service_type = 'VM'
-                        region = 'eastus'  # Default to East US
-                        logger.warning(f"Resource format inferred for {resource_id} as VM in eastus")
-                    else:
-                        # Assume it's a database
-                        service_type = 'Database'
-                        region = 'eastus'  # Default to East US
-                        logger.warning(f"Resource format inferred for {resource_id} as Database in eastus")
-                else:
-                    logger.error(f"Invalid resource format: {resource}")
-                    continue
-            else:
-                service_type, resource_id, region = parts
-            
-            # Validate parts
-            if not service_type or not resource_id or not region:
-                logger.error(f"Invalid resource format: {resource}")
-                continue
-        except Exception as e:
-            logger.error(f"Error parsing resource format: {resource} - {str(e)}")
-            continue
-            
-        service_type = service_type.upper()
-        
-        # In a real implementation, you would connect to Azure Monitor here
-        # For now, we'll generate mock metrics data with the same structure as AWS
+        parsed = parse_azure_resource(resource)
+        if parsed is not None and parsed[0] in ('VM', 'DATABASE'):
+            resources.append(parsed)
+    
+    if not resources:
+        return []
+    
+    source = source or AZURE_METRICS_SOURCE
+    with instrumentation.span('collect_metrics', provider='Azure', source=source, resources=len(resources)):
+        if source == 'monitor':
+            # Imported here so demo reports do not load the HTTP client
+            from azure_monitor import collect_azure_metrics
+            return collect_azure_metrics(client_id, client_secret, tenant_id, subscription_id, resources,
+                                         period_days)
         
+        timestamps = demo_timestamps(period_days)
+        values = generate_resource_series(
+            timestamps,
+            [VM_METRIC_BOUNDS if service_type == 'VM' else DATABASE_METRIC_BOUNDS
+             for service_type, _, _ in resources],
+            rng=get_rng(seed)
+        )
+    
+    metrics_data = []
+    for (service_type, resource_id, region), resource_values in zip(resources, values):
         if service_type == 'VM':
-            metrics = generate_vm_metrics(resource_id, region, period_days)
-            metrics_data.append(metrics)
-        
-        elif service_type == 'Database':
-            metrics = generate_database_metrics(resource_id, region, period_days)
-            metrics_data.append(metrics)
+            metrics_data.append(build_vm_metrics(resource_id, region, timestamps, resource_values))
+        else:
+            metrics_data.append(build_database_metrics(resource_id, region, timestamps, resource_values))
     
     return metrics_data
 
-def generate_vm_metrics(resource_id: str, region: str, period_days: int) -> Dict[str, Any]:
-    """
-    Generate metrics data for an Azure VM.
-    
-    In a real implementation, this would fetch actual metrics from Azure Monitor.
-    """
-    # Generate timestamps and values for the given period
-    end_time = datetime.utcnow()
-    start_time = end_time - timedelta(days=period_days)
-    
-    timestamps, cpu_values = generate_demo_values(start_time, end_time)
-    _, memory_values = generate_demo_values(start_time, end_time, 40, 80)
-    _, disk_values = generate_demo_values(start_time, end_time, 30, 70)
-    
-    # CPU metrics
-    cpu_metrics = {
-        'timestamps': timestamps,
-        'values': cpu_values,
-        'average': sum(cpu_values) / len(cpu_values),
-        'min': min(cpu_values),
-        'max': max(cpu_values)
-    }
-    
-    # Memory metrics
-    memory_metrics = {
-        'timestamps': timestamps,
-        'values': memory_values,
-        'average': sum(memory_values) / len(memory_values),
-        'min': min(memory_values),
-        'max': max(memory_values)
+def build_metric_series(timestamps: np.ndarray, values: np.ndarray) -> Dict[str, MetricSeries]:
+    """Return the cpu/memory/disk MetricSeries of one resource from its rows of demo values."""
+    return {
+        'cpu': MetricSeries(timestamps, values[0], assume_sorted=True),
+        'memory': MetricSeries(timestamps, values[1], assume_sorted=True),
+        'disk': MetricSeries(timestamps, values[2], assume_sorted=True)
     }
-    
-    # Disk metrics
-    disk_metrics = {
-        'timestamps': timestamps,
-        'values': disk_values,
-        'average': sum(disk_values) / len(disk_values),
-        'min': min(disk_values),
-        'max': max(disk_values)
-    }
-    
-    # Create resource metrics object
-    metrics = {
+
+def build_vm_metrics(resource_id: str, region: str, timestamps: np.ndarray, values: np.ndarray) -> Dict[str, Any]:
+    """Create the resource metrics object of an Azure VM."""
+    return {
         'id': resource_id,
         'name': f"VM-{resource_id.split('/')[-1]}",
         'type': 'Standard_D2s_v3',
@@ -121,58 +127,13 @@ def generate_vm_metrics(resource_id: str, region: str, period_days: int) -> Dict
         'state': 'running',
         'region': region,
         'service_type': 'VM',
-        'metrics': {
-            'cpu': cpu_metrics,
-            'memory': memory_metrics,
-            'disk': disk_metrics
-        }
+        'metrics': build_metric_series(timestamps, values)
     }
-    
-    return metrics
 
-def generate_database_metrics(resource_id: str, region: str, period_days: int) -> Dict[str, Any]:
-    """
-    Generate metrics data for an Azure database.
-    
-    In a real implementation, this would fetch actual metrics from Azure Monitor.
-    """
-    # Generate timestamps and values for the given period
-    end_time = datetime.utcnow()
-    start_time = end_time - timedelta(days=period_days)
-    
-    timestamps, cpu_values = generate_demo_values(start_time, end_time, 20, 60)
-    _, memory_values = generate_demo_values(start_time, end_time, 2, 8)  # GB
-    _, disk_values = generate_demo_values(start_time, end_time, 20, 100)  # GB
-    
-    # CPU metrics
-    cpu_metrics = {
-        'timestamps': timestamps,
-        'values': cpu_values,
-        'average': sum(cpu_values) / len(cpu_values),
-        'min': min(cpu_values),
-        'max': max(cpu_values)
-    }
-    
-    # Memory metrics
-    memory_metrics = {
-        'timestamps': timestamps,
-        'values': memory_values,
-        'average': sum(memory_values) / len(memory_values),
-        'min': min(memory_values),
-        'max': max(memory_values)
-    }
-    
-    # Disk metrics
-    disk_metrics = {
-        'timestamps': timestamps,
-        'values': disk_values,
-        'average': sum(disk_values) / len(disk_values),
-        'min': min(disk_values),
-        'max': max(disk_values)
-    }
-    
-    # Create resource metrics object
-    metrics = {
+def build_database_metrics(resource_id: str, region: str, timestamps: np.ndarray,
+                           values: np.ndarray) -> Dict[str, Any]:
+    """Create the resource metrics object of an Azure database."""
+    return {
         'id': resource_id,
         'name': f"DB-{resource_id.split('/')[-1]}",
         'type': 'Standard',
@@ -180,33 +141,27 @@ def generate_database_metrics(resource_id: str, region: str, period_days: int) -
         'state': 'available',
         'region': region,
         'service_type': 'Database',
-        'metrics': {
-            'cpu': cpu_metrics,
-            'memory': memory_metrics,
-            'disk': disk_metrics
-        }
+        'metrics': build_metric_series(timestamps, values)
     }
-    
-    return metrics
 
-def generate_demo_values(start_time: datetime, end_time: datetime, 
-                        min_value: float = 10, max_value: float = 80) -> Tuple[List[datetime], List[float]]:
-    """Generate demo values between min_value and max_value for the given time period."""
-    import random
-    
-    interval = timedelta(minutes=5)
-    current_time = start_time
-    
-    timestamps = []
-    values = []
+def generate_vm_metrics(resource_id: str, region: str, period_days: int,
+                        seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Generate metrics data for an Azure VM.
     
-    while current_time <= end_time:
-        timestamps.append(current_time)
-        
-        # Generate a value between min_value and max_value
-        value = min_value + (max_value - min_value) * random.random()
-        values.append(value)
-        
-        current_time += interval
+    In a real implementation, this would fetch actual metrics from Azure Monitor.
+    """
+    timestamps = demo_timestamps(period_days)
+    values = generate_series_batch(timestamps, VM_METRIC_BOUNDS, rng=get_rng(seed))
+    return build_vm_metrics(resource_id, region, timestamps, values)
+
+def generate_database_metrics(resource_id: str, region: str, period_days: int,
+                              seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Generate metrics data for an Azure database.
     
-    return timestamps, values
+    In a real implementation, this would fetch actual metrics from Azure Monitor.
+    """
+    timestamps = demo_timestamps(period_days)
+    values = generate_series_batch(timestamps, DATABASE_METRIC_BOUNDS, rng=get_rng(seed))
+    return build_database_metrics(resource_id, region, timestamps, values)
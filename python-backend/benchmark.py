@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Fleet layout: resources are spread round-robin over these regions
+FLEET_REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1']
+AZURE_FLEET_REGIONS = ['eastus', 'westeurope', 'southeastasia']
+
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+WINDOWS = {'daily': 1, 'weekly': 7}
+PROVIDERS = ['aws', 'azure-demo', 'azure-monitor']
+
+# CloudWatch returns at most this many datapoints per GetMetricData page
+MAX_DATAPOINTS_PER_PAGE = 100800
+
+BENCHMARK_CREDENTIALS = {
+    'accessKeyId': 'AKIABENCHMARK',
+    'secretAccessKey': 'benchmark-secret',
+    'clientId': 'benchmark-client',
+    'clientSecret': 'benchmark-secret',
+    'tenantId': 'benchmark-tenant',
+    'subscriptionId': 'benchmark-subscription'
+}
+
+def build_aws_fleet(size: int, seed: int = 0) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+    """
+    Return (resource strings, instances by ID) for a synthetic AWS fleet.
+
+    Four in five resources are EC2 instances (one in four of them Windows,
+    which have three disk series), the rest RDS instances.
+    """
+    rng = random.Random(seed)
+    resources = []
+    instances = {}
+    for index in range(size):
+        region = FLEET_REGIONS[index % len(FLEET_REGIONS)]
+        if index % 5 == 4:
+            instance_id = f"bench-db-{index:05d}"
+            instances[instance_id] = {
+                'DBInstanceIdentifier': instance_id,
+                'DBInstanceClass': rng.choice(['db.t3.medium', 'db.m5.large', 'db.r5.xlarge']),
+                'DBInstanceStatus': 'available',
+                'Engine': rng.choice(['mysql', 'postgres'])
+            }
+            resources.append(f"RDS|{instance_id}|{region}")
+        else:
+            instance_id = f"i-{index:017x}"
+            instance = {
+                'InstanceId': instance_id,
+                'InstanceType': rng.choice(['t3.micro', 'm5.large', 'c5.xlarge']),
+                'State': {'Name': 'running'},
+                'Tags': [{'Key': 'Name', 'Value': f"bench-host-{index:05d}"}]
+            }
+            if index % 4 == 3:
+                instance['Platform'] = 'windows'
+            instances[instance_id] = instance
+            resources.append(f"EC2|{instance_id}|{region}")
+    return resources, instances
+
+def build_azure_fleet(size: int) -> List[str]:
+    """Return the resource strings of a synthetic Azure fleet of VMs and SQL databases."""
+    resources = []
+    for index in range(size):
+        region = AZURE_FLEET_REGIONS[index % len(AZURE_FLEET_REGIONS)]
+        base = '/subscriptions/benchmark-subscription/resourceGroups/bench'
+        if index % 5 == 4:
+            resources.append(f"Database|{base}/providers/Microsoft.Sql/servers/bench/databases/db-{index:05d}|{region}")
+        else:
+            resources.append(f"VM|{base}/providers/Microsoft.Compute/virtualMachines/vm-{index:05d}|{region}")
+    return resources
+
+class FakeAWSBackend:
+    """
+    Answers EC2, RDS and CloudWatch calls of real boto3 clients without a network.
+
+    Handlers registered on each client's before-call event return parsed
+    responses, the same mechanism botocore's Stubber uses, so the benchmark
+    runs the full client code path (parameter validation, pagination,
+    retries) but responses are generated from the synthetic fleet instead of
+    being queued in call order. Every call is counted per operation;
+    throttle_rate makes that fraction of calls fail with a Throttling error.
+    """
+
+    def __init__(self, instances: Dict[str, Dict[str, Any]], throttle_rate: float = 0.0, seed: int = 0):
+        self.instances = instances
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.throttled = Counter()
+
+    def install(self, client) -> None:
+        client.meta.events.register('before-parameter-build.*.*', self._capture_params)
+        client.meta.events.register('before-call.*.*', self._respond)
+
+    def _capture_params(self, params, context, **kwargs):
+        context['benchmark_params'] = dict(params)
+
+    def _respond(self, model, context, **kwargs):
+        from botocore.awsrequest import AWSResponse
+
+        operation = model.name
+        with self.lock:
+            self.calls[operation] += 1
+            throttle = self.throttle_rate and self.rng.random() < self.throttle_rate
+            if throttle:
+                self.throttled[operation] += 1
+
+        if throttle:
+            return AWSResponse(None, 400, {}, None), {
+                'Error': {'Code': 'Throttling', 'Message': 'Rate exceeded'},
+                'ResponseMetadata': {'HTTPStatusCode': 400}
+            }
+
+        params = context.get('benchmark_params', {})
+        handler = getattr(self, f"_{operation}", None)
+        if handler is None:
+            raise NotImplementedError(f"Benchmark backend does not implement {operation}")
+        response = handler(params)
+        response['ResponseMetadata'] = {'HTTPStatusCode': 200}
+        return AWSResponse(None, 200, {}, None), response
+
+    def _filter_values(self, params: Dict[str, Any]) -> List[str]:
+        return [value for f in params.get('Filters', []) for value in f['Values']]
+
+    def _DescribeInstances(self, params):
+        ids = params.get('InstanceIds') or self._filter_values(params)
+        found = [self.instances[i] for i in ids if i in self.instances and 'InstanceId' in self.instances[i]]
+        return {'Reservations': [{'Instances': [instance]} for instance in found]}
+
+    def _DescribeDBInstances(self, params):
+        ids = [params['DBInstanceIdentifier']] if 'DBInstanceIdentifier' in params else self._filter_values(params)
+        return {'DBInstances': [self.instances[i] for i in ids
+                                if i in self.instances and 'DBInstanceIdentifier' in self.instances[i]]}
+
+    def _GetMetricData(self, params):
+        import numpy as np
+
+        queries = params['MetricDataQueries']
+        start = params['StartTime']
+        end = params['EndTime']
+        period = queries[0]['MetricStat']['Period'] if queries else 300
+        start_epoch = int(start.replace(tzinfo=start.tzinfo or timezone.utc).timestamp())
+        end_epoch = int(end.replace(tzinfo=end.tzinfo or timezone.utc).timestamp())
+        timestamps = np.arange(start_epoch - start_epoch % period + period, end_epoch, period)
+        times = [datetime.fromtimestamp(int(ts), timezone.utc) for ts in timestamps]
+
+        # Pages hold whole series; NextToken is the index of the next query
+        first = int(params.get('NextToken') or 0)
+        per_page = max(1, MAX_DATAPOINTS_PER_PAGE // max(1, len(times)))
+        page = queries[first:first + per_page]
+
+        with self.lock:
+            values = np.random.default_rng(self.rng.getrandbits(64)).uniform(5, 95, (len(page), len(times)))
+
+        response = {
+            'MetricDataResults': [
+                {'Id': query['Id'], 'Label': query['Id'], 'Timestamps': times,
+                 'Values': row.tolist(), 'StatusCode': 'Complete'}
+                for query, row in zip(page, values)
+            ],
+            'Messages': []
+        }
+        if first + per_page < len(queries):
+            response['NextToken'] = str(first + per_page)
+        return response
+
+def peak_rss_bytes(who: int) -> int:
+    """Return the peak resident set size of this process or its waited-for children in bytes."""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_scenario(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one benchmark scenario in this process and return its measurements.
+
+    scenario holds provider, size, window, chartFormat and throttleRate. The
+    caches are disabled so every run does the full work. Settings that
+    differ between scenarios (chart format, stub endpoints) are passed as
+    arguments rather than environment variables, since with --in-process
+    the backend modules have already read their environment by the second
+    scenario.
+    """
+    # The caches are off for every scenario, so they can be disabled before the first import
+    for name in ('METRICS_CACHE_PATH', 'RESULT_CACHE_DIR'):
+        os.environ.pop(name, None)
+
+    stub = None
+    if scenario['provider'] == 'azure-monitor':
+        from azure_monitor_stub import StubState, start_stub_server
+        stub, stub_state = start_stub_server(state=StubState(seed=0))
+
+    import report_generator
+    from instrumentation import start_trace
+
+    stage_seconds = Counter()
+
+    period_days = WINDOWS[scenario['window']]
+    api_calls = {}
+    throttled = {}
+    started = time.perf_counter()
+
+    if scenario['provider'] == 'aws':
+        import aws_utils
+
+        resources, instances = build_aws_fleet(scenario['size'])
+        backend = FakeAWSBackend(instances, throttle_rate=scenario.get('throttleRate', 0.0))
+        # Start from fresh clients: cached ones still answer from an earlier scenario's backend
+        aws_utils.clear_aws_clients()
+        for region in FLEET_REGIONS:
+            for service in ('cloudwatch', 'ec2', 'rds'):
+                backend.install(aws_utils.get_aws_client(service, region, BENCHMARK_CREDENTIALS['accessKeyId'],
+                                                         BENCHMARK_CREDENTIALS['secretAccessKey']))
+
+        collect_started = time.perf_counter()
+        metrics_data = aws_utils.get_instance_metrics(BENCHMARK_CREDENTIALS['accessKeyId'],
+                                                      BENCHMARK_CREDENTIALS['secretAccessKey'],
+                                                      resources, period_days)
+        stage_seconds['collect'] = time.perf_counter() - collect_started
+        api_calls = dict(backend.calls)
+        throttled = dict(backend.throttled)
+    else:
+        import azure_utils
+
+        resources = build_azure_fleet(scenario['size'])
+        collect_started = time.perf_counter()
+        if stub is None:
+            metrics_data = azure_utils.get_azure_metrics(BENCHMARK_CREDENTIALS['clientId'],
+                                                         BENCHMARK_CREDENTIALS['clientSecret'],
+                                                         BENCHMARK_CREDENTIALS['tenantId'],
+                                                         BENCHMARK_CREDENTIALS['subscriptionId'],
+                                                         resources, period_days, seed=0, source='demo')
+        else:
+            from azure_monitor import collect_azure_metrics
+
+            stub_url = f"http://127.0.0.1:{stub.server_port}"
+            metrics_data = collect_azure_metrics(BENCHMARK_CREDENTIALS['clientId'],
+                                                 BENCHMARK_CREDENTIALS['clientSecret'],
+                                                 BENCHMARK_CREDENTIALS['tenantId'],
+                                                 BENCHMARK_CREDENTIALS['subscriptionId'],
+                                                 [azure_utils.parse_azure_resource(resource) for resource in resources],
+                                                 period_days, authority_host=stub_url,
+                                                 metrics_endpoint=f"{stub_url}/{{region}}")
+        stage_seconds['collect'] = time.perf_counter() - collect_started
+        if stub is not None:
+            api_calls = {name: count for name, count in stub_state.calls.items() if name != 'throttled'}
+            throttled = {'getBatch': stub_state.calls['throttled']}
+
+    fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        render_started = time.perf_counter()
+        # The report trace splits the rendering stage into chart drawing and document layout
+        with start_trace('benchmark') as trace:
+            report_generator.generate_pdf_report('Benchmark Account', metrics_data,
+                                                 'AWS' if scenario['provider'] == 'aws' else 'Azure',
+                                                 'utilization', chart_format=scenario.get('chartFormat'),
+                                                 output=pdf_path)
+        stage_seconds['render'] = time.perf_counter() - render_started
+        stage_seconds['charts'] = trace.stages.get('render_charts', {}).get('seconds', 0.0)
+        stage_seconds['build'] = stage_seconds['render'] - stage_seconds['charts']
+        chart_count = int(trace.counters.get('charts', 0))
+        pdf_bytes = os.path.getsize(pdf_path)
+    finally:
+        os.remove(pdf_path)
+
+    wall_seconds = time.perf_counter() - started
+    # Stopping the chart pool reaps its workers, so their peak RSS shows in RUSAGE_CHILDREN
+    chart_pool_used = report_generator._chart_executor is not None
+    report_generator.shutdown_chart_executor()
+    if scenario['provider'] == 'aws':
+        aws_utils.clear_aws_clients()
+    if stub is not None:
+        stub.shutdown()
+
+    return dict(
+        scenario,
+        resources=len(metrics_data),
+        wallSeconds=round(wall_seconds, 4),
+        stages={name: round(seconds, 4) for name, seconds in stage_seconds.items()},
+        apiCalls=api_calls,
+        apiCallsTotal=sum(api_calls.values()),
+        throttled=throttled,
+        charts=chart_count,
+        pdfBytes=pdf_bytes,
+        peakRssBytes=peak_rss_bytes(resource.RUSAGE_SELF),
+        # Peak RSS of a chart pool worker; None when the charts were drawn in this process
+        peakChartWorkerRssBytes=peak_rss_bytes(resource.RUSAGE_CHILDREN) if chart_pool_used else None
+    )
+
+def run_scenario_subprocess(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a scenario in a fresh interpreter, so peak RSS and imports are measured per scenario."""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-scenario', json.dumps(scenario)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        return dict(scenario, error=completed.stderr.strip().splitlines()[-1:] or ['failed'])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+def scenario_key(result: Dict[str, Any]) -> Tuple:
+    return (result['provider'], result['size'], result['window'], result.get('chartFormat'))
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Return one line per scenario in both result sets with the change in wall time, RSS and API calls."""
+    previous = {scenario_key(result): result for result in baseline['results'] if 'error' not in result}
+    lines = []
+    for result in current['results']:
+        old = previous.get(scenario_key(result))
+        if old is None or 'error' in result:
+            continue
+
+        def change(name):
+            before, after = old[name], result[name]
+            return f"{name} {before} -> {after} ({(after - before) / before * 100:+.1f}%)" if before else \
+                f"{name} {before} -> {after}"
+
+        lines.append(f"{result['provider']} size={result['size']} {result['window']}: "
+                     f"{change('wallSeconds')}, {change('peakRssBytes')}, {change('apiCallsTotal')}")
+    return lines
+
+def format_result(result: Dict[str, Any]) -> str:
+    if 'error' in result:
+        return f"{result['provider']:<14} {result['size']:>5} {result['window']:<7} ERROR {result['error']}"
+    stages = ' '.join(f"{name}={seconds:.2f}s" for name, seconds in result['stages'].items())
+    return (f"{result['provider']:<14} {result['size']:>5} {result['window']:<7} "
+            f"{result['wallSeconds']:>8.2f}s  calls={result['apiCallsTotal']:<5} "
+            f"rss={result['peakRssBytes'] / 1024 ** 2:.0f}MB pdf={result['pdfBytes'] / 1024:.0f}KB  {stages}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark metric collection and report rendering '
+                                                 'against stubbed cloud APIs and synthetic fleets')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Fleet sizes to run')
+    parser.add_argument('--windows', nargs='+', choices=list(WINDOWS), default=list(WINDOWS))
+    parser.add_argument('--providers', nargs='+', choices=PROVIDERS, default=['aws', 'azure-demo'])
+    parser.add_argument('--chart-format', choices=['png', 'vector'], help='Chart format (default CHART_FORMAT)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='Fraction of AWS calls answered with a Throttling error')
+    parser.add_argument('--output', default=f"benchmark-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                        help='Path of the JSON results file')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Run every scenario in this process (peak RSS is then cumulative)')
+    parser.add_argument('--run-scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        print(json.dumps(run_scenario(json.loads(args.run_scenario))))
+        return
+
+    results = []
+    for provider in args.providers:
+        for window in args.windows:
+            for size in args.sizes:
+                scenario = {'provider': provider, 'size': size, 'window': window,
+                            'chartFormat': args.chart_format, 'throttleRate': args.throttle_rate}
+                result = run_scenario(scenario) if args.in_process else run_scenario_subprocess(scenario)
+                results.append(result)
+                print(format_result(result), flush=True)
+
+    report = {
+        'commit': git_commit(),
+        'createdAt': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} (commit {baseline.get('commit')}):")
+        for line in compare_results(baseline, report):
+            print(f"  {line}")
+
+if __name__ == '__main__':
+    main()
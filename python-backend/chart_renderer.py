@@ -0,0 +1,134 @@
+import io
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+
+# matplotlib is imported when the first chart is drawn, so importing this
+# module (for its constants) stays cheap for reports without PNG charts
+
+# Chart geometry and colours
+CHART_FIGSIZE = (10, 4)
+CHART_DPI = 150
+CHART_PIXEL_WIDTH = int(CHART_FIGSIZE[0] * CHART_DPI)
+LINE_COLOR = '#FF0066'
+
+# How charts are embedded: 'png' (rasterised) or 'vector' (native PDF drawing)
+CHART_FORMAT = os.environ.get('CHART_FORMAT', 'png').lower()
+
+class ChartRenderer:
+    """
+    Draws metric charts on one reusable Agg figure.
+
+    The axes, line artists, formatters, grid, labels and layout are created
+    once; each chart only swaps the line data, title, limits and statistics
+    text before the figure is rendered. The pyplot state machine is not used,
+    so every thread can safely own a renderer (see get_chart_renderer).
+    """
+
+    def __init__(self, figsize=CHART_FIGSIZE, dpi=CHART_DPI):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        import matplotlib.dates as mdates
+
+        self.dpi = dpi
+        self.figure = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot(111)
+
+        # Plot the data with a bright, highlighted color
+        self.line, = self.axes.plot([], [], color=LINE_COLOR, linewidth=2.5,
+                                    marker='o', markersize=3, markerfacecolor=LINE_COLOR,
+                                    label='Average', alpha=0.9)
+
+        # Add average line
+        self.average_line = self.axes.axhline(y=0, color=LINE_COLOR, linestyle='-', alpha=0.5, label='Average')
+
+        # Format x-axis to show dates
+        self.axes.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M', tz=pytz.UTC))
+        self.axes.xaxis.set_major_locator(mdates.HourLocator(interval=3))
+
+        # Add grid
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+
+        self.axes.set_xlabel('Time', fontweight='bold')
+        self.axes.legend(loc='upper right', frameon=True)
+        self.stats_text = self.figure.text(0.5, 0.01, '', ha='center', fontsize=10, fontweight='bold')
+
+        # Lay the figure out once with representative labels instead of
+        # running tight_layout for every chart
+        now = datetime(2000, 1, 1, tzinfo=pytz.UTC)
+        self.axes.set_xlim(now, now + timedelta(days=1))
+        # Charts without data reuse this range rather than the previous chart's
+        self.empty_xlim = self.axes.get_xlim()
+        self.axes.set_ylabel('Memory Utilization (Percent)', fontweight='bold')
+        self.axes.set_title('Instance: Metric\nStart to End', fontweight='bold')
+        self.figure.tight_layout(pad=0.4)
+        # Leave room for the statistics line below the x-axis label
+        self.figure.subplots_adjust(bottom=self.figure.subplotpars.bottom + 0.05)
+
+    def render(self, series, metric_name, instance_name, avg, min_val, max_val):
+        """Render a chart for a MetricSeries and return it as PNG bytes."""
+        self.line.set_data(series.datetimes(), series.values)
+        self.average_line.set_ydata([avg, avg])
+
+        # Check if the metric is memory or disk (where we use GB)
+        if 'gb' in metric_name.lower() or any(word in metric_name.lower() for word in ['memory', 'disk']):
+            unit = 'GB'
+        else:
+            unit = 'Percent'
+        self.axes.set_ylabel(f"{metric_name} ({unit})", fontweight='bold')
+
+        # The series is sorted, so the first and last timestamps span the data
+        if len(series):
+            start_time = series.start_datetime()
+            end_time = series.end_datetime()
+
+            # Format the time span in the title
+            start_str = start_time.strftime('%Y-%m-%d %H:%M')
+            end_str = end_time.strftime('%Y-%m-%d %H:%M')
+            self.axes.set_title(f'{instance_name}: {metric_name}\n{start_str} to {end_str}', fontweight='bold')
+
+            # Set explicit x-axis range based on the data
+            self.axes.set_xlim(start_time, end_time)
+        else:
+            self.axes.set_title(f'{instance_name}: {metric_name}\nNo data available', fontweight='bold')
+            self.axes.set_xlim(*self.empty_xlim)
+
+        # Rescale the y-axis to the new data (and average line)
+        self.axes.relim()
+        self.axes.autoscale_view(scalex=False)
+
+        # Add statistics
+        if unit == 'Percent':
+            self.stats_text.set_text(f"Min: {min_val:.2f}% | Max: {max_val:.2f}% | Avg: {avg:.2f}%")
+        else:
+            self.stats_text.set_text(f"Min: {min_val:.2f} GB | Max: {max_val:.2f} GB | Avg: {avg:.2f} GB")
+
+        buf = io.BytesIO()
+        self.figure.savefig(buf, format='png', dpi=self.dpi)
+        return buf.getvalue()
+
+def render_error_chart(message, figsize=CHART_FIGSIZE, dpi=CHART_DPI):
+    """Render a placeholder chart that shows an error message."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    figure.text(0.5, 0.5, message, horizontalalignment='center', verticalalignment='center')
+
+    buf = io.BytesIO()
+    figure.savefig(buf, format='png', dpi=dpi)
+    return buf.getvalue()
+
+_renderers = threading.local()
+
+def get_chart_renderer():
+    """Return the calling thread's ChartRenderer, creating it on first use."""
+    renderer = getattr(_renderers, 'renderer', None)
+    if renderer is None:
+        renderer = ChartRenderer()
+        _renderers.renderer = renderer
+    return renderer
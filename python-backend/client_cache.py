@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def credentials_fingerprint(*secrets: Optional[str]) -> str:
+    """
+    Return a short, irreversible fingerprint of a set of credentials.
+
+    Used in cache keys so that raw keys and secrets are never kept as
+    dictionary keys or written to logs.
+    """
+    digest = hashlib.sha256()
+    for secret in secrets:
+        digest.update((secret or '').encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire `ttl` seconds after creation.
+
+    When the cache is full the least recently used entry is evicted. Evicted
+    values are only dropped from the cache, never closed: a caller that took
+    one before it was evicted may still be using it, and it is released by
+    garbage collection once the last user lets go of it.
+    """
+
+    def __init__(self, max_size: int = 128, ttl: float = 3600):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        # Locks of the keys whose values are being created
+        self._creating: Dict[Hashable, threading.Lock] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None when it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if time.monotonic() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, creating it with factory when needed.
+
+        The factory runs outside the cache lock, so slow construction of one
+        value (e.g. a boto3 session) never holds up lookups or construction of
+        other keys. Concurrent callers asking for the same missing key wait on
+        a per-key lock, so it is still only built once.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._creating.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                value = self.get(key)
+                if value is not None:
+                    return value
+                value = factory()
+                with self._lock:
+                    self._entries[key] = (value, time.monotonic())
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                return value
+        finally:
+            with self._lock:
+                if self._creating.get(key) is key_lock:
+                    del self._creating[key]
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry and return how many were removed."""
+        with self._lock:
+            now = time.monotonic()
+            expired = [key for key, (_, created) in self._entries.items() if now - created > self.ttl]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,113 @@
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, TypeVar
+
+import instrumentation
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Upper bound on threads used to talk to the cloud APIs for one report
+DEFAULT_MAX_WORKERS = int(os.environ.get('METRICS_MAX_WORKERS', '16'))
+
+# Upper bound on in-flight API calls against a single region
+DEFAULT_REGION_CONCURRENCY = int(os.environ.get('METRICS_REGION_CONCURRENCY', '4'))
+
+# Retry settings for throttled calls
+RETRY_MAX_ATTEMPTS = int(os.environ.get('METRICS_RETRY_MAX_ATTEMPTS', '6'))
+RETRY_BASE_DELAY = float(os.environ.get('METRICS_RETRY_BASE_DELAY', '0.5'))
+RETRY_MAX_DELAY = float(os.environ.get('METRICS_RETRY_MAX_DELAY', '20'))
+
+# Error codes the cloud APIs use when a caller is being rate limited
+THROTTLING_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+    'TooManyRequests',
+    'SlowDown',
+    'EC2ThrottledException',
+    'PriorRequestNotComplete',
+    'BandwidthLimitExceeded'
+}
+
+def is_throttling_error(error: Exception) -> bool:
+    """Return True when an exception raised by a cloud API call means we were throttled."""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        if response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            return True
+        if response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 429:
+            return True
+
+    # HTTP errors raised outside botocore carry the status code directly
+    return getattr(error, 'status', None) == 429 or getattr(error, 'code', None) == 429
+
+def call_with_retry(func: Callable[[], T], max_attempts: int = RETRY_MAX_ATTEMPTS,
+                    base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY) -> T:
+    """
+    Call func, retrying with jittered exponential backoff while it is throttled.
+
+    Uses "full jitter": the n-th retry sleeps a random time between zero and
+    min(max_delay, base_delay * 2**n), which spreads retries of concurrent
+    workers instead of having them hit the API again in lockstep. Errors other
+    than throttling are raised immediately.
+    """
+    attempt = 1
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= max_attempts or not is_throttling_error(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+            logger.warning(f"Throttled (attempt {attempt}/{max_attempts}), retrying in {delay:.2f}s: {str(e)}")
+            instrumentation.count('throttleRetries')
+            time.sleep(delay)
+            attempt += 1
+
+class RegionLimiter:
+    """Hands out one semaphore per region so no region gets more than `limit` concurrent calls."""
+
+    def __init__(self, limit: int = DEFAULT_REGION_CONCURRENCY):
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+    def __call__(self, region: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(region)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.limit)
+                self._semaphores[region] = semaphore
+            return semaphore
+
+def run_ordered(tasks: List[Callable[[], T]], max_workers: int = DEFAULT_MAX_WORKERS) -> List[T]:
+    """
+    Run tasks on a bounded thread pool and return their results in task order.
+
+    Exceptions are not caught: the first failing task (in task order) re-raises
+    its exception here, so tasks that should not abort the batch must handle
+    their own errors. Tasks run in a copy of the caller's context, so they
+    record into the caller's report trace.
+    """
+    if not tasks:
+        return []
+
+    workers = max(1, min(max_workers, len(tasks)))
+    if workers == 1:
+        return [task() for task in tasks]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(instrumentation.in_current_context(task)) for task in tasks]
+        return [future.result() for future in futures]
@@ -0,0 +1,122 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# SQLite database of fetched costs; ':memory:' keeps them for the life of the
+# process only, a file path shares them between processes and restarts
+COST_CACHE_PATH = os.environ.get('COST_CACHE_PATH', ':memory:')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cost_months (
+    account TEXT NOT NULL,
+    month TEXT NOT NULL,
+    fetched_until TEXT NOT NULL,
+    closed INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (account, month)
+);
+CREATE TABLE IF NOT EXISTS cost_items (
+    account TEXT NOT NULL,
+    day TEXT NOT NULL,
+    service TEXT NOT NULL,
+    usage_type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    unit TEXT NOT NULL,
+    PRIMARY KEY (account, day, service, usage_type)
+) WITHOUT ROWID;
+'''
+
+# (day, service, usage type, amount, unit); days are ISO dates
+CostItem = Tuple[str, str, str, float, str]
+
+class CostCache:
+    """
+    Daily Cost Explorer costs per account, service and usage type.
+
+    Each cached month remembers the day up to which it was fetched
+    (exclusive) and whether it is closed. Closed months are final and never
+    fetched again; for an open month only the days from shortly before
+    fetched_until on are requested again (see cost_explorer.get_month_costs).
+    Accounts are keyed by credentials fingerprint.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # One shared connection guarded by a lock; WAL lets several worker
+        # processes read the same file while one of them writes.
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def month_state(self, account: str, month: str) -> Optional[Tuple[str, bool]]:
+        """Return (fetched_until, closed) of a cached month ('YYYY-MM'), or None when it was never fetched."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fetched_until, closed FROM cost_months WHERE account = ? AND month = ?',
+                (account, month)
+            ).fetchone()
+        return (row[0], bool(row[1])) if row is not None else None
+
+    def store(self, account: str, month: str, start: str, end: str, items: List[CostItem],
+              closed: bool) -> None:
+        """Replace the cached costs of the days [start, end) of a month and record it as fetched until end."""
+        with self._lock:
+            self._conn.execute('DELETE FROM cost_items WHERE account = ? AND day >= ? AND day < ?',
+                               (account, start, end))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO cost_items (account, day, service, usage_type, amount, unit) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(account,) + tuple(item) for item in items]
+            )
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cost_months (account, month, fetched_until, closed, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (account, month, end, int(closed), time.time())
+            )
+            self._conn.commit()
+
+    def load(self, account: str, start: str, end: str) -> List[CostItem]:
+        """Return the cached costs of the days [start, end)."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT day, service, usage_type, amount, unit FROM cost_items '
+                'WHERE account = ? AND day >= ? AND day < ? ORDER BY day',
+                (account, start, end)
+            ).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_cache: Optional[CostCache] = None
+_cache_lock = threading.Lock()
+
+def get_cost_cache() -> Optional[CostCache]:
+    """Return the process-wide cost cache, or None when COST_CACHE_PATH is empty."""
+    global _cache
+    if not COST_CACHE_PATH:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = CostCache(COST_CACHE_PATH)
+            except Exception as e:
+                logger.error(f"Failed to open cost cache {COST_CACHE_PATH}: {str(e)}")
+                return None
+        return _cache
@@ -0,0 +1,177 @@
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import instrumentation
+from aws_utils import get_aws_client
+from client_cache import credentials_fingerprint
+from concurrency_utils import call_with_retry
+from cost_cache import CostItem, get_cost_cache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cost Explorer endpoint; point it at cost_explorer_stub to run without AWS
+COST_EXPLORER_ENDPOINT = os.environ.get('COST_EXPLORER_ENDPOINT', '')
+
+# Cost Explorer is a global service served from us-east-1
+COST_EXPLORER_REGION = 'us-east-1'
+
+# Cost metric reported per service and usage type
+COST_METRIC = os.environ.get('COST_METRIC', 'UnblendedCost')
+
+# Days of an open month before its last fetched day that are fetched again,
+# because Cost Explorer keeps revising the estimates of recent days
+COST_REFRESH_DAYS = int(os.environ.get('COST_REFRESH_DAYS', '3'))
+
+# Days after a month ends until its costs are final and cached for good
+COST_FINALIZE_DAYS = int(os.environ.get('COST_FINALIZE_DAYS', '5'))
+
+GROUP_BY = [{'Type': 'DIMENSION', 'Key': 'SERVICE'}, {'Type': 'DIMENSION', 'Key': 'USAGE_TYPE'}]
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    """Return the first day of a month and the first day of the next one."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+def previous_month(year: int, month: int) -> Tuple[int, int]:
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+def fetch_cost_and_usage(ce, start: date, end: date) -> List[CostItem]:
+    """
+    Fetch the daily cost of every service and usage type in [start, end).
+
+    Follows NextPageToken until every page has been read; throttled pages are
+    retried with jittered backoff. Returns (day, service, usage type, amount,
+    unit) items.
+    """
+    request = {
+        'TimePeriod': {'Start': start.isoformat(), 'End': end.isoformat()},
+        'Granularity': 'DAILY',
+        'Metrics': [COST_METRIC],
+        'GroupBy': GROUP_BY
+    }
+    items = []
+    pages = 0
+    while True:
+        response = call_with_retry(lambda: ce.get_cost_and_usage(**request))
+        pages += 1
+        for result in response.get('ResultsByTime', []):
+            day = result['TimePeriod']['Start']
+            for group in result.get('Groups', []):
+                service, usage_type = (group.get('Keys', []) + ['', ''])[:2]
+                metric = group.get('Metrics', {}).get(COST_METRIC, {})
+                items.append((day, service, usage_type, float(metric.get('Amount', 0)), metric.get('Unit', 'USD')))
+
+        token = response.get('NextPageToken')
+        if not token:
+            break
+        request['NextPageToken'] = token
+
+    instrumentation.count('costPages', pages)
+    return items
+
+def get_month_costs(aws_access_key: str, aws_secret_key: str, year: int, month: int,
+                    today: Optional[date] = None) -> Tuple[List[CostItem], bool]:
+    """
+    Return the daily cost items of a month and whether the month is closed.
+
+    Costs come from the cost cache where possible. A closed month (ended at
+    least COST_FINALIZE_DAYS ago) is fetched once and never again; for an
+    open month only the days from COST_REFRESH_DAYS before the last fetch
+    on are requested, so reports over many accounts and months cost one
+    small Cost Explorer query per account for the current month.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    start, end = month_bounds(year, month)
+    if start > today:
+        raise ValueError(f'No costs for the future month {month}/{year}')
+
+    closed = today >= end + timedelta(days=COST_FINALIZE_DAYS)
+    # Cost Explorer's end date is exclusive; today's costs are partial and refreshed next time
+    fetch_end = min(end, today + timedelta(days=1))
+    account = credentials_fingerprint(aws_access_key)
+    month_key = start.strftime('%Y-%m')
+
+    cache = get_cost_cache()
+    state = cache.month_state(account, month_key) if cache is not None else None
+    if state is not None and state[1]:
+        instrumentation.count('costMonthsCached')
+        return cache.load(account, start.isoformat(), end.isoformat()), True
+
+    fetch_start = start
+    if state is not None:
+        fetched_until = date.fromisoformat(state[0])
+        fetch_start = max(start, fetched_until - timedelta(days=COST_REFRESH_DAYS))
+
+    if fetch_start >= fetch_end:
+        return cache.load(account, start.isoformat(), end.isoformat()), closed
+
+    ce = get_aws_client('ce', COST_EXPLORER_REGION, aws_access_key, aws_secret_key,
+                        endpoint_url=COST_EXPLORER_ENDPOINT or None)
+    logger.info(f"Fetching costs for {month_key} from {fetch_start} to {fetch_end}")
+    with instrumentation.span('fetch_costs', month=month_key, days=(fetch_end - fetch_start).days):
+        items = fetch_cost_and_usage(ce, fetch_start, fetch_end)
+
+    if cache is None:
+        return items, closed
+
+    cache.store(account, month_key, fetch_start.isoformat(), fetch_end.isoformat(), items, closed)
+    return cache.load(account, start.isoformat(), end.isoformat()), closed
+
+def summarize_costs(items: List[CostItem]) -> Dict[str, Any]:
+    """Aggregate daily cost items into totals per service, per usage type and per day."""
+    services: Dict[str, float] = {}
+    usage_types: Dict[Tuple[str, str], float] = {}
+    days: Dict[str, float] = {}
+    units = set()
+    for day, service, usage_type, amount, unit in items:
+        services[service] = services.get(service, 0.0) + amount
+        usage_types[(service, usage_type)] = usage_types.get((service, usage_type), 0.0) + amount
+        days[day] = days.get(day, 0.0) + amount
+        units.add(unit)
+
+    return {
+        'currency': units.pop() if len(units) == 1 else 'USD',
+        'total': sum(services.values()),
+        'services': sorted(services.items(), key=lambda item: -item[1]),
+        'usageTypes': sorted(((service, usage_type, amount) for (service, usage_type), amount in usage_types.items()),
+                             key=lambda item: -item[2]),
+        'days': sorted(days.items()),
+        'lastDay': max(days) if days else None
+    }
+
+def get_billing_data(aws_access_key: str, aws_secret_key: str, month: int, year: int,
+                     today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Return the billing report data of a month: its costs per service and usage
+    type, compared with the previous month.
+
+    The previous month is almost always closed, so after the first report of
+    an account it comes from the cost cache without any Cost Explorer call.
+    """
+    if not aws_access_key or not aws_secret_key:
+        raise ValueError("AWS credentials are required")
+
+    items, closed = get_month_costs(aws_access_key, aws_secret_key, year, month, today)
+    billing = summarize_costs(items)
+    billing.update(month=month, year=year, closed=closed)
+
+    previous_year, previous = previous_month(year, month)
+    try:
+        previous_items, _ = get_month_costs(aws_access_key, aws_secret_key, previous_year, previous, today)
+        previous_summary = summarize_costs(previous_items)
+        billing['previousTotal'] = previous_summary['total']
+        billing['previousServices'] = dict(previous_summary['services'])
+    except Exception as e:
+        # The comparison is optional, e.g. for accounts without history
+        logger.warning(f"Failed to get costs of {previous}/{previous_year}: {str(e)}")
+        instrumentation.count('collectionFailures')
+        billing['previousTotal'] = None
+        billing['previousServices'] = {}
+
+    instrumentation.count('costItems', len(items))
+    return billing
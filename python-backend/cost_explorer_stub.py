@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the AWS Cost Explorer GetCostAndUsage API.
+
+Answers the JSON protocol boto3 speaks with deterministic synthetic daily
+costs per service and usage type, split into pages linked by NextPageToken,
+so the billing report can be run, tested and benchmarked offline:
+
+    python cost_explorer_stub.py --port 8766
+    COST_EXPLORER_ENDPOINT=http://127.0.0.1:8766 ...
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (service, usage type, typical daily cost in USD) of the synthetic account
+USAGE_TYPES = [
+    ('Amazon Elastic Compute Cloud - Compute', 'USE1-BoxUsage:t3.medium', 24.0),
+    ('Amazon Elastic Compute Cloud - Compute', 'USE1-BoxUsage:m5.large', 41.0),
+    ('Amazon Elastic Compute Cloud - Compute', 'USE1-EBS:VolumeUsage.gp3', 9.5),
+    ('Amazon Relational Database Service', 'USE1-InstanceUsage:db.t3.medium', 17.0),
+    ('Amazon Relational Database Service', 'USE1-RDS:GP2-Storage', 3.2),
+    ('Amazon Simple Storage Service', 'USE1-TimedStorage-ByteHrs', 6.1),
+    ('Amazon Simple Storage Service', 'USE1-Requests-Tier1', 0.8),
+    ('Amazon CloudFront', 'US-DataTransfer-Out-Bytes', 5.4),
+    ('AWS Lambda', 'USE1-Lambda-GB-Second', 1.9),
+    ('Amazon CloudWatch', 'USE1-CW:MetricMonitorUsage', 2.3),
+    ('Amazon Virtual Private Cloud', 'USE1-NatGateway-Hours', 3.1),
+    ('AWS Key Management Service', 'USE1-KMS-Keys', 0.1)
+]
+
+class StubState:
+    """Configuration and counters shared by the request handlers."""
+
+    def __init__(self, seed: int = 0, page_days: int = 7, latency: float = 0.0, throttle_rate: float = 0.0):
+        self.seed = seed
+        self.page_days = max(1, page_days)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.lock = threading.Lock()
+        self.calls = {'GetCostAndUsage': 0, 'throttled': 0, 'days': 0}
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.calls[name] += amount
+
+def daily_cost(seed: int, day: str, service: str, usage_type: str, typical: float) -> float:
+    """Return the same synthetic cost for the same day and usage type on every call."""
+    digest = hashlib.sha256(f'{seed}|{day}|{service}|{usage_type}'.encode('utf-8')).digest()
+    return round(typical * (0.6 + 0.8 * int.from_bytes(digest[:4], 'big') / 2 ** 32), 4)
+
+def results_by_time(state: StubState, start: date, end: date, metric: str) -> List[Dict[str, Any]]:
+    results = []
+    day = start
+    while day < end:
+        day_text = day.isoformat()
+        results.append({
+            'TimePeriod': {'Start': day_text, 'End': (day + timedelta(days=1)).isoformat()},
+            'Total': {},
+            'Groups': [{
+                'Keys': [service, usage_type],
+                'Metrics': {metric: {'Amount': str(daily_cost(state.seed, day_text, service, usage_type, typical)),
+                                     'Unit': 'USD'}}
+            } for service, usage_type, typical in USAGE_TYPES],
+            'Estimated': day >= date.today().replace(day=1)
+        })
+        day += timedelta(days=1)
+    return results
+
+def get_cost_and_usage(state: StubState, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """Answer one GetCostAndUsage call; pages cover state.page_days days each."""
+    period = body.get('TimePeriod', {})
+    try:
+        start = date.fromisoformat(period['Start'])
+        end = date.fromisoformat(period['End'])
+    except (KeyError, ValueError):
+        return 400, {'__type': 'ValidationException', 'message': 'Invalid TimePeriod'}
+    if start >= end:
+        return 400, {'__type': 'ValidationException', 'message': 'Start must be before End'}
+
+    page_start = start + timedelta(days=int(body.get('NextPageToken') or 0))
+    page_end = min(end, page_start + timedelta(days=state.page_days))
+    metric = (body.get('Metrics') or ['UnblendedCost'])[0]
+
+    results = results_by_time(state, page_start, page_end, metric)
+    state.count('days', (page_end - page_start).days)
+
+    response = {
+        'GroupDefinitions': body.get('GroupBy', []),
+        'ResultsByTime': results,
+        'DimensionValueAttributes': []
+    }
+    if page_end < end:
+        response['NextPageToken'] = str((page_end - start).days)
+    return 200, response
+
+def make_handler(state: StubState):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def send_json(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/x-amz-json-1.1')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('x-amzn-RequestId', f'stub-{time.time_ns()}')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = self.rfile.read(length)
+            target = self.headers.get('X-Amz-Target', '')
+
+            if state.latency:
+                time.sleep(state.latency)
+
+            if not target.endswith('.GetCostAndUsage'):
+                self.send_json(400, {'__type': 'UnknownOperationException', 'message': target})
+                return
+
+            if state.throttle_rate and random.random() < state.throttle_rate:
+                state.count('throttled')
+                self.send_json(400, {'__type': 'ThrottlingException', 'message': 'Throttled by stub'})
+                return
+
+            state.count('GetCostAndUsage')
+            status, body = get_cost_and_usage(state, json.loads(payload or b'{}'))
+            self.send_json(status, body)
+
+    return StubHandler
+
+def start_stub_server(host: str = '127.0.0.1', port: int = 0, state: Optional[StubState] = None):
+    """
+    Start the stub on a background thread and return (server, state).
+
+    With port 0 a free port is chosen; it is available as server.server_port.
+    Call server.shutdown() to stop it.
+    """
+    state = state or StubState()
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+def main():
+    parser = argparse.ArgumentParser(description='Local AWS Cost Explorer GetCostAndUsage stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic costs')
+    parser.add_argument('--page-days', type=int, default=7, help='Days returned per page')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='Fraction of calls answered with ThrottlingException')
+    args = parser.parse_args()
+
+    state = StubState(seed=args.seed, page_days=args.page_days, latency=args.latency,
+                      throttle_rate=args.throttle_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    logger.info(f"Cost Explorer stub listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Calls served: {state.calls}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Check that app.py keeps its heavy dependencies off the startup path.
+
+Runs each probe in a fresh interpreter and fails (exit status 1) when a
+probe loads a module it must not load, or takes longer than its budget:
+
+    python import_budget.py [--import-budget 0.75] [--startup-budget 1.5] [--json]
+
+- import-app: `import app` must not load boto3, matplotlib, reportlab,
+  numpy or urllib3, and must stay within the import budget
+- cli-test: `app.py --test` (what the Node bridge runs) must not load
+  them either and must finish within the startup budget
+- azure-demo: generating an Azure demo utilization report must never
+  load boto3/botocore or the Azure Monitor HTTP client
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds `import app` may take (as measured by -X importtime)
+IMPORT_BUDGET_SECONDS = float(os.environ.get('IMPORT_BUDGET_SECONDS', '0.75'))
+
+# Seconds `app.py --test` may take, interpreter start included
+STARTUP_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', '1.5'))
+
+STARTUP_FORBIDDEN = ('boto3', 'botocore', 'matplotlib', 'reportlab', 'numpy', 'urllib3')
+AZURE_DEMO_FORBIDDEN = ('boto3', 'botocore', 'azure_monitor')
+
+AZURE_DEMO_PROBE = """
+import json, os, sys, tempfile
+import app
+params = {
+    'cloudProvider': 'Azure',
+    'reportType': 'utilization',
+    'accountName': 'Import budget',
+    'credentials': {'clientId': 'c', 'clientSecret': 's', 'tenantId': 't', 'subscriptionId': 'sub'},
+    'resources': ['VM|/subscriptions/sub/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/vm1|eastus']
+}
+with tempfile.TemporaryDirectory() as directory:
+    app.generate_report_data(params, output=os.path.join(directory, 'report.pdf'))
+print(json.dumps(sorted(sys.modules)))
+"""
+
+def run_python(args: List[str], env: Optional[Dict[str, str]] = None) -> Tuple[float, subprocess.CompletedProcess]:
+    """Run the current interpreter with args in the backend directory and return (wall seconds, result)."""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable] + args, cwd=BACKEND_DIR, capture_output=True, text=True,
+                               env=dict(os.environ, **(env or {})))
+    return time.perf_counter() - started, completed
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Return the cumulative import seconds of every module in -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+def forbidden_loaded(modules: Iterable[str], forbidden: Iterable[str]) -> List[str]:
+    """Return the forbidden top-level packages among the loaded modules."""
+    loaded = {module.split('.')[0] for module in modules}
+    return sorted(loaded.intersection(forbidden))
+
+def slowest_imports(modules: Dict[str, float], count: int = 5) -> List[Tuple[str, float]]:
+    return sorted(((name, round(seconds, 3)) for name, seconds in modules.items() if '.' not in name),
+                  key=lambda item: -item[1])[:count]
+
+def check_import_app(budget: float) -> Dict[str, Any]:
+    _, completed = run_python(['-X', 'importtime', '-c', 'import app'])
+    modules = parse_importtime(completed.stderr)
+    seconds = modules.get('app', 0.0)
+    return {
+        'check': 'import-app',
+        'seconds': round(seconds, 3),
+        'budget': budget,
+        'forbiddenLoaded': forbidden_loaded(modules, STARTUP_FORBIDDEN),
+        'slowest': slowest_imports(modules),
+        'error': None if completed.returncode == 0 else completed.stderr.strip().splitlines()[-1:],
+        'ok': completed.returncode == 0 and seconds <= budget
+    }
+
+def check_cli_test(budget: float) -> Dict[str, Any]:
+    seconds, completed = run_python(['-X', 'importtime', 'app.py', '--test'])
+    modules = parse_importtime(completed.stderr)
+    return {
+        'check': 'cli-test',
+        'seconds': round(seconds, 3),
+        'budget': budget,
+        'forbiddenLoaded': forbidden_loaded(modules, STARTUP_FORBIDDEN),
+        'slowest': slowest_imports(modules),
+        'error': None if completed.returncode == 0 else completed.stderr.strip().splitlines()[-1:],
+        'ok': completed.returncode == 0 and seconds <= budget
+    }
+
+def check_azure_demo() -> Dict[str, Any]:
+    seconds, completed = run_python(['-c', AZURE_DEMO_PROBE],
+                                    env={'RESULT_CACHE_DIR': '', 'AZURE_METRICS_SOURCE': 'demo'})
+    modules = json.loads(completed.stdout.strip().splitlines()[-1]) if completed.returncode == 0 else []
+    return {
+        'check': 'azure-demo',
+        'seconds': round(seconds, 3),
+        'budget': None,
+        'forbiddenLoaded': forbidden_loaded(modules, AZURE_DEMO_FORBIDDEN),
+        'slowest': [],
+        'error': None if completed.returncode == 0 else completed.stderr.strip().splitlines()[-1:],
+        'ok': completed.returncode == 0
+    }
+
+def format_check(result: Dict[str, Any]) -> str:
+    ok = result['ok'] and not result['forbiddenLoaded']
+    line = f"{'PASS' if ok else 'FAIL'} {result['check']:<11} {result['seconds']:.3f}s"
+    if result['budget'] is not None:
+        line += f" (budget {result['budget']}s)"
+    if result['forbiddenLoaded']:
+        line += f" loaded {', '.join(result['forbiddenLoaded'])}"
+    if result['error']:
+        line += f" error {result['error']}"
+    if result['slowest']:
+        line += ' slowest: ' + ', '.join(f"{name} {seconds}s" for name, seconds in result['slowest'])
+    return line
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the startup imports and import time of app.py')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_SECONDS,
+                        help='Seconds `import app` may take')
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET_SECONDS,
+                        help='Seconds `app.py --test` may take')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    results = [check_import_app(args.import_budget), check_cli_test(args.startup_budget), check_azure_demo()]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(format_check(result))
+
+    if not all(result['ok'] and not result['forbiddenLoaded'] for result in results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
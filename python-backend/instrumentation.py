@@ -0,0 +1,171 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+import service_metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Spans kept individually per trace; further spans only count towards their stage
+MAX_TRACE_SPANS = 500
+
+class ReportTrace:
+    """
+    Timings and counters recorded while one report is generated.
+
+    Stages aggregate every span of the same name (count and seconds), API
+    calls aggregate per 'service.Operation', and counters hold totals such as
+    chart bytes. Recording is thread-safe; work handed to other threads is
+    attributed to the trace when it runs in a copy of the submitting context
+    (see run_ordered and in_current_context).
+    """
+
+    def __init__(self, name: str = 'report'):
+        self.name = name
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self.spans: List[Dict[str, Any]] = []
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.api_calls: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+
+    def add_span(self, name: str, started: float, seconds: float, attrs: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(name, {'count': 0, 'seconds': 0.0})
+            stage['count'] += 1
+            stage['seconds'] += seconds
+            if len(self.spans) < MAX_TRACE_SPANS:
+                span = {'name': name, 'start': round(started - self._started, 6), 'seconds': round(seconds, 6)}
+                if attrs:
+                    span['attrs'] = attrs
+                self.spans.append(span)
+
+    def add_api_call(self, call: str, seconds: float, error: Optional[str] = None,
+                     throttled: bool = False, retries: int = 0) -> None:
+        with self._lock:
+            stats = self.api_calls.setdefault(call, {'count': 0, 'seconds': 0.0, 'maxSeconds': 0.0,
+                                                     'errors': 0, 'throttles': 0, 'retries': 0})
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['maxSeconds'] = max(stats['maxSeconds'], seconds)
+            stats['errors'] += 1 if error else 0
+            stats['throttles'] += 1 if throttled else 0
+            stats['retries'] += retries
+
+    def add(self, counter: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def finish(self) -> None:
+        if self._finished is None:
+            self._finished = time.perf_counter()
+
+    @property
+    def total_seconds(self) -> float:
+        return (self._finished or time.perf_counter()) - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the full trace as a JSON-serialisable dict."""
+        with self._lock:
+            return {
+                'name': self.name,
+                'startedAt': self.started_at,
+                'totalSeconds': round(self.total_seconds, 6),
+                'stages': {name: {'count': stage['count'], 'seconds': round(stage['seconds'], 6)}
+                           for name, stage in self.stages.items()},
+                'apiCalls': {call: dict(stats, seconds=round(stats['seconds'], 6),
+                                        maxSeconds=round(stats['maxSeconds'], 6))
+                             for call, stats in self.api_calls.items()},
+                'counters': dict(self.counters),
+                'spans': list(self.spans)
+            }
+
+    def summary(self) -> Dict[str, Any]:
+        """Return a compact form of the trace (no individual spans), small enough for an HTTP header."""
+        with self._lock:
+            return {
+                'totalSeconds': round(self.total_seconds, 3),
+                'stages': {name: round(stage['seconds'], 3) for name, stage in self.stages.items()},
+                'apiCalls': {call: int(stats['count']) for call, stats in self.api_calls.items()},
+                'throttles': int(sum(stats['throttles'] for stats in self.api_calls.values())),
+                'counters': dict(self.counters)
+            }
+
+_current_trace: 'contextvars.ContextVar[Optional[ReportTrace]]' = contextvars.ContextVar('report_trace',
+                                                                                         default=None)
+
+def current_trace() -> Optional[ReportTrace]:
+    """Return the trace of the report being generated in this context, if any."""
+    return _current_trace.get()
+
+@contextmanager
+def start_trace(name: str = 'report') -> Iterator[ReportTrace]:
+    """Record everything instrumented within the block into a new ReportTrace."""
+    trace = ReportTrace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[None]:
+    """Time the block as a span of the current trace; a no-op without one."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, started, time.perf_counter() - started, attrs or None)
+
+def count(counter: str, amount: float = 1) -> None:
+    """Add amount to a counter of the current trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(counter, amount)
+
+def record_api_call(service: str, operation: str, seconds: float, error: Optional[str] = None,
+                    throttled: bool = False, retries: int = 0) -> None:
+    """
+    Record one cloud API call (including its SDK-level retries) in the
+    current trace and in the service metrics, which count calls made outside
+    reports too.
+    """
+    service_metrics.record_api_call(service, operation, seconds, error, throttled, retries)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_api_call(f"{service}.{operation}", seconds, error, throttled, retries)
+
+def in_current_context(func: Callable[..., T]) -> Callable[..., T]:
+    """Wrap func to run in a copy of the calling context, so it records into the caller's trace on any thread."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+def trace_path(output_path: str) -> str:
+    """Return the path of the JSON trace written beside a report."""
+    return f"{output_path}.trace.json"
+
+def write_trace(trace: ReportTrace, output_path: str) -> Optional[str]:
+    """Write the trace as JSON beside the report at output_path and return its path."""
+    path = trace_path(output_path)
+    try:
+        with open(path, 'w') as f:
+            json.dump(trace.to_dict(), f, indent=2)
+    except OSError as e:
+        logger.warning(f"Failed to write report trace {path}: {str(e)}")
+        return None
+    return path
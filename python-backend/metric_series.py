@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional, Tuple
+
+import numpy as np
+
+BYTES_PER_GB = 1024 * 1024 * 1024
+
+def get_metric_period(period_days: int) -> int:
+    """Return the aggregation period in seconds of the metrics of a report window."""
+    # Use 30-minute intervals for weekly reports, 5-minute intervals for daily
+    return 1800 if period_days > 1 else 300
+
+class MetricSeries:
+    """
+    A metric time series stored as two NumPy columns: int64 epoch-second
+    timestamps and float64 values, kept sorted by time.
+
+    Replaces the lists of datapoint dicts and datetimes that used to travel
+    from the collectors to the report generator; sorting, unit conversion,
+    aggregates and percentiles are all vectorised.
+    """
+
+    __slots__ = ('timestamps', 'values')
+
+    def __init__(self, timestamps: Any = (), values: Any = (), assume_sorted: bool = False):
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if timestamps.shape != values.shape:
+            raise ValueError(f"Timestamps and values differ in length: {timestamps.shape} vs {values.shape}")
+
+        if not assume_sorted and len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps = timestamps[order]
+            values = values[order]
+
+        self.timestamps = timestamps
+        self.values = values
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[int, float]]) -> 'MetricSeries':
+        """Build a series from (epoch seconds, value) pairs."""
+        array = np.asarray(list(pairs), dtype=np.float64).reshape(-1, 2)
+        return cls(array[:, 0].astype(np.int64), array[:, 1])
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __repr__(self) -> str:
+        return f"MetricSeries({len(self)} points)"
+
+    def scaled(self, factor: float) -> 'MetricSeries':
+        """Return a copy with every value multiplied by factor (e.g. for unit conversion)."""
+        return MetricSeries(self.timestamps, self.values * factor, assume_sorted=True)
+
+    def bytes_to_gb(self) -> 'MetricSeries':
+        """Return a copy with byte values converted to gigabytes."""
+        return self.scaled(1.0 / BYTES_PER_GB)
+
+    @property
+    def average(self) -> float:
+        return float(self.values.mean()) if len(self) else 0
+
+    @property
+    def min(self) -> float:
+        return float(self.values.min()) if len(self) else 0
+
+    @property
+    def max(self) -> float:
+        return float(self.values.max()) if len(self) else 0
+
+    def percentile(self, q: float) -> float:
+        """Return the q-th percentile (0-100) of the values, or 0 for an empty series."""
+        return float(np.percentile(self.values, q)) if len(self) else 0
+
+    def downsampled(self, max_points: int) -> 'MetricSeries':
+        """
+        Return at most max_points points chosen with Largest-Triangle-Three-Buckets.
+
+        The first and last points are kept and every bucket in between keeps
+        the point forming the largest triangle with the previously kept point
+        and the average of the next bucket, so peaks and dips survive. Series
+        that are already short enough are returned unchanged. Only use the
+        result for drawing; aggregates belong to the full series.
+        """
+        count = len(self)
+        if max_points < 3 or count <= max_points:
+            return self
+
+        x = self.timestamps.astype(np.float64)
+        y = self.values
+        # max_points - 2 buckets over the points between the first and last
+        edges = np.linspace(1, count - 1, max_points - 1).astype(np.int64)
+        selected = np.empty(max_points, dtype=np.int64)
+        selected[0] = 0
+        selected[-1] = count - 1
+
+        previous = 0
+        for bucket in range(max_points - 2):
+            start, end = edges[bucket], edges[bucket + 1]
+            next_end = edges[bucket + 2] if bucket + 2 < len(edges) else count
+            next_x = x[end:next_end].mean()
+            next_y = y[end:next_end].mean()
+
+            areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                           - (x[previous] - x[start:end]) * (next_y - y[previous]))
+            previous = start + int(np.argmax(areas))
+            selected[bucket + 1] = previous
+
+        return MetricSeries(self.timestamps[selected], self.values[selected], assume_sorted=True)
+
+    def datetimes(self) -> np.ndarray:
+        """Return the timestamps as a datetime64[s] array (UTC), which matplotlib plots directly."""
+        return self.timestamps.astype('datetime64[s]')
+
+    def start_datetime(self) -> Optional[datetime]:
+        """Return the first timestamp as an aware UTC datetime."""
+        return datetime.fromtimestamp(int(self.timestamps[0]), timezone.utc) if len(self) else None
+
+    def end_datetime(self) -> Optional[datetime]:
+        """Return the last timestamp as an aware UTC datetime."""
+        return datetime.fromtimestamp(int(self.timestamps[-1]), timezone.utc) if len(self) else None
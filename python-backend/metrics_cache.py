@@ -0,0 +1,249 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# The cache is disabled unless a database path is configured
+METRICS_CACHE_PATH = os.environ.get('METRICS_CACHE_PATH', '')
+
+# Eviction limits: total stored datapoints and age of datapoints/series
+METRICS_CACHE_MAX_POINTS = int(os.environ.get('METRICS_CACHE_MAX_POINTS', '20000000'))
+METRICS_CACHE_MAX_AGE_DAYS = float(os.environ.get('METRICS_CACHE_MAX_AGE_DAYS', '35'))
+
+# The most recent datapoints can still change while CloudWatch ingests late
+# data, so this trailing part of every fetch is requested again next time.
+METRICS_CACHE_SETTLE_SECONDS = int(os.environ.get('METRICS_CACHE_SETTLE_SECONDS', '900'))
+
+# Minimum time between two eviction passes
+EVICTION_INTERVAL_SECONDS = 300
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS series (
+    series_key TEXT PRIMARY KEY,
+    fetched_from INTEGER NOT NULL,
+    fetched_until INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    points INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS datapoints (
+    series_key TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series_key, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS series_last_access ON series (last_access);
+CREATE INDEX IF NOT EXISTS datapoints_ts ON datapoints (ts);
+'''
+
+def make_series_key(account: str, region: str, namespace: str, metric_name: str,
+                    dimensions: List[Dict[str, str]], period: int, statistic: str) -> str:
+    """Return the cache key of one metric series."""
+    identity = json.dumps(
+        [account, region, namespace, metric_name,
+         sorted((d['Name'], d['Value']) for d in dimensions), period, statistic],
+        separators=(',', ':')
+    )
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+class MetricsCache:
+    """
+    On-disk time-series cache of CloudWatch datapoints.
+
+    Each series remembers the contiguous interval [fetched_from, fetched_until]
+    it holds, so the next report only needs to request the tail that is not
+    covered yet. Datapoints older than max_age_days and series not read for
+    that long are dropped, and when more than max_points datapoints are stored
+    the least recently read series are evicted first. Every series keeps the
+    number of datapoints it holds, so eviction never has to count the
+    datapoints table.
+    """
+
+    def __init__(self, path: str, max_points: int = METRICS_CACHE_MAX_POINTS,
+                 max_age_days: float = METRICS_CACHE_MAX_AGE_DAYS,
+                 settle_seconds: int = METRICS_CACHE_SETTLE_SECONDS):
+        self.path = path
+        self.max_points = max_points
+        self.max_age_seconds = max_age_days * 86400
+        self.settle_seconds = settle_seconds
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # One shared connection guarded by a lock; WAL lets several worker
+        # processes read the same file while one of them writes.
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(series)')]
+        if 'points' not in columns:
+            # Caches created before series kept their datapoint counts
+            self._conn.execute('ALTER TABLE series ADD COLUMN points INTEGER NOT NULL DEFAULT 0')
+            self._conn.execute('UPDATE series SET points = '
+                               '(SELECT COUNT(*) FROM datapoints d WHERE d.series_key = series.series_key)')
+        self._conn.commit()
+
+    def missing_interval(self, series_key: str, start: int, end: int, period: int) -> Optional[Tuple[int, int]]:
+        """
+        Return the (start, end) epoch interval that still has to be fetched
+        for the window [start, end], or None when the cache covers it.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fetched_from, fetched_until FROM series WHERE series_key = ?',
+                (series_key,)
+            ).fetchone()
+
+        if row is None:
+            return start, end
+
+        fetched_from, fetched_until = row
+        if fetched_from > start or fetched_until < start:
+            # No overlap with the cached interval, fetch the whole window
+            return start, end
+        if fetched_until >= end:
+            return None
+
+        # Only the tail is missing; align it to the period so buckets line up
+        return fetched_until - (fetched_until % period), end
+
+    def store(self, series_key: str, datapoints: List[Tuple[int, float]],
+              fetched_from: int, fetched_until: int) -> None:
+        """Store fetched datapoints and extend the covered interval of the series."""
+        self.store_many([(series_key, datapoints, fetched_from, fetched_until)])
+
+    def store_many(self, entries: List[Tuple[str, List[Tuple[int, float]], int, int]]) -> None:
+        """store() for many (series_key, datapoints, fetched_from, fetched_until) entries in one transaction."""
+        now = time.time()
+
+        with self._lock:
+            for series_key, datapoints, fetched_from, fetched_until in entries:
+                # Do not claim coverage of the still-settling tail
+                covered_until = max(fetched_from, fetched_until - self.settle_seconds)
+
+                row = self._conn.execute(
+                    'SELECT fetched_from, fetched_until, points FROM series WHERE series_key = ?',
+                    (series_key,)
+                ).fetchone()
+                points = 0
+                if row is not None and row[0] <= fetched_from <= row[1]:
+                    # Tail refresh: the fetched datapoints replace the cached ones from
+                    # fetched_from on, and the earlier start of the cached interval is kept
+                    removed = self._conn.execute('DELETE FROM datapoints WHERE series_key = ? AND ts >= ?',
+                                                 (series_key, fetched_from)).rowcount
+                    points = row[2] - removed
+                    fetched_from = row[0]
+                elif row is not None:
+                    # The new fetch does not connect to the old interval, start over
+                    self._conn.execute('DELETE FROM datapoints WHERE series_key = ?', (series_key,))
+
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO datapoints (series_key, ts, value) VALUES (?, ?, ?)',
+                    [(series_key, ts, value) for ts, value in datapoints]
+                )
+                points += len({ts for ts, _ in datapoints})
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO series (series_key, fetched_from, fetched_until, last_access, points) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (series_key, fetched_from, covered_until, now, points)
+                )
+            self._conn.commit()
+
+        self.evict_if_due()
+
+    def load(self, series_key: str, start: int, end: int) -> List[Tuple[int, float]]:
+        """Return the cached (epoch, value) datapoints of a series within [start, end]."""
+        return self.load_many([series_key], start, end)[0]
+
+    def load_many(self, series_keys: List[str], start: int, end: int) -> List[List[Tuple[int, float]]]:
+        """load() for many series in one transaction, in series_keys order."""
+        now = time.time()
+        with self._lock:
+            results = [
+                self._conn.execute(
+                    'SELECT ts, value FROM datapoints WHERE series_key = ? AND ts >= ? AND ts <= ? ORDER BY ts',
+                    (series_key, start, end)
+                ).fetchall()
+                for series_key in series_keys
+            ]
+            self._conn.executemany('UPDATE series SET last_access = ? WHERE series_key = ?',
+                                   [(now, series_key) for series_key in series_keys])
+            self._conn.commit()
+        return results
+
+    def evict_if_due(self) -> None:
+        """Run evict() if the last eviction pass is old enough."""
+        if time.monotonic() - self._last_eviction >= EVICTION_INTERVAL_SECONDS:
+            self.evict()
+
+    def evict(self) -> None:
+        """Apply the age and size limits."""
+        self._last_eviction = time.monotonic()
+        cutoff = int(time.time() - self.max_age_seconds)
+
+        with self._lock:
+            # Both statements use the timestamp index, so a pass only touches
+            # the datapoints that have aged out since the previous one
+            expired = self._conn.execute(
+                'SELECT series_key, COUNT(*) FROM datapoints WHERE ts < ? GROUP BY series_key', (cutoff,)
+            ).fetchall()
+            self._conn.execute('DELETE FROM datapoints WHERE ts < ?', (cutoff,))
+            self._conn.executemany('UPDATE series SET points = points - ? WHERE series_key = ?',
+                                   [(count, series_key) for series_key, count in expired])
+            # The pruned series no longer cover anything before the cutoff
+            self._conn.execute('UPDATE series SET fetched_from = ? WHERE fetched_from < ?', (cutoff, cutoff))
+
+            stale = [row[0] for row in self._conn.execute(
+                'SELECT series_key FROM series WHERE last_access < ? OR fetched_until < ?',
+                (time.time() - self.max_age_seconds, cutoff)
+            )]
+            self._delete_series(stale)
+
+            total = self._conn.execute('SELECT COALESCE(SUM(points), 0) FROM series').fetchone()[0]
+            if total > self.max_points:
+                # Drop least recently read series until we are under the limit
+                for series_key, points in self._conn.execute(
+                    'SELECT series_key, points FROM series ORDER BY last_access'
+                ).fetchall():
+                    if total <= self.max_points:
+                        break
+                    self._delete_series([series_key])
+                    total -= points
+            self._conn.commit()
+
+    def _delete_series(self, series_keys: List[str]) -> None:
+        for series_key in series_keys:
+            self._conn.execute('DELETE FROM datapoints WHERE series_key = ?', (series_key,))
+            self._conn.execute('DELETE FROM series WHERE series_key = ?', (series_key,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_cache: Optional[MetricsCache] = None
+_cache_lock = threading.Lock()
+
+def get_metrics_cache() -> Optional[MetricsCache]:
+    """Return the process-wide metrics cache, or None when METRICS_CACHE_PATH is not set."""
+    global _cache
+    if not METRICS_CACHE_PATH:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = MetricsCache(METRICS_CACHE_PATH)
+            except Exception as e:
+                logger.error(f"Failed to open metrics cache {METRICS_CACHE_PATH}: {str(e)}")
+                return None
+        return _cache
@@ -1,161 +1,259 @@
 import io
 import os
 import logging
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from chart_renderer import (CHART_DPI, CHART_FIGSIZE, CHART_FORMAT, CHART_PIXEL_WIDTH, LINE_COLOR, get_chart_renderer,
+                            render_error_chart)
+from result_cache import get_chart_cache, make_chart_key
+import instrumentation
+from vector_chart import create_chart_drawing
+from report_styles import PARAGRAPH_STYLES, create_table
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Frame, PageTemplate
 from reportlab.lib.units import inch
 from datetime import datetime
-import pytz
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_chart(timestamps, values, metric_name, instance_name, avg, min_val, max_val):
+# Number of processes used to render charts; 1 renders them in-process
+CHART_RENDER_WORKERS = int(os.environ.get('CHART_RENDER_WORKERS', str(min(os.cpu_count() or 1, 4))))
+
+# Most points drawn per chart line. Long series are downsampled to about one
+# point per two pixels of chart width, which the 2.5 px line cannot resolve
+# any finer; the statistics are still computed from every datapoint.
+CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', str(CHART_PIXEL_WIDTH // 2)))
+
+# Services and usage types listed individually in billing reports
+TOP_SERVICES = 15
+TOP_USAGE_TYPES = 20
+
+# Resources whose charts are rendered and laid out together; bounds how many
+# chart images a report holds in memory at once
+REPORT_CHUNK_SIZE = int(os.environ.get('REPORT_CHUNK_SIZE', '25'))
+
+# Everything besides the job arguments that changes how a PNG chart looks;
+# bump the version whenever ChartRenderer draws differently
+CHART_STYLE = {
+    'version': 1,
+    'figsize': CHART_FIGSIZE,
+    'dpi': CHART_DPI,
+    'color': LINE_COLOR
+}
+
+# Metrics charted for every resource, in report order
+CHART_METRICS = [
+    ('cpu', 'CPU Utilization'),
+    ('memory', 'Memory Utilization'),
+    ('disk', 'Disk Utilization')
+]
+
+_chart_executor = None
+_chart_executor_workers = 0
+_chart_executor_lock = threading.Lock()
+
+def create_chart(series, metric_name, instance_name, avg, min_val, max_val):
     """Create a chart for the metric and return as bytes."""
+    return create_chart_result((series, metric_name, instance_name, avg, min_val, max_val))[0]
+
+def create_chart_result(job):
+    """
+    Render one chart job, an argument tuple for create_chart.
+    
+    Returns (chart bytes, ok); ok is False when an error chart was drawn
+    instead, which must not be cached.
+    """
     try:
-        plt.figure(figsize=(10, 4))
-        
-        # Plot the data with a bright, highlighted color
-        plt.plot(timestamps, values, color='#FF0066', linewidth=2.5, 
-                 marker='o', markersize=3, markerfacecolor='#FF0066', 
-                 label='Average', alpha=0.9)
-        
-        # Add average line
-        plt.axhline(y=avg, color='#FF0066', linestyle='-', alpha=0.5, label='Average')
-        
-        # Format x-axis to show dates
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M', tz=pytz.UTC))
-        plt.gca().xaxis.set_major_locator(mdates.HourLocator(interval=3))
-        
-        # Add grid
-        plt.grid(True, linestyle='--', alpha=0.7)
-        
-        # Set labels and title
-        plt.xlabel('Time', fontweight='bold')
-        
-        # Check if the metric is memory or disk (where we use GB)
-        if 'gb' in metric_name.lower() or any(word in metric_name.lower() for word in ['memory', 'disk']):
-            unit = 'GB'
-            plt.ylabel(f"{metric_name} ({unit})", fontweight='bold')
-        else:
-            unit = 'Percent'
-            plt.ylabel(f"{metric_name} ({unit})", fontweight='bold')
-        
-        # Find the start and end times from the available timestamps
-        if timestamps:
-            start_time = min(timestamps)
-            end_time = max(timestamps)
-            
-            # Format the time span in the title
-            start_str = start_time.strftime('%Y-%m-%d %H:%M')
-            end_str = end_time.strftime('%Y-%m-%d %H:%M')
-            plt.title(f'{instance_name}: {metric_name}\n{start_str} to {end_str}', fontweight='bold')
-            
-            # Set explicit x-axis range based on the data
-            plt.xlim(start_time, end_time)
-        else:
-            plt.title(f'{instance_name}: {metric_name}\nNo data available', fontweight='bold')
-        
-        # Add legend
-        plt.legend(loc='upper right', frameon=True)
-        
-        # Add statistics
-        if unit == 'Percent':
-            stats_text = f"Min: {min_val:.2f}% | Max: {max_val:.2f}% | Avg: {avg:.2f}%"
-        else:
-            stats_text = f"Min: {min_val:.2f} GB | Max: {max_val:.2f} GB | Avg: {avg:.2f} GB"
-        plt.figtext(0.5, 0.01, stats_text, ha='center', fontsize=10, fontweight='bold')
-        
-        # Tight layout to maximize graph area
-        plt.tight_layout()
-        
-        # Save plot to bytes
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-        plt.close()
-        buf.seek(0)
-        
-        return buf.getvalue()
+        return get_chart_renderer().render(*job), True
     except Exception as e:
         logger.error(f"Error creating chart: {str(e)}")
         # Create error chart
-        plt.figure(figsize=(10, 4))
-        plt.text(0.5, 0.5, f'Error creating chart: {str(e)}', horizontalalignment='center', verticalalignment='center')
-        plt.tight_layout()
-        
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=150)
-        plt.close()
-        buf.seek(0)
-        
-        return buf.getvalue()
+        return render_error_chart(f'Error creating chart: {str(e)}'), False
 
-def wrap_table_data(data):
-    """Helper function to wrap table data cells as paragraphs for better formatting"""
-    wrapped_data = []
-    styles = getSampleStyleSheet()
-    
-    for row in data:
-        wrapped_row = []
-        for cell in row:
-            if not isinstance(cell, Paragraph):
-                wrapped_row.append(Paragraph(str(cell), styles['Normal']))
-            else:
-                wrapped_row.append(cell)
-        wrapped_data.append(wrapped_row)
-    
-    return wrapped_data
+def chart_job_key(job):
+    """Return the result cache key of a PNG chart job."""
+    series, metric_name, instance_name, avg, min_val, max_val = job
+    return make_chart_key(series, CHART_STYLE, metric_name, instance_name, avg, min_val, max_val)
 
-def create_utilization_report(doc, elements, account_name, metrics_data, cloud_provider):
-    """Create utilization report content"""
-    styles = getSampleStyleSheet()
-    
-    # Define custom styles
-    title_style = ParagraphStyle(
-        name='TitleStyle',
-        parent=styles['Title'],
-        fontSize=18,
-        alignment=1,  # Center alignment
-        spaceAfter=0.2*inch
-    )
+def get_chart_executor(workers):
+    """Return the shared chart rendering pool, (re)creating it for the requested size."""
+    global _chart_executor, _chart_executor_workers
+    with _chart_executor_lock:
+        if _chart_executor is None or _chart_executor_workers != workers:
+            if _chart_executor is not None:
+                _chart_executor.shutdown(wait=False)
+            # spawn rather than fork: the Flask service forks from a threaded process
+            _chart_executor = ProcessPoolExecutor(max_workers=workers,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+            _chart_executor_workers = workers
+        return _chart_executor
+
+def shutdown_chart_executor(wait=True):
+    """Stop the shared chart rendering pool; the next report starts a new one."""
+    global _chart_executor, _chart_executor_workers
+    with _chart_executor_lock:
+        if _chart_executor is not None:
+            _chart_executor.shutdown(wait=wait)
+            _chart_executor = None
+            _chart_executor_workers = 0
+
+def render_charts(chart_jobs, workers=None):
+    """
+    Render chart jobs and return the PNG bytes in job order.
+    
+    Charts found in the result cache (see get_chart_cache) are reused and
+    only the others are drawn. With more than one worker the charts are drawn
+    in a process pool that is kept alive across reports; results are gathered
+    with executor.map, so the order (and therefore the PDF) does not depend on
+    which worker finished first.
+    """
+    cache = get_chart_cache()
+    if cache is None:
+        return [chart for chart, _ in render_chart_results(chart_jobs, workers)]
+    
+    keys = [chart_job_key(job) for job in chart_jobs]
+    charts = [cache.get(key) for key in keys]
+    missing = [index for index, chart in enumerate(charts) if chart is None]
+    instrumentation.count('chartCacheHits', len(charts) - len(missing))
+    
+    results = render_chart_results([chart_jobs[index] for index in missing], workers)
+    for index, (chart, ok) in zip(missing, results):
+        charts[index] = chart
+        if ok:
+            cache.put(keys[index], chart)
+    return charts
+
+def render_chart_results(chart_jobs, workers=None):
+    """Draw chart jobs and return their (chart bytes, ok) results in job order."""
+    if not chart_jobs:
+        return []
+    if workers is None:
+        workers = CHART_RENDER_WORKERS
+    workers = max(1, min(workers, len(chart_jobs)))
+    
+    if workers == 1:
+        return [create_chart_result(job) for job in chart_jobs]
+    
+    executor = get_chart_executor(workers)
+    # Hand out jobs in chunks to keep inter-process overhead low
+    chunksize = max(1, len(chart_jobs) // (workers * 4))
+    return list(executor.map(create_chart_result, chart_jobs, chunksize=chunksize))
+
+def render_chart_flowables(chart_jobs, workers=None, chart_format=None):
+    """
+    Render chart jobs as flowables in job order.
     
-    header_style = ParagraphStyle(
-        name='HeaderStyle',
-        parent=styles['Heading1'],
-        fontSize=14,
-        spaceAfter=0.1*inch
-    )
+    'png' charts are rasterised by matplotlib (see render_charts) and embedded
+    as images; 'vector' charts are reportlab Drawings written to the PDF as
+    vector paths, which are much smaller and cheap enough to build in-process.
+    """
+    if chart_format is None:
+        chart_format = CHART_FORMAT
     
-    subheader_style = ParagraphStyle(
-        name='SubHeaderStyle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        spaceAfter=0.1*inch
-    )
+    instrumentation.count('charts', len(chart_jobs))
     
-    label_style = ParagraphStyle(
-        name='LabelStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceBefore=0.1*inch,
-        spaceAfter=0.05*inch,
-        fontName='Helvetica-Bold'
-    )
+    if chart_format == 'vector':
+        with instrumentation.span('render_charts', format='vector', charts=len(chart_jobs)):
+            return [create_chart_drawing(*job) for job in chart_jobs]
     
-    remark_style = ParagraphStyle(
-        name='RemarkStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=0.1*inch,
-        fontName='Helvetica-Oblique'
-    )
+    with instrumentation.span('render_charts', format='png', charts=len(chart_jobs)):
+        charts = render_charts(chart_jobs, workers)
+    instrumentation.count('chartBytes', sum(len(chart) for chart in charts))
+    
+    return [Image(io.BytesIO(chart), width=6.5*inch, height=3*inch) for chart in charts]
+
+def collect_chart_jobs(metrics_data, max_points=None):
+    """
+    List the create_chart arguments of every chart in a utilization report, in report order.
+    
+    The plotted series is downsampled to max_points while min/max/average
+    come from the full-resolution series.
+    """
+    if max_points is None:
+        max_points = CHART_MAX_POINTS
+    
+    chart_jobs = []
+    for resource in metrics_data:
+        if 'metrics' not in resource:
+            continue
+        for metric_key, metric_name in CHART_METRICS:
+            metric_data = resource['metrics'].get(metric_key)
+            if metric_data is not None and len(metric_data):
+                chart_jobs.append((
+                    metric_data.downsampled(max_points),
+                    metric_name,
+                    resource['name'],
+                    metric_data.average,
+                    metric_data.min,
+                    metric_data.max
+                ))
+    return chart_jobs
+
+class SectionDocTemplate(SimpleDocTemplate):
+    """
+    A SimpleDocTemplate that can also be built from an iterable of sections.
+    
+    build_sections lays out each section's flowables with handle_flowable
+    before the next section is produced, so only one section (and its chunk
+    of charts) is held as flowables at a time. Pages already laid out are
+    still kept by the canvas, compressed and with their images, until the
+    PDF is saved at the end of the build: memory grows with the size of the
+    PDF, not with the charts and tables that produce it.
+    """
+    
+    def build_sections(self, sections, onFirstPage, onLaterPages):
+        """Build the document from an iterable of flowable lists, emptying each list as it is laid out."""
+        self._calc()
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
+        self.addPageTemplates([PageTemplate(id='First', frames=frame, onPage=onFirstPage, pagesize=self.pagesize),
+                               PageTemplate(id='Later', frames=frame, onPage=onLaterPages, pagesize=self.pagesize)])
+        self._startBuild()
+        self.canv._doctemplate = self
+        try:
+            for flowables in sections:
+                # Laid out in place, so the section's producer keeps no flowables alive
+                while flowables:
+                    self.clean_hanging()
+                    self.handle_flowable(flowables)
+        finally:
+            del self.canv._doctemplate
+        self._endBuild()
+
+def report_section_progress(sections, total, progress):
+    """Pass sections through, calling progress with the fraction of the total handed out so far."""
+    for count, section in enumerate(sections, 1):
+        yield section
+        progress(count / total)
+
+def create_utilization_report(doc, elements, account_name, metrics_data, cloud_provider, chart_workers=None,
+                              chart_format=None):
+    """Create utilization report content"""
+    for section in utilization_report_sections(account_name, metrics_data, cloud_provider, chart_workers,
+                                               chart_format):
+        elements.extend(section)
+
+def utilization_report_sections(account_name, metrics_data, cloud_provider, chart_workers=None,
+                                chart_format=None, chunk_size=None):
+    """
+    Yield the flowables of a utilization report as a list per section.
+    
+    The first section is the cover page and resource summary, followed by one
+    section per resource. Charts are rendered for chunk_size resources at a
+    time, so only one chunk of chart images is held in memory at once when
+    each section is emptied as it is laid out (see SectionDocTemplate).
+    """
+    if chunk_size is None:
+        chunk_size = REPORT_CHUNK_SIZE
+    
+    title_style = PARAGRAPH_STYLES['Title']
+    header_style = PARAGRAPH_STYLES['Header']
+    label_style = PARAGRAPH_STYLES['Label']
+    remark_style = PARAGRAPH_STYLES['Remark']
+    elements = []
     
     # Cover page
     elements.append(Paragraph(f"{cloud_provider.upper()} UTILIZATION<br/>REPORT", title_style))
@@ -168,15 +266,7 @@ def create_utilization_report(doc, elements, account_name, metrics_data, cloud_p
         ["Date", datetime.now().strftime("%Y-%m-%d")]
     ]
     
-    report_table = Table(wrap_table_data(report_data), colWidths=[1.5*inch, 3*inch])
-    report_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('PADDING', (0, 0), (-1, -1), 6)
-    ]))
+    report_table = create_table(report_data, [1.5*inch, 3*inch], 'ReportInfo')
     
     elements.append(report_table)
     elements.append(Spacer(1, 0.4*inch))
@@ -202,7 +292,7 @@ def create_utilization_report(doc, elements, account_name, metrics_data, cloud_p
                     resource['id'],
                     resource['name'],
                     resource['type'],
-                    resource['state']
+                    resource.get('state', 'Unknown')
                 ])
         else:  # RDS or Database
             summary_data = [["Instance Name", "Type", "Status", "Engine"]]
@@ -210,227 +300,172 @@ def create_utilization_report(doc, elements, account_name, metrics_data, cloud_p
                 summary_data.append([
                     resource['id'],
                     resource['type'],
-                    resource['state'],
+                    resource.get('state', 'Unknown'),
                     resource.get('engine', 'Unknown')
                 ])
         
         # Create and add the summary table
-        summary_table = Table(wrap_table_data(summary_data), colWidths=[1.59*inch, 3*inch, 1.5*inch, 1*inch])
-        summary_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
+        summary_table = create_table(summary_data, [1.59*inch, 3*inch, 1.5*inch, 1*inch], 'Summary')
         
         elements.append(summary_table)
         elements.append(Spacer(1, 0.4*inch))
     
-    # Process each resource
-    for resource in metrics_data:
-        # Start a new page for each resource
-        elements.append(PageBreak())
-        
-        service_type = resource.get('service_type', 'Unknown')
+    yield elements
+    
+    # Process each resource, rendering the charts of a chunk of resources
+    # together so they can be drawn in parallel
+    for offset in range(0, len(metrics_data), chunk_size):
+        chunk = metrics_data[offset:offset + chunk_size]
+        # Charts are taken off the front, so laid-out charts are not kept until the chunk ends
+        rendered_charts = deque(render_chart_flowables(collect_chart_jobs(chunk), chart_workers, chart_format))
         
-        if service_type in ['EC2', 'VM']:
-            # Add instance details
-            elements.append(Paragraph(f"Host: {resource['name']}", header_style))
-            elements.append(Spacer(1, 0.1*inch))
-            
-            # Host information
-            host_info_data = [
-                ["Instance ID", resource['id']],
-                ["Type", resource['type']],
-                ["Operating System", resource.get('platform', 'Unknown')],
-                ["State", resource['state']]
-            ]
-            
-            host_info_table = Table(wrap_table_data(host_info_data), colWidths=[1.5*inch, 4*inch])
-            host_info_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                ('BACKGROUND', (0, 0), (0, -1), colors.white),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('PADDING', (0, 0), (-1, -1), 6)
-            ]))
-            
-            elements.append(host_info_table)
-            elements.append(Spacer(1, 0.3*inch))
-        else:
-            # Add database instance details
-            elements.append(Paragraph(f"Database: {resource['name']}", header_style))
-            elements.append(Spacer(1, 0.1*inch))
+        for resource in chunk:
+            # Start a new page for each resource
+            elements = [PageBreak()]
             
-            # Database information
-            db_info_data = [
-                ["Instance ID", resource['id']],
-                ["Type", resource['type']],
-                ["Engine", resource.get('engine', 'Unknown')],
-                ["State", resource['state']]
-            ]
+            service_type = resource.get('service_type', 'Unknown')
             
-            db_info_table = Table(wrap_table_data(db_info_data), colWidths=[1.5*inch, 4*inch])
-            db_info_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                ('BACKGROUND', (0, 0), (0, -1), colors.white),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('PADDING', (0, 0), (-1, -1), 6)
-            ]))
-            
-            elements.append(db_info_table)
-            elements.append(Spacer(1, 0.3*inch))
-        
-        # Check if resource has metrics
-        if 'metrics' in resource:
-            # Process CPU metrics
-            if 'cpu' in resource['metrics']:
-                cpu_data = resource['metrics']['cpu']
+            if service_type in ['EC2', 'VM']:
+                # Add instance details
+                elements.append(Paragraph(f"Host: {resource['name']}", header_style))
+                elements.append(Spacer(1, 0.1*inch))
                 
-                if cpu_data.get('timestamps'):
-                    # CPU utilization title
-                    elements.append(Paragraph("CPU UTILIZATION", label_style))
-                    
-                    # Add remarks about CPU utilization
-                    avg_val = cpu_data['average']
-                    
-                    if avg_val > 85:
-                        remarks = "Average utilisation is high. Explore possibility of optimising the resources."
-                    else:
-                        remarks = "Average utilisation is normal. No action needed at the time."
-                    
-                    elements.append(Paragraph(f"Remarks: {remarks}", remark_style))
-                    
-                    # Create and add CPU chart
-                    cpu_chart = create_chart(
-                        cpu_data['timestamps'],
-                        cpu_data['values'],
-                        "CPU Utilization",
-                        resource['name'],
-                        cpu_data['average'],
-                        cpu_data['min'],
-                        cpu_data['max']
-                    )
-                    
-                    elements.append(Image(io.BytesIO(cpu_chart), width=6.5*inch, height=3*inch))
-                    elements.append(Spacer(1, 0.2*inch))
-            
-            # Process Memory metrics
-            if 'memory' in resource['metrics']:
-                memory_data = resource['metrics']['memory']
+                # Host information
+                host_info_data = [
+                    ["Instance ID", resource['id']],
+                    ["Type", resource['type']],
+                    ["Operating System", resource.get('platform', 'Unknown')],
+                    ["State", resource.get('state', 'Unknown')]
+                ]
                 
-                if memory_data.get('timestamps'):
-                    # Memory utilization title
-                    elements.append(Paragraph("MEMORY UTILIZATION", label_style))
-                    
-                    # Add remarks about memory utilization
-                    avg_val = memory_data['average']
-                    
-                    if 'GB' in str(avg_val):  # This is for RDS instances where memory is reported in GB
-                        if avg_val < 1:
-                            remarks = "Memory availability is low. Consider upgrading the instance."
-                        else:
-                            remarks = "Memory availability is normal."
-                    else:
-                        if avg_val > 90:
-                            remarks = "Memory utilization is high. Consider upgrading the instance."
-                        else:
-                            remarks = "Memory utilization is normal."
-                    
-                    elements.append(Paragraph(f"Remarks: {remarks}", remark_style))
-                    
-                    # Create and add Memory chart
-                    memory_chart = create_chart(
-                        memory_data['timestamps'],
-                        memory_data['values'],
-                        "Memory Utilization",
-                        resource['name'],
-                        memory_data['average'],
-                        memory_data['min'],
-                        memory_data['max']
-                    )
-                    
-                    elements.append(Image(io.BytesIO(memory_chart), width=6.5*inch, height=3*inch))
-                    elements.append(Spacer(1, 0.2*inch))
-            
-            # Process Disk metrics
-            if 'disk' in resource['metrics']:
-                disk_data = resource['metrics']['disk']
+                host_info_table = create_table(host_info_data, [1.5*inch, 4*inch], 'ResourceInfo')
                 
-                if disk_data.get('timestamps'):
-                    # Disk utilization title
-                    elements.append(Paragraph("DISK UTILIZATION", label_style))
-                    
-                    # Add remarks about disk utilization
-                    avg_val = disk_data['average']
+                elements.append(host_info_table)
+                elements.append(Spacer(1, 0.3*inch))
+            else:
+                # Add database instance details
+                elements.append(Paragraph(f"Database: {resource['name']}", header_style))
+                elements.append(Spacer(1, 0.1*inch))
+                
+                # Database information
+                db_info_data = [
+                    ["Instance ID", resource['id']],
+                    ["Type", resource['type']],
+                    ["Engine", resource.get('engine', 'Unknown')],
+                    ["State", resource.get('state', 'Unknown')]
+                ]
+                
+                db_info_table = create_table(db_info_data, [1.5*inch, 4*inch], 'ResourceInfo')
+                
+                elements.append(db_info_table)
+                elements.append(Spacer(1, 0.3*inch))
+            
+            # Check if resource has metrics
+            if 'metrics' in resource:
+                # Process CPU metrics
+                if 'cpu' in resource['metrics']:
+                    cpu_data = resource['metrics']['cpu']
                     
-                    if 'GB' in str(avg_val):  # This is for RDS instances where disk is reported in GB
-                        if avg_val < 5:
-                            remarks = "Storage availability is low. Consider increasing storage."
-                        else:
-                            remarks = "Storage availability is normal."
-                    else:
+                    if len(cpu_data):
+                        # CPU utilization title
+                        elements.append(Paragraph("CPU UTILIZATION", label_style))
+                        
+                        # Add remarks about CPU utilization
+                        avg_val = cpu_data.average
+                        
                         if avg_val > 85:
-                            remarks = "Disk utilization is high. Consider increasing storage."
+                            remarks = "Average utilisation is high. Explore possibility of optimising the resources."
                         else:
-                            remarks = "Disk utilization is normal."
-                    
-                    elements.append(Paragraph(f"Remarks: {remarks}", remark_style))
+                            remarks = "Average utilisation is normal. No action needed at the time."
+                        
+                        elements.append(Paragraph(f"Remarks: {remarks}", remark_style))
+                        
+                        # Add the CPU chart rendered up front
+                        elements.append(rendered_charts.popleft())
+                        elements.append(Spacer(1, 0.2*inch))
+                
+                # Process Memory metrics
+                if 'memory' in resource['metrics']:
+                    memory_data = resource['metrics']['memory']
                     
-                    # Create and add Disk chart
-                    disk_chart = create_chart(
-                        disk_data['timestamps'],
-                        disk_data['values'],
-                        "Disk Utilization",
-                        resource['name'],
-                        disk_data['average'],
-                        disk_data['min'],
-                        disk_data['max']
-                    )
+                    if len(memory_data):
+                        # Memory utilization title
+                        elements.append(Paragraph("MEMORY UTILIZATION", label_style))
+                        
+                        # Add remarks about memory utilization
+                        avg_val = memory_data.average
+                        
+                        if 'GB' in str(avg_val):  # This is for RDS instances where memory is reported in GB
+                            if avg_val < 1:
+                                remarks = "Memory availability is low. Consider upgrading the instance."
+                            else:
+                                remarks = "Memory availability is normal."
+                        else:
+                            if avg_val > 90:
+                                remarks = "Memory utilization is high. Consider upgrading the instance."
+                            else:
+                                remarks = "Memory utilization is normal."
+                        
+                        elements.append(Paragraph(f"Remarks: {remarks}", remark_style))
+                        
+                        # Add the Memory chart rendered up front
+                        elements.append(rendered_charts.popleft())
+                        elements.append(Spacer(1, 0.2*inch))
+                
+                # Process Disk metrics
+                if 'disk' in resource['metrics']:
+                    disk_data = resource['metrics']['disk']
                     
-                    elements.append(Image(io.BytesIO(disk_chart), width=6.5*inch, height=3*inch))
-                    elements.append(Spacer(1, 0.2*inch))
+                    if len(disk_data):
+                        # Disk utilization title
+                        elements.append(Paragraph("DISK UTILIZATION", label_style))
+                        
+                        # Add remarks about disk utilization
+                        avg_val = disk_data.average
+                        
+                        if 'GB' in str(avg_val):  # This is for RDS instances where disk is reported in GB
+                            if avg_val < 5:
+                                remarks = "Storage availability is low. Consider increasing storage."
+                            else:
+                                remarks = "Storage availability is normal."
+                        else:
+                            if avg_val > 85:
+                                remarks = "Disk utilization is high. Consider increasing storage."
+                            else:
+                                remarks = "Disk utilization is normal."
+                        
+                        elements.append(Paragraph(f"Remarks: {remarks}", remark_style))
+                        
+                        # Add the Disk chart rendered up front
+                        elements.append(rendered_charts.popleft())
+                        elements.append(Spacer(1, 0.2*inch))
+                
+            yield elements
 
-def create_billing_report(doc, elements, account_name, cloud_provider, month, year):
-    """Create billing report content"""
-    styles = getSampleStyleSheet()
-    
-    # Define custom styles
-    title_style = ParagraphStyle(
-        name='TitleStyle',
-        parent=styles['Title'],
-        fontSize=18,
-        alignment=1,  # Center alignment
-        spaceAfter=0.2*inch
-    )
-    
-    header_style = ParagraphStyle(
-        name='HeaderStyle',
-        parent=styles['Heading1'],
-        fontSize=14,
-        spaceAfter=0.1*inch
-    )
-    
-    subheader_style = ParagraphStyle(
-        name='SubHeaderStyle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        spaceAfter=0.1*inch
-    )
-    
-    warning_style = ParagraphStyle(
-        name='WarningStyle',
-        parent=styles['Normal'],
-        fontSize=12,
-        textColor=colors.red,
-        alignment=1,  # Center alignment
-        spaceAfter=0.2*inch
-    )
+def format_cost(amount, currency='USD'):
+    """Format a cost amount, with a $ sign for USD and the currency code otherwise."""
+    if amount is None:
+        return "-"
+    return f"${amount:,.2f}" if currency == 'USD' else f"{amount:,.2f} {currency}"
+
+def format_cost_change(amount, previous):
+    """Format the relative change from previous to amount."""
+    if not previous:
+        return "-"
+    return f"{(amount - previous) / previous * 100:+.1f}%"
+
+def create_billing_report(doc, elements, account_name, cloud_provider, month, year, billing_data=None):
+    """
+    Create billing report content.
+    
+    billing_data is the month's costs from cost_explorer.get_billing_data:
+    a cost overview per service compared with the previous month, followed
+    by the largest usage types. Without it (Azure has no billing engine yet)
+    the report says that no billing data is available.
+    """
+    title_style = PARAGRAPH_STYLES['Title']
+    header_style = PARAGRAPH_STYLES['Header']
+    warning_style = PARAGRAPH_STYLES['Warning']
     
     month_name = datetime(year, month, 1).strftime('%B')
     
@@ -446,69 +481,82 @@ def create_billing_report(doc, elements, account_name, cloud_provider, month, ye
         ["Date Generated", datetime.now().strftime("%Y-%m-%d")]
     ]
     
-    report_table = Table(wrap_table_data(report_data), colWidths=[1.5*inch, 3*inch])
-    report_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('PADDING', (0, 0), (-1, -1), 6)
-    ]))
+    if billing_data is not None:
+        currency = billing_data['currency']
+        report_data.append(["Total Cost", format_cost(billing_data['total'], currency)])
+    
+    report_table = create_table(report_data, [1.5*inch, 3*inch], 'ReportInfo')
     
     elements.append(report_table)
     elements.append(Spacer(1, 0.4*inch))
     
-    # In a real implementation, this would contain real billing data from AWS Cost Explorer
-    # or Azure Cost Management API. For now, we'll add a placeholder.
-    elements.append(Paragraph("This is a placeholder for the billing report. In a real implementation, this would contain actual billing data retrieved from the cloud provider's cost management API.", warning_style))
-    elements.append(Spacer(1, 0.4*inch))
+    if billing_data is None:
+        elements.append(Paragraph(
+            f"Billing data is not available for {cloud_provider} accounts yet.", warning_style))
+        return
+    
+    if not billing_data['closed']:
+        through = billing_data['lastDay'] or f"{year}-{month:02d}-01"
+        elements.append(Paragraph(
+            f"Costs through {through}. The month is not final yet, so recent costs are estimates and may change.",
+            PARAGRAPH_STYLES['Remark']
+        ))
+        elements.append(Spacer(1, 0.2*inch))
     
-    # Add monthly overview section
+    # Cost per service, against the previous month
     elements.append(Paragraph("Monthly Cost Overview", header_style))
     elements.append(Spacer(1, 0.2*inch))
     
-    # Create a sample monthly overview table
-    overview_data = [
-        ["Service Category", "Cost"],
-        ["Compute", "$0.00"],
-        ["Storage", "$0.00"],
-        ["Database", "$0.00"],
-        ["Networking", "$0.00"],
-        ["Other", "$0.00"],
-        ["Total", "$0.00"]
-    ]
-    
-    overview_table = Table(wrap_table_data(overview_data), colWidths=[3*inch, 1.5*inch])
-    overview_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('PADDING', (0, 0), (-1, -1), 6),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-    ]))
+    previous_services = billing_data['previousServices']
+    services = billing_data['services']
+    overview_data = [["Service", "Cost", "Previous Month", "Change"]]
+    for service, amount in services[:TOP_SERVICES]:
+        previous = previous_services.get(service)
+        overview_data.append([service, format_cost(amount, currency), format_cost(previous, currency),
+                              format_cost_change(amount, previous)])
+    if len(services) > TOP_SERVICES:
+        listed = {service for service, _ in services[:TOP_SERVICES]}
+        other = sum(amount for _, amount in services[TOP_SERVICES:])
+        other_previous = sum(amount for service, amount in previous_services.items() if service not in listed)
+        overview_data.append([f"Other ({len(services) - TOP_SERVICES} services)", format_cost(other, currency),
+                              format_cost(other_previous, currency), format_cost_change(other, other_previous)])
+    overview_data.append(["Total", format_cost(billing_data['total'], currency),
+                          format_cost(billing_data['previousTotal'], currency),
+                          format_cost_change(billing_data['total'], billing_data['previousTotal'])])
+    
+    overview_table = create_table(overview_data, [3.2*inch, 1.3*inch, 1.3*inch, 0.9*inch], 'CostComparison')
     
     elements.append(overview_table)
     elements.append(Spacer(1, 0.4*inch))
     
-    # Add a note about generating real billing data
-    elements.append(Paragraph(
-        "Note: To retrieve real billing data, you would need to implement integration with the AWS Cost Explorer API or Azure Cost Management API. " +
-        "This would require appropriate permissions in your credentials to access cost data.",
-        styles['Normal']
-    ))
+    # Largest usage types
+    usage_types = billing_data['usageTypes'][:TOP_USAGE_TYPES]
+    if usage_types:
+        elements.append(Paragraph("Top Usage Types", header_style))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        usage_data = [["Service", "Usage Type", "Cost"]]
+        for service, usage_type, amount in usage_types:
+            usage_data.append([service, usage_type, format_cost(amount, currency)])
+        
+        usage_table = create_table(usage_data, [2.8*inch, 2.8*inch, 1.1*inch], 'CostDetail')
+        elements.append(usage_table)
 
 def generate_pdf_report(account_name, metrics_data=None, cloud_provider='AWS', 
-                       report_type='utilization', month=None, year=None):
-    """Generate a PDF report with metrics data or billing information."""
+                       report_type='utilization', month=None, year=None, chart_workers=None,
+                       chart_format=None, output=None, progress=None, billing_data=None):
+    """
+    Generate a PDF report with metrics data or billing information.
+    
+    The PDF is written to output, a path or a writable binary file object,
+    which is returned. When output is None it is built in memory and its
+    bytes are returned instead. progress, when given, is called with the
+    fraction of report sections laid out so far.
+    """
     logger.info("Generating PDF report...")
     
-    # Create a buffer for the PDF
-    buffer = io.BytesIO()
+    # Write straight to the output when one is given, otherwise to a buffer
+    buffer = io.BytesIO() if output is None else None
     
     # Define header function for all pages
     def header(canvas, doc):
@@ -529,8 +577,8 @@ def generate_pdf_report(account_name, metrics_data=None, cloud_provider='AWS',
         canvas.restoreState()
     
     # Create the PDF document
-    doc = SimpleDocTemplate(
-        buffer,
+    doc = SectionDocTemplate(
+        buffer if output is None else output,
         pagesize=letter,
         rightMargin=0.5*inch,
         leftMargin=0.5*inch,
@@ -538,20 +586,31 @@ def generate_pdf_report(account_name, metrics_data=None, cloud_provider='AWS',
         bottomMargin=0.5*inch
     )
     
-    # Initialize the list of flowables
-    elements = []
-    
-    # Create appropriate report content based on report type
+    # Create appropriate report content based on report type. Utilization
+    # reports are produced section by section while the document is built.
     if report_type == 'utilization':
-        create_utilization_report(doc, elements, account_name, metrics_data, cloud_provider)
+        sections = utilization_report_sections(account_name, metrics_data, cloud_provider, chart_workers,
+                                               chart_format)
+        if progress is not None:
+            sections = report_section_progress(sections, len(metrics_data) + 1, progress)
     else:  # billing report
-        create_billing_report(doc, elements, account_name, cloud_provider, month, year)
+        elements = []
+        create_billing_report(doc, elements, account_name, cloud_provider, month, year, billing_data)
+        sections = [elements]
+    
+    # Build the PDF document with header template. For utilization reports
+    # this span includes the chart rendering, which happens during the build.
+    with instrumentation.span('build_pdf', report_type=report_type):
+        doc.build_sections(sections, onFirstPage=header, onLaterPages=header)
     
-    # Build the PDF document with header template
-    doc.build(elements, onFirstPage=header, onLaterPages=header)
+    if output is not None:
+        if isinstance(output, (str, os.PathLike)):
+            instrumentation.count('pdfBytes', os.path.getsize(output))
+        return output
     
     # Get the PDF data
     pdf_data = buffer.getvalue()
     buffer.close()
+    instrumentation.count('pdfBytes', len(pdf_data))
     
     return pdf_data
@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import instrumentation
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reports generated at the same time by the job API
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', '4'))
+
+# Jobs that may be queued or running before new submissions are refused
+REPORT_JOB_MAX_PENDING = int(os.environ.get('REPORT_JOB_MAX_PENDING', '64'))
+
+# Seconds a finished job (and its PDF) is kept for status checks and downloads
+REPORT_JOB_TTL = float(os.environ.get('REPORT_JOB_TTL', '3600'))
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the maximum number of jobs is pending."""
+
+class ReportJob:
+    """State of one asynchronously generated report."""
+
+    def __init__(self, job_id: str, output_path: str, filename: str):
+        self.id = job_id
+        self.output_path = output_path
+        self.filename = filename
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.trace: Optional[instrumentation.ReportTrace] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the job state as a JSON-serialisable dict."""
+        return {
+            'jobId': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'error': self.error,
+            'filename': self.filename,
+            'createdAt': self.created,
+            'startedAt': self.started,
+            'finishedAt': self.finished,
+            'trace': self.trace.summary() if self.trace is not None else None
+        }
+
+class ReportJobManager:
+    """
+    Runs report jobs on a bounded thread pool and keeps their state.
+
+    At most `max_pending` jobs may be queued or running at once; further
+    submissions raise JobQueueFull so callers can ask clients to retry later.
+    Finished jobs are dropped, and their output files removed, `ttl` seconds
+    after they finish. Expired jobs are purged whenever the store is used, so
+    no background thread is needed.
+    """
+
+    def __init__(self, workers: int = REPORT_JOB_WORKERS, max_pending: int = REPORT_JOB_MAX_PENDING,
+                 ttl: float = REPORT_JOB_TTL):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, ReportJob] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, run: Callable[[str, Callable[[str, float], None]], None], output_path: str,
+               filename: str) -> ReportJob:
+        """
+        Queue a report job and return it.
+
+        run(output_path, progress) generates the report into output_path and
+        may call progress(stage, fraction) to publish how far it got.
+        """
+        self.purge_expired()
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if not job.done)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f'{pending} report jobs are already pending')
+
+            job = ReportJob(uuid.uuid4().hex, output_path, filename)
+            self._jobs[job.id] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='report-job')
+            executor = self._executor
+
+        executor.submit(self._run_job, job, run)
+        return job
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        """Return the job with the given id, or None when it is unknown or expired."""
+        self.purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending_count(self) -> int:
+        """Return how many jobs are queued or running."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done)
+
+    def purge_expired(self) -> int:
+        """Drop finished jobs older than the TTL, delete their files and return how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.done and now - job.finished > self.ttl]
+            for job in expired:
+                del self._jobs[job.id]
+
+        for job in expired:
+            remove_file(job.output_path)
+        return len(expired)
+
+    def _run_job(self, job: ReportJob, run: Callable[[str, Callable[[str, float], None]], None]) -> None:
+        def progress(stage: str, fraction: float) -> None:
+            job.stage = stage
+            job.progress = min(1.0, max(job.progress, fraction))
+
+        job.status = RUNNING
+        job.stage = RUNNING
+        job.started = time.time()
+        try:
+            with instrumentation.start_trace(f'report-job-{job.id}') as trace:
+                job.trace = trace
+                run(job.output_path, progress)
+            job.progress = 1.0
+            status = SUCCEEDED
+        except Exception as e:
+            logger.error(f"Error generating report for job {job.id}: {str(e)}")
+            job.error = str(e)
+            status = FAILED
+            remove_file(job.output_path)
+
+        # finished must be set before the job counts as done (see purge_expired)
+        job.finished = time.time()
+        job.stage = status
+        job.status = status
+
+def remove_file(path: str) -> None:
+    """Delete a file, ignoring one that is already gone."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Failed to remove {path}: {str(e)}")
+
+_job_manager: Optional[ReportJobManager] = None
+_job_manager_lock = threading.Lock()
+
+def get_job_manager() -> ReportJobManager:
+    """Return the process-wide ReportJobManager, creating it on first use."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = ReportJobManager()
+        return _job_manager
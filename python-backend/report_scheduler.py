@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# JSON file of recurring report definitions loaded at startup (none when empty)
+REPORT_SCHEDULE_FILE = os.environ.get('REPORT_SCHEDULE_FILE', '')
+
+# Seconds after a period boundary before its metrics are prefetched, so
+# CloudWatch and Azure Monitor have ingested the last datapoints
+REPORT_SCHEDULE_DELAY = float(os.environ.get('REPORT_SCHEDULE_DELAY', '600'))
+
+# Longest time a pre-render waits for on-demand reports to finish first
+REPORT_SCHEDULE_IDLE_WAIT = float(os.environ.get('REPORT_SCHEDULE_IDLE_WAIT', '900'))
+
+# Seconds between checks for due reports
+REPORT_SCHEDULE_POLL = float(os.environ.get('REPORT_SCHEDULE_POLL', '30'))
+
+# Unix time 0 was a Thursday; weekly periods start on Mondays
+WEEK_OFFSET = 4 * 86400
+
+def period_start(period_days: int, now: Optional[float] = None) -> int:
+    """Return the start (UTC midnight, on a Monday for weekly windows) of the report period containing now."""
+    now = int(time.time() if now is None else now)
+    if period_days > 1:
+        return now - (now - WEEK_OFFSET) % (7 * 86400)
+    return now - now % 86400
+
+class ScheduledReport:
+    """A recurring report definition and the outcome of its latest precomputation."""
+
+    def __init__(self, schedule_id: str, params: Dict[str, Any], period_days: int):
+        self.id = schedule_id
+        self.params = params
+        self.period_days = period_days
+        self.last_period: Optional[int] = None
+        self.status = 'pending'
+        self.error: Optional[str] = None
+        self.last_run: Optional[float] = None
+        self.prefetch_seconds: Optional[float] = None
+        self.render_seconds: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the definition and its state as a JSON-serialisable dict, without credentials."""
+        return {
+            'id': self.id,
+            'cloudProvider': self.params.get('cloudProvider', 'AWS'),
+            'reportType': self.params.get('reportType', 'utilization'),
+            'frequency': 'weekly' if self.period_days > 1 else 'daily',
+            'accountName': self.params.get('accountName'),
+            'resources': len(self.params.get('resources', [])),
+            'status': self.status,
+            'error': self.error,
+            'lastPeriod': self.last_period,
+            'lastRunAt': self.last_run,
+            'prefetchSeconds': self.prefetch_seconds,
+            'renderSeconds': self.render_seconds
+        }
+
+class ReportScheduler:
+    """
+    Precomputes recurring reports shortly after each period boundary.
+
+    For every due report the metrics are prefetched first, REPORT_SCHEDULE_DELAY
+    seconds after its daily or weekly boundary, with prefetch(params); the
+    collectors' caches keep them for on-demand requests as well. The reports
+    are then rendered with render(params, prefetched, period_start), each
+    waiting up to idle_wait seconds while is_busy() reports on-demand work,
+    so precomputation runs off-peak and never competes with users. Reports
+    run one at a time on a single background thread.
+    """
+
+    def __init__(self, prefetch: Callable[[Dict[str, Any]], Any],
+                 render: Callable[[Dict[str, Any], Any, int], None],
+                 period_days: Callable[[Dict[str, Any]], int],
+                 is_busy: Optional[Callable[[], bool]] = None, delay: float = REPORT_SCHEDULE_DELAY,
+                 idle_wait: float = REPORT_SCHEDULE_IDLE_WAIT, poll: float = REPORT_SCHEDULE_POLL):
+        self.prefetch = prefetch
+        self.render = render
+        self.period_days = period_days
+        self.is_busy = is_busy or (lambda: False)
+        self.delay = delay
+        self.idle_wait = idle_wait
+        self.poll = poll
+        self._lock = threading.Lock()
+        self._reports: Dict[str, ScheduledReport] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, params: Dict[str, Any], schedule_id: Optional[str] = None) -> ScheduledReport:
+        """Register (or replace) a recurring report definition and return it."""
+        report = ScheduledReport(schedule_id or uuid.uuid4().hex, params, self.period_days(params))
+        with self._lock:
+            self._reports[report.id] = report
+        return report
+
+    def remove(self, schedule_id: str) -> bool:
+        with self._lock:
+            return self._reports.pop(schedule_id, None) is not None
+
+    def get(self, schedule_id: str) -> Optional[ScheduledReport]:
+        with self._lock:
+            return self._reports.get(schedule_id)
+
+    def list(self) -> List[ScheduledReport]:
+        with self._lock:
+            return list(self._reports.values())
+
+    def due(self, now: Optional[float] = None) -> List[Tuple[ScheduledReport, int]]:
+        """Return the (report, period start) pairs whose current period has not been precomputed yet."""
+        now = time.time() if now is None else now
+        due = []
+        for report in self.list():
+            start = period_start(report.period_days, now)
+            if report.last_period != start and now >= start + self.delay:
+                due.append((report, start))
+        return due
+
+    def run_pending(self, now: Optional[float] = None) -> int:
+        """Prefetch, then render, every due report; return how many were precomputed."""
+        prefetched = []
+        for report, start in self.due(now):
+            started = time.perf_counter()
+            report.status = 'prefetching'
+            try:
+                data = self.prefetch(report.params)
+            except Exception as e:
+                self._failed(report, start, e)
+                continue
+            report.prefetch_seconds = round(time.perf_counter() - started, 3)
+            prefetched.append((report, start, data))
+
+        completed = 0
+        for report, start, data in prefetched:
+            if self._stop.is_set():
+                break
+            self.wait_until_idle()
+            started = time.perf_counter()
+            report.status = 'rendering'
+            try:
+                self.render(report.params, data, start)
+            except Exception as e:
+                self._failed(report, start, e)
+                continue
+            report.render_seconds = round(time.perf_counter() - started, 3)
+            report.status = 'ready'
+            report.error = None
+            report.last_period = start
+            report.last_run = time.time()
+            completed += 1
+            logger.info(f"Precomputed scheduled report {report.id} for the period starting {start}")
+        return completed
+
+    def _failed(self, report: ScheduledReport, start: int, error: Exception) -> None:
+        # The period is marked done so a failing report is retried next period, not every poll
+        logger.error(f"Error precomputing scheduled report {report.id}: {str(error)}")
+        report.status = 'failed'
+        report.error = str(error)
+        report.last_period = start
+        report.last_run = time.time()
+
+    def wait_until_idle(self) -> None:
+        """Wait while on-demand reports are being generated, for at most idle_wait seconds."""
+        deadline = time.monotonic() + self.idle_wait
+        while self.is_busy() and time.monotonic() < deadline and not self._stop.is_set():
+            self._stop.wait(1.0)
+
+    def start(self) -> None:
+        """Start the background thread (once)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='report-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Report scheduler error: {str(e)}")
+            self._stop.wait(self.poll)
+
+def load_schedule_file(path: str) -> List[Tuple[Optional[str], Dict[str, Any]]]:
+    """
+    Read recurring report definitions and return them as (id, params) pairs.
+
+    The file holds a JSON list whose entries are either {"id": ..., "params":
+    {...}} or the report params themselves, in the format of /generate-report.
+    """
+    with open(path, 'r') as f:
+        definitions = json.load(f)
+    return [(entry.get('id'), entry['params']) if 'params' in entry else (None, entry)
+            for entry in definitions]
@@ -0,0 +1,159 @@
+from types import MappingProxyType
+
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Paragraph, Table, TableStyle
+
+# Paragraph and table styles shared by every report. They are built once at
+# import; reports only look them up, so treat the style objects as read-only.
+
+_sample_styles = getSampleStyleSheet()
+
+PARAGRAPH_STYLES = MappingProxyType({
+    'Normal': _sample_styles['Normal'],
+    'Title': ParagraphStyle(
+        name='TitleStyle',
+        parent=_sample_styles['Title'],
+        fontSize=18,
+        alignment=1,  # Center alignment
+        spaceAfter=0.2*inch
+    ),
+    'Header': ParagraphStyle(
+        name='HeaderStyle',
+        parent=_sample_styles['Heading1'],
+        fontSize=14,
+        spaceAfter=0.1*inch
+    ),
+    'Label': ParagraphStyle(
+        name='LabelStyle',
+        parent=_sample_styles['Normal'],
+        fontSize=10,
+        spaceBefore=0.1*inch,
+        spaceAfter=0.05*inch,
+        fontName='Helvetica-Bold'
+    ),
+    'Remark': ParagraphStyle(
+        name='RemarkStyle',
+        parent=_sample_styles['Normal'],
+        fontSize=10,
+        spaceAfter=0.1*inch,
+        fontName='Helvetica-Oblique'
+    ),
+    'Warning': ParagraphStyle(
+        name='WarningStyle',
+        parent=_sample_styles['Normal'],
+        fontSize=12,
+        textColor=colors.red,
+        alignment=1,  # Center alignment
+        spaceAfter=0.2*inch
+    ),
+})
+
+# Padding applied to every table cell, in points
+CELL_PADDING = 6
+
+# The report information, summary and resource tables set no font, so their
+# plain-string cells keep the table default (Helvetica 10pt, 12pt leading),
+# which matches the Normal Paragraph style every cell used to be wrapped in.
+TABLE_STYLES = MappingProxyType({
+    # Report information table on the cover page
+    'ReportInfo': TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('PADDING', (0, 0), (-1, -1), CELL_PADDING)
+    ]),
+    # Resource summary tables with a header row
+    'Summary': TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('PADDING', (0, 0), (-1, -1), CELL_PADDING),
+    ]),
+    # Per-resource host and database information tables
+    'ResourceInfo': TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (0, -1), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('PADDING', (0, 0), (-1, -1), CELL_PADDING)
+    ]),
+    # Costs per service against the previous month, with a total row
+    'CostComparison': TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('PADDING', (0, 0), (-1, -1), CELL_PADDING),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ]),
+    # Costs per usage type, largest first
+    'CostDetail': TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-2, -1), 'LEFT'),
+        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('PADDING', (0, 0), (-1, -1), CELL_PADDING),
+    ]),
+})
+
+# Characters that Paragraph treats as markup
+_MARKUP_CHARS = frozenset('<>&\n')
+
+# Widest font a table style may set for a plain-text cell
+_PLAIN_CELL_FONT = 'Helvetica-Bold'
+
+def is_plain_cell(text, width):
+    """
+    Return whether text can be drawn as a plain table cell string.
+
+    That is the case when it holds no Paragraph markup and fits on one line of
+    a column of the given width, so wrapping it in a Paragraph would change
+    nothing but its cost.
+    """
+    if width is None or _MARKUP_CHARS.intersection(text):
+        return False
+    font_size = PARAGRAPH_STYLES['Normal'].fontSize
+    return stringWidth(text, _PLAIN_CELL_FONT, font_size) <= width - 2 * CELL_PADDING
+
+def wrap_table_data(data, col_widths=None):
+    """
+    Helper function to wrap table data cells as paragraphs for better formatting.
+
+    When col_widths is given, plain-text cells that fit their column are kept
+    as strings; they are laid out far more cheaply than a Paragraph and pick up
+    the table style's font and alignment.
+    """
+    normal_style = PARAGRAPH_STYLES['Normal']
+    wrapped_data = []
+
+    for row in data:
+        wrapped_row = []
+        for column, cell in enumerate(row):
+            if isinstance(cell, Paragraph):
+                wrapped_row.append(cell)
+                continue
+            text = str(cell)
+            width = col_widths[column] if col_widths is not None else None
+            if is_plain_cell(text, width):
+                wrapped_row.append(text)
+            else:
+                wrapped_row.append(Paragraph(text, normal_style))
+        wrapped_data.append(wrapped_row)
+
+    return wrapped_data
+
+def create_table(data, col_widths, style):
+    """Create a Table from rows of cell values with the named registry table style."""
+    table = Table(wrap_table_data(data, col_widths), colWidths=col_widths)
+    table.setStyle(TABLE_STYLES[style])
+    return table
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: processes do not coordinate eviction, each still refreshes its index
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# The cache is disabled unless a directory is configured
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', '')
+
+# Size limits per kind of result; the least recently used files are evicted first
+RESULT_CACHE_MAX_REPORT_BYTES = int(os.environ.get('RESULT_CACHE_MAX_REPORT_BYTES', str(2 * 1024 ** 3)))
+RESULT_CACHE_MAX_CHART_BYTES = int(os.environ.get('RESULT_CACHE_MAX_CHART_BYTES', str(1024 ** 3)))
+
+# Other processes may write to the same directory, so the index is rebuilt
+# from it at least this often before evicting
+INDEX_REFRESH_SECONDS = 30
+
+# An eviction pass frees space down to this fraction of max_bytes, so a full
+# cache is not rescanned on every store
+EVICTION_TARGET = 0.9
+
+def digest(*parts: Any) -> str:
+    """Return the SHA-256 hex digest of parts, which are JSON-encoded unless they are bytes."""
+    hasher = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (bytes, bytearray, memoryview)):
+            part = json.dumps(part, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+        hasher.update(len(part).to_bytes(8, 'little'))
+        hasher.update(part)
+    return hasher.hexdigest()
+
+def make_report_key(request: Dict[str, Any], window_end: int) -> str:
+    """
+    Return the cache key of a report.
+
+    request is the normalized report request without credentials (callers put
+    a credentials_fingerprint in it instead). window_end is the end of the
+    reporting window truncated to the metric period, so every request within
+    the same period maps to the same report.
+    """
+    return digest('report', request, window_end)
+
+def make_chart_key(series, style: Dict[str, Any], *labels: Any) -> str:
+    """Return the cache key of a chart of a MetricSeries drawn with the given style and labels."""
+    return digest('chart', series.timestamps.tobytes(), series.values.tobytes(), style, labels)
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of rendered results (PDFs, chart images).
+
+    Every entry is one file named after its key. Reads bump the file's mtime,
+    which orders entries for LRU eviction once more than max_bytes are stored.
+    The directory can be shared by the processes of one host: each keeps an
+    in-memory index, and before evicting it rebuilds that index from the
+    directory (when it is older than INDEX_REFRESH_SECONDS, or its own view is
+    over the limit) while holding a lock file. So the limit applies to the
+    whole directory; it can be exceeded only by what other processes wrote
+    since the last refresh. Files are written to a temporary name and renamed
+    into place, so readers never see a partial entry.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._total_bytes = 0
+        self._last_refresh = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        self._entries.clear()
+        self._total_bytes = 0
+        self._last_refresh = time.monotonic()
+
+        files = []
+        for name in os.listdir(self.directory):
+            if name.startswith('.'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the path of the cached file for key and mark it used, or None on a miss."""
+        path = self.path(key)
+        with self._lock:
+            if key not in self._entries:
+                # Possibly written by another process since the index was loaded
+                try:
+                    self._entries[key] = os.stat(path).st_size
+                except FileNotFoundError:
+                    return None
+                self._total_bytes += self._entries[key]
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted by another process sharing the directory
+                self._total_bytes -= self._entries.pop(key)
+                return None
+            self._entries.move_to_end(key)
+        return path
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached bytes for key, or None on a miss."""
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def copy_to(self, key: str, output: Any) -> bool:
+        """Copy the cached file for key to output (a path or binary file object); return False on a miss."""
+        path = self.lookup(key)
+        if path is None:
+            return False
+        try:
+            if isinstance(output, (str, os.PathLike)):
+                shutil.copyfile(path, output)
+            else:
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, output)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store bytes under key."""
+        self._store(key, lambda f: f.write(data))
+
+    def put_file(self, key: str, source_path: str) -> None:
+        """Store a copy of the file at source_path under key."""
+        def write(f):
+            with open(source_path, 'rb') as source:
+                shutil.copyfileobj(source, f)
+        self._store(key, write)
+
+    def _store(self, key: str, write) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, self.path(key))
+        except Exception as e:
+            logger.warning(f"Failed to store cache entry {key}: {str(e)}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            if self._total_bytes > self.max_bytes or time.monotonic() - self._last_refresh >= INDEX_REFRESH_SECONDS:
+                with self._directory_lock():
+                    self._load_index()
+                    self._evict()
+
+    @contextmanager
+    def _directory_lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the cache directory shared with other processes."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _evict(self) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICTION_TARGET
+        while self._total_bytes > target and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+def _get_cache(kind: str, max_bytes: int) -> Optional[ResultCache]:
+    if not RESULT_CACHE_DIR:
+        return None
+
+    with _caches_lock:
+        cache = _caches.get(kind)
+        if cache is None:
+            try:
+                cache = ResultCache(os.path.join(RESULT_CACHE_DIR, kind), max_bytes)
+            except Exception as e:
+                logger.error(f"Failed to open result cache {RESULT_CACHE_DIR}: {str(e)}")
+                return None
+            _caches[kind] = cache
+        return cache
+
+def get_report_cache() -> Optional[ResultCache]:
+    """Return the process-wide cache of finished PDFs, or None when RESULT_CACHE_DIR is not set."""
+    return _get_cache('reports', RESULT_CACHE_MAX_REPORT_BYTES)
+
+def get_chart_cache() -> Optional[ResultCache]:
+    """Return the process-wide cache of rendered charts, or None when RESULT_CACHE_DIR is not set."""
+    return _get_cache('charts', RESULT_CACHE_MAX_CHART_BYTES)
@@ -0,0 +1,285 @@
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Histogram bucket upper bounds
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+API_CALL_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000,
+                 25_000_000, 50_000_000)
+
+LabelValues = Tuple[str, ...]
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """
+    A named metric with a fixed set of label names.
+
+    Label values are passed positionally as a tuple in the order of
+    labelnames. Every update takes one lock and touches one dict entry, so
+    recording is cheap enough for per-API-call use.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}'] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    """A monotonically increasing total."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}'
+                for labels, value in values]
+
+class Gauge(Metric):
+    """
+    A value that can go up and down.
+
+    With `function`, the value is read from function() whenever the metrics
+    are rendered instead of being set by callers.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.function = function
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, labels: LabelValues = ()) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            try:
+                return [f'{self.name} {format_value(self.function())}']
+            except Exception as e:
+                logger.warning(f"Failed to read gauge {self.name}: {str(e)}")
+                return []
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}'
+                for labels, value in values]
+
+class Histogram(Metric):
+    """
+    Observations counted into fixed buckets, with their sum and count.
+
+    Buckets are stored non-cumulatively and summed up only when rendered, so
+    an observation is one bisect and three additions.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [bucket counts (last is +Inf), sum, count]
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self._values.items())
+
+        lines = []
+        for labels, (counts, total, observations) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} {observations}')
+        return lines
+
+_registry: List[Metric] = []
+
+def register(metric: Metric) -> Metric:
+    _registry.append(metric)
+    return metric
+
+def render_metrics() -> str:
+    """Return every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+def get_process_rss() -> float:
+    """Return the resident set size of this process in bytes (the peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+_started = time.time()
+
+REPORT_SECONDS = register(Histogram(
+    'report_generation_seconds', 'Time to generate a report, including cache hits.',
+    ('provider', 'report_type', 'outcome')))
+REPORTS_IN_FLIGHT = register(Gauge(
+    'reports_in_flight', 'Reports currently being generated.'))
+REPORT_STAGE_SECONDS = register(Histogram(
+    'report_stage_seconds', 'Time spent per report in each stage (collect_metrics, fetch_metrics, '
+    'render_charts, build_pdf, ...).', ('provider', 'stage')))
+REPORT_PDF_BYTES = register(Histogram(
+    'report_pdf_bytes', 'Size of generated PDF reports.', ('provider', 'report_type'), BYTES_BUCKETS))
+REPORT_CACHE_HITS = register(Counter(
+    'report_cache_hits_total', 'Reports served from the result cache.', ('provider',)))
+CHARTS_RENDERED = register(Counter(
+    'charts_rendered_total', 'Charts placed in reports, whether rendered or taken from the chart cache.',
+    ('provider',)))
+CHART_CACHE_HITS = register(Counter(
+    'chart_cache_hits_total', 'Charts taken from the chart cache.', ('provider',)))
+CHART_BYTES = register(Counter(
+    'chart_bytes_total', 'Bytes of chart images placed in reports.', ('provider',)))
+CLOUD_API_CALLS = register(Counter(
+    'cloud_api_calls_total', 'Cloud API calls by service, operation and outcome.',
+    ('service', 'operation', 'outcome')))
+CLOUD_API_THROTTLES = register(Counter(
+    'cloud_api_throttles_total', 'Cloud API calls rejected by throttling.', ('service', 'operation')))
+CLOUD_API_RETRIES = register(Counter(
+    'cloud_api_retries_total', 'SDK-level retries of cloud API calls.', ('service', 'operation')))
+CLOUD_API_SECONDS = register(Histogram(
+    'cloud_api_call_seconds', 'Latency of cloud API calls, including SDK-level retries.',
+    ('service', 'operation'), API_CALL_BUCKETS))
+THROTTLE_RETRIES = register(Counter(
+    'throttle_retries_total', 'Calls retried with backoff after throttling (see call_with_retry).'))
+register(Gauge(
+    'process_resident_memory_bytes', 'Resident memory size of the report service in bytes.',
+    function=get_process_rss))
+register(Gauge(
+    'process_start_time_seconds', 'Start time of the process since the Unix epoch in seconds.',
+    function=lambda: _started))
+
+def record_api_call(service: str, operation: str, seconds: float, error: Optional[str] = None,
+                    throttled: bool = False, retries: int = 0) -> None:
+    """Count one cloud API call and observe its latency."""
+    labels = (service, operation)
+    CLOUD_API_CALLS.inc((service, operation, 'throttled' if throttled else 'error' if error else 'success'))
+    CLOUD_API_SECONDS.observe(seconds, labels)
+    if throttled:
+        CLOUD_API_THROTTLES.inc(labels)
+    if retries:
+        CLOUD_API_RETRIES.inc(labels, retries)
+
+def observe_trace(trace, provider: str, report_type: str) -> None:
+    """Fold the stage timings and counters of a finished report trace into the service metrics."""
+    summary = trace.summary()
+    for stage, seconds in summary['stages'].items():
+        REPORT_STAGE_SECONDS.observe(seconds, (provider, stage))
+
+    counters = summary['counters']
+    labels = (provider,)
+    if counters.get('pdfBytes'):
+        REPORT_PDF_BYTES.observe(counters['pdfBytes'], (provider, report_type))
+    if counters.get('reportCacheHits'):
+        REPORT_CACHE_HITS.inc(labels, counters['reportCacheHits'])
+    if counters.get('charts'):
+        CHARTS_RENDERED.inc(labels, counters['charts'])
+    if counters.get('chartCacheHits'):
+        CHART_CACHE_HITS.inc(labels, counters['chartCacheHits'])
+    if counters.get('chartBytes'):
+        CHART_BYTES.inc(labels, counters['chartBytes'])
+    if counters.get('throttleRetries'):
+        THROTTLE_RETRIES.inc((), counters['throttleRetries'])
+
+@contextmanager
+def track_report(provider: str, report_type: str, trace=None) -> Iterator[None]:
+    """
+    Count the block as an in-flight report and observe its duration and outcome.
+
+    When the report's trace is given, its stages and counters are folded into
+    the metrics once the block ends, so the hot paths only record into the
+    trace.
+    """
+    REPORTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        REPORTS_IN_FLIGHT.dec()
+        REPORT_SECONDS.observe(time.perf_counter() - started, (provider, report_type, outcome))
+        if trace is not None:
+            try:
+                observe_trace(trace, provider, report_type)
+            except Exception as e:
+                logger.warning(f"Failed to record report metrics: {str(e)}")
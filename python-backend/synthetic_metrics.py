@@ -0,0 +1,94 @@
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Spacing of generated datapoints in seconds
+DEMO_INTERVAL_SECONDS = 300
+
+# Shape of generated series: 'realistic' combines a daily cycle, a trend,
+# noise and spikes; 'uniform' draws independent values between the bounds
+DEMO_METRICS_SHAPE = os.environ.get('DEMO_METRICS_SHAPE', 'realistic').lower()
+
+# Seed for reproducible demo data; unset draws fresh values for every report
+DEMO_METRICS_SEED = os.environ.get('DEMO_METRICS_SEED')
+
+SHAPES = ('uniform', 'realistic')
+
+def get_rng(seed: Optional[int] = None) -> np.random.Generator:
+    """Return a random generator seeded with seed, DEMO_METRICS_SEED or fresh entropy."""
+    if seed is None and DEMO_METRICS_SEED:
+        seed = int(DEMO_METRICS_SEED)
+    return np.random.default_rng(seed)
+
+def demo_timestamps(period_days: int, end: Optional[int] = None,
+                    interval: int = DEMO_INTERVAL_SECONDS) -> np.ndarray:
+    """Return int64 epoch timestamps every interval seconds over the last period_days days up to end."""
+    if end is None:
+        end = int(time.time())
+    start = end - period_days * 86400
+    return np.arange(start, end + 1, interval, dtype=np.int64)
+
+def generate_series_batch(timestamps: np.ndarray, bounds: Sequence[Tuple[float, float]],
+                          shape: Optional[str] = None, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Generate one series per (min, max) bound over shared timestamps.
+
+    Returns a float64 array of shape (len(bounds), len(timestamps)) whose rows
+    lie within their bounds. All rows are drawn in single vectorised calls, so
+    the cost is dominated by the size of the output, not the number of series.
+    """
+    if shape is None:
+        shape = DEMO_METRICS_SHAPE
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown demo metrics shape: {shape}")
+    if rng is None:
+        rng = get_rng()
+
+    bounds_array = np.asarray(bounds, dtype=np.float64).reshape(-1, 2)
+    low = bounds_array[:, :1]
+    span = bounds_array[:, 1:] - low
+    count = len(bounds_array)
+    points = len(timestamps)
+
+    if shape == 'uniform':
+        return low + span * rng.random((count, points))
+
+    # Work on a unit scale and map to the bounds at the end
+    days = (timestamps - timestamps[0]).astype(np.float64) / 86400 if points else np.empty(0)
+    level = rng.uniform(0.25, 0.55, (count, 1))
+    amplitude = rng.uniform(0.05, 0.2, (count, 1))
+    phase = rng.uniform(0, 2 * np.pi, (count, 1))
+    trend = rng.normal(0, 0.03, (count, 1))
+
+    unit = (level
+            + amplitude * np.sin(2 * np.pi * days + phase)
+            + trend * days
+            + rng.normal(0, 0.03, (count, points)))
+
+    # Short-lived spikes on roughly one datapoint in two hundred
+    spikes = rng.random((count, points)) < 0.005
+    unit += spikes * rng.uniform(0.2, 0.5, (count, points))
+
+    return low + span * np.clip(unit, 0, 1)
+
+def generate_resource_series(timestamps: np.ndarray, bounds_per_resource: List[Sequence[Tuple[float, float]]],
+                             shape: Optional[str] = None,
+                             rng: Optional[np.random.Generator] = None) -> List[np.ndarray]:
+    """
+    Generate the series of many resources in one batch.
+
+    bounds_per_resource holds the (min, max) bounds of each series of each
+    resource; the result holds, per resource, a 2-D array with one row per
+    series (views into one shared array).
+    """
+    flat_bounds = [bound for bounds in bounds_per_resource for bound in bounds]
+    values = generate_series_batch(timestamps, flat_bounds, shape, rng)
+
+    series = []
+    offset = 0
+    for bounds in bounds_per_resource:
+        series.append(values[offset:offset + len(bounds)])
+        offset += len(bounds)
+    return series
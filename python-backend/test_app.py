@@ -0,0 +1,306 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('numpy')
+pytest.importorskip('reportlab')
+pytest.importorskip('matplotlib')
+
+import app
+import azure_utils
+import report_generator
+
+AZURE_PARAMS = {
+    'cloudProvider': 'Azure',
+    'reportType': 'utilization',
+    'accountName': 'Test account',
+    'credentials': {'clientId': 'c', 'clientSecret': 's', 'tenantId': 't', 'subscriptionId': 'sub'},
+    'resources': ['VM|/subscriptions/sub/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/vm1|eastus']
+}
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(azure_utils, 'AZURE_METRICS_SOURCE', 'demo')
+    monkeypatch.setattr(report_generator, 'CHART_RENDER_WORKERS', 1)
+    monkeypatch.setattr(app.tempfile, 'tempdir', str(tmp_path))
+    return app.app.test_client()
+
+@pytest.mark.parametrize('report_type', ['utilization', 'billing'])
+def test_generate_report_returns_pdf_and_removes_temp_file(client, tmp_path, report_type):
+    response = client.post('/generate-report', json=dict(AZURE_PARAMS, reportType=report_type, month=1, year=2026))
+    body = response.get_data()
+    response.close()
+
+    assert response.status_code == 200
+    assert body.startswith(b'%PDF-')
+    assert 'filename=azure_' + report_type in response.headers['Content-Disposition']
+    trace = json.loads(response.headers['X-Report-Trace'])
+    assert trace['counters']['pdfBytes'] == len(body)
+    assert 'build_pdf' in trace['stages']
+    assert list(tmp_path.glob('*.pdf')) == []
+
+def test_generate_report_removes_temp_file_on_error(client, monkeypatch, tmp_path):
+    def fail(params, output=None, progress=None):
+        raise RuntimeError('collector failed')
+
+    monkeypatch.setattr(app, 'generate_report_data', fail)
+    response = client.post('/generate-report', json=AZURE_PARAMS)
+
+    assert response.status_code == 500
+    assert 'collector failed' in response.get_json()['error']
+    assert list(tmp_path.glob('*.pdf')) == []
+
+def test_generate_report_rejects_missing_credentials(client):
+    response = client.post('/generate-report', json=dict(AZURE_PARAMS, credentials={}))
+
+    assert response.status_code == 400
+
+def test_report_cache_key_follows_resource_order_and_repeats():
+    params = dict(AZURE_PARAMS, resources=['VM|a|eastus', 'VM|b|eastus'])
+    key = app.report_cache_key(params)
+
+    assert app.report_cache_key(dict(params)) == key
+    assert app.report_cache_key(dict(params, resources=['VM|b|eastus', 'VM|a|eastus'])) != key
+    assert app.report_cache_key(dict(params, resources=['VM|a|eastus', 'VM|a|eastus'])) != key
+
+def test_report_cache_key_depends_on_chart_format(monkeypatch):
+    key = app.report_cache_key(AZURE_PARAMS)
+    monkeypatch.setattr(app, 'CHART_FORMAT', 'vector' if app.CHART_FORMAT == 'png' else 'png')
+
+    assert app.report_cache_key(AZURE_PARAMS) != key
+
+def test_report_cache_key_fingerprints_credentials():
+    key = app.report_cache_key(AZURE_PARAMS)
+    other_account = dict(AZURE_PARAMS, credentials=dict(AZURE_PARAMS['credentials'], subscriptionId='other'))
+
+    assert app.report_cache_key(other_account) != key
+    assert 'sub' not in repr(app.normalize_report_request(AZURE_PARAMS)['credentials'])
+
+def test_worker_answers_commands_while_a_report_runs(monkeypatch):
+    output = io.StringIO()
+
+    def slow_job(job):
+        # Finish only once the test command behind this job has been answered
+        deadline = time.monotonic() + 5
+        while '"t1"' not in output.getvalue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return {'id': job['id'], 'success': True}
+
+    monkeypatch.setattr(app, 'run_worker_job', slow_job)
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(
+        '{"id": "r1", "params": {}, "output": "r1.pdf"}\n'
+        '{"id": "t1", "command": "test"}\n'
+        '{"id": "s1", "command": "status"}\n'
+    ))
+    monkeypatch.setattr(sys, 'stdout', output)
+    app.run_worker(1)
+
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [response['id'] for response in responses] == ['t1', 's1', 'r1']
+    assert responses[1]['jobs'] == 1
+
+@pytest.mark.parametrize('failing_stage', ['prefetch', 'render'])
+def test_scheduled_report_with_failed_resources_is_not_cached(monkeypatch, tmp_path, failing_stage):
+    from instrumentation import count
+    from report_scheduler import ReportScheduler
+    from result_cache import ResultCache
+
+    cache = ResultCache(str(tmp_path / 'reports'), max_bytes=1024 ** 2)
+    monkeypatch.setattr(app, 'get_report_cache', lambda: cache)
+    monkeypatch.setattr(app.tempfile, 'tempdir', str(tmp_path))
+
+    def collect(params):
+        if failing_stage == 'prefetch':
+            count('collectionFailures')
+        return [{'id': 'vm1'}]
+
+    def build(params, output=None, progress=None, metrics_data=None):
+        if failing_stage == 'render':
+            count('collectionFailures')
+        with open(output, 'wb') as f:
+            f.write(b'%PDF-partial')
+
+    monkeypatch.setattr(app, 'collect_report_metrics', collect)
+    monkeypatch.setattr(app, 'build_report', build)
+    scheduler = ReportScheduler(app.prefetch_scheduled_report, app.render_scheduled_report, app.get_period_days,
+                                delay=0, idle_wait=0)
+    report = scheduler.add(dict(AZURE_PARAMS, periodDays=1), 'daily')
+
+    assert scheduler.run_pending() == 0
+    assert report.status == 'failed'
+    assert 'Failed to collect 1' in report.error
+    assert os.listdir(cache.directory) == []
+    assert list(tmp_path.glob('*.pdf')) == []
+
+@pytest.fixture
+def job_manager(monkeypatch):
+    from report_jobs import ReportJobManager
+
+    manager = ReportJobManager(workers=1, max_pending=1)
+    monkeypatch.setattr(app, 'get_job_manager', lambda: manager)
+    return manager
+
+def wait_for_job(client, job_id):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        status = client.get(f'/reports/{job_id}').get_json()
+        if status['status'] in ('succeeded', 'failed'):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f'report job {job_id} did not finish')
+
+def test_report_job_is_polled_and_downloaded(client, job_manager, monkeypatch):
+    def generate(params, output=None, progress=None):
+        progress('rendering', 0.5)
+        with open(output, 'wb') as f:
+            f.write(b'%PDF-job')
+
+    monkeypatch.setattr(app, 'generate_report_data', generate)
+    response = client.post('/reports', json=AZURE_PARAMS)
+
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job['statusUrl'] == f"/reports/{job['jobId']}"
+    status = wait_for_job(client, job['jobId'])
+    assert status['progress'] == 1.0
+    assert client.get(f"/reports/{job['jobId']}/trace").get_json()['name'] == f"report-job-{job['jobId']}"
+
+    download = client.get(job['downloadUrl'])
+    assert download.status_code == 200
+    assert download.get_data() == b'%PDF-job'
+    assert job['filename'] in download.headers['Content-Disposition']
+    download.close()
+
+def test_report_job_download_before_it_finishes_or_after_it_failed(client, job_manager, monkeypatch):
+    release = threading.Event()
+
+    def generate(params, output=None, progress=None):
+        assert release.wait(5)
+        raise RuntimeError('collector failed')
+
+    monkeypatch.setattr(app, 'generate_report_data', generate)
+    job_id = client.post('/reports', json=AZURE_PARAMS).get_json()['jobId']
+    try:
+        response = client.get(f'/reports/{job_id}/download')
+        assert response.status_code == 409
+        assert response.get_json()['status'] in ('queued', 'running')
+    finally:
+        release.set()
+
+    assert wait_for_job(client, job_id)['error'] == 'collector failed'
+    response = client.get(f'/reports/{job_id}/download')
+    assert response.status_code == 500
+    assert 'collector failed' in response.get_json()['error']
+
+@pytest.mark.parametrize('path', ['/reports/missing', '/reports/missing/trace', '/reports/missing/download'])
+def test_unknown_report_job_is_not_found(client, job_manager, path):
+    assert client.get(path).status_code == 404
+
+def test_full_report_queue_is_refused(client, job_manager, monkeypatch, tmp_path):
+    release = threading.Event()
+    monkeypatch.setattr(app, 'generate_report_data', lambda params, output=None, progress=None: release.wait(5))
+    try:
+        assert client.post('/reports', json=AZURE_PARAMS).status_code == 202
+        response = client.post('/reports', json=AZURE_PARAMS)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '30'
+        # Only the accepted job's output file exists
+        assert len(list(tmp_path.glob('*.pdf'))) == 1
+    finally:
+        release.set()
+
+def write_manifest(tmp_path, reports, defaults=None):
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps({'defaults': defaults or {}, 'reports': reports}))
+    return str(path)
+
+def stub_batch_reports(monkeypatch, fail=()):
+    """Replace report building with one writing a small PDF, or failing for the reports in fail."""
+    def build(params, output=None, progress=None, metrics_data=None):
+        with open(output, 'wb') as f:
+            f.write(b'%PDF-' + params['accountName'].encode())
+        if params['accountName'] in fail:
+            raise RuntimeError(f"{params['accountName']} failed")
+        return output
+
+    monkeypatch.setattr(app, 'get_report_cache', lambda: None)
+    monkeypatch.setattr(app, 'build_report', build)
+
+def test_load_manifest_lays_params_over_defaults(tmp_path):
+    (tmp_path / 'beta.json').write_text(json.dumps({'accountName': 'beta'}))
+    manifest = write_manifest(tmp_path, [
+        {'name': 'alpha', 'params': {'accountName': 'alpha'}, 'output': 'a.pdf'},
+        {'name': 'beta/prod', 'paramsPath': 'beta.json'},
+        {'params': {'reportType': 'billing'}}
+    ], defaults={'reportType': 'utilization', 'cloudProvider': 'Azure'})
+
+    reports = app.load_manifest(manifest, 'out')
+
+    assert reports == [
+        ('alpha', {'reportType': 'utilization', 'cloudProvider': 'Azure', 'accountName': 'alpha'},
+         os.path.join('out', 'a.pdf')),
+        ('beta/prod', {'reportType': 'utilization', 'cloudProvider': 'Azure', 'accountName': 'beta'},
+         os.path.join('out', 'beta_prod.pdf')),
+        ('report-3', {'reportType': 'billing', 'cloudProvider': 'Azure'}, os.path.join('out', 'report-3.pdf'))
+    ]
+
+def test_load_manifest_rejects_duplicate_names(tmp_path):
+    manifest = write_manifest(tmp_path, [{'name': 'alpha'}, {'name': 'alpha'}])
+
+    with pytest.raises(ValueError, match='Duplicate report name'):
+        app.load_manifest(manifest, str(tmp_path))
+
+def test_run_batch_writes_reports_and_summary(monkeypatch, tmp_path):
+    stub_batch_reports(monkeypatch, fail={'beta'})
+    manifest = write_manifest(tmp_path, [
+        {'name': 'alpha', 'params': {'accountName': 'alpha'}},
+        {'name': 'beta', 'params': {'accountName': 'beta'}},
+        {'name': 'invalid', 'params': {'accountName': 'invalid', 'credentials': {}}}
+    ], defaults=AZURE_PARAMS)
+    output_dir = tmp_path / 'out'
+
+    summary = app.run_batch(manifest, str(output_dir), concurrency=2)
+
+    # Only the complete report is moved into place; nothing partial is left behind
+    assert sorted(path.name for path in output_dir.iterdir()) == ['alpha.pdf', 'alpha.pdf.trace.json', 'summary.json']
+    assert (output_dir / 'alpha.pdf').read_bytes() == b'%PDF-alpha'
+    assert json.loads((output_dir / 'summary.json').read_text()) == summary
+    assert (summary['total'], summary['succeeded'], summary['failed']) == (3, 1, 2)
+    assert summary['finishedAt'] is not None
+
+    entries = {entry['name']: entry for entry in summary['reports']}
+    assert entries['alpha']['success']
+    assert entries['alpha']['tracePath'] == str(output_dir / 'alpha.pdf.trace.json')
+    assert entries['beta'] == dict(entries['beta'], success=False, error='beta failed')
+    assert entries['invalid']['error'] == 'Azure credentials are required'
+
+@pytest.mark.parametrize('fail, status', [((), None), ({'beta'}, 1)])
+def test_batch_command_exits_with_1_when_a_report_fails(monkeypatch, tmp_path, capsys, fail, status):
+    stub_batch_reports(monkeypatch, fail=fail)
+    manifest = write_manifest(tmp_path, [
+        {'name': 'alpha', 'params': {'accountName': 'alpha'}},
+        {'name': 'beta', 'params': {'accountName': 'beta'}}
+    ], defaults=AZURE_PARAMS)
+    monkeypatch.setattr(sys, 'argv', ['app.py', '--manifest', manifest, '--output-dir', str(tmp_path / 'out')])
+
+    if status is None:
+        app.process_command_line()
+    else:
+        with pytest.raises(SystemExit) as exit_info:
+            app.process_command_line()
+        assert exit_info.value.code == status
+
+    assert json.loads(capsys.readouterr().out)['failed'] == len(fail)
+
+def test_metrics_are_served_in_the_prometheus_text_format(client):
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/plain; version=0.0.4; charset=utf-8'
+    assert '# TYPE report_generation_seconds histogram' in response.get_data(as_text=True)
@@ -0,0 +1,318 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('boto3')
+pytest.importorskip('pytz')
+
+import aws_utils
+import concurrency_utils
+from metric_series import BYTES_PER_GB, MetricSeries
+
+def rds_instance(instance_id: str, region: str):
+    return {
+        'id': instance_id,
+        'name': instance_id,
+        'type': 'db.t3.medium',
+        'engine': 'postgres',
+        'status': 'available',
+        'region': region,
+        'cpu': MetricSeries([0, 60], [10.0, 20.0]),
+        'memory': MetricSeries([0, 60], [2.0 * BYTES_PER_GB, 4.0 * BYTES_PER_GB]),
+        'disk': MetricSeries([0, 60], [8.0 * BYTES_PER_GB, 8.0 * BYTES_PER_GB])
+    }
+
+def test_duplicate_rds_resource_is_converted_once(monkeypatch):
+    collected_resources = []
+
+    def fake_collect(access_key, secret_key, resources, period_days):
+        collected_resources.extend(resources)
+        return {resource: rds_instance(resource[1], resource[2]) for resource in resources}
+
+    monkeypatch.setattr(aws_utils, 'collect_instance_metrics', fake_collect)
+    metrics = aws_utils.get_instance_metrics('key', 'secret', ['RDS|db-1|us-east-1', 'RDS|db-1|us-east-1'], 1)
+
+    assert collected_resources == [('RDS', 'db-1', 'us-east-1')]
+    assert len(metrics) == 2
+    for entry in metrics:
+        assert entry['metrics']['memory'].max == pytest.approx(4.0)
+        assert entry['metrics']['disk'].average == pytest.approx(8.0)
+
+def test_format_rds_metrics_leaves_instance_info_unchanged():
+    instance_info = rds_instance('db-1', 'us-east-1')
+    aws_utils.format_rds_metrics(instance_info)
+    formatted = aws_utils.format_rds_metrics(instance_info)
+
+    assert instance_info['memory'].max == 4.0 * BYTES_PER_GB
+    assert formatted['metrics']['memory'].max == pytest.approx(4.0)
+
+def test_get_instance_metrics_keeps_requested_order(monkeypatch):
+    monkeypatch.setattr(aws_utils, 'collect_instance_metrics',
+                        lambda access_key, secret_key, resources, period_days:
+                        {resource: rds_instance(resource[1], resource[2]) for resource in resources})
+    metrics = aws_utils.get_instance_metrics(
+        'key', 'secret', ['RDS|db-2|eu-west-1', 'RDS|db-1|us-east-1', 'RDS|db-2|eu-west-1'], 1)
+
+    assert [entry['id'] for entry in metrics] == ['db-2', 'db-1', 'db-2']
+
+def test_collect_instance_metrics_creates_only_needed_clients(monkeypatch):
+    created = []
+
+    def fake_client(service, region, access_key, secret_key, endpoint_url=None):
+        created.append((service, region))
+        return object()
+
+    monkeypatch.setattr(aws_utils, 'get_aws_client', fake_client)
+    monkeypatch.setattr(aws_utils, 'get_ec2_instance_index', lambda client, ids: {})
+    monkeypatch.setattr(aws_utils, 'get_rds_instance_index', lambda client, ids: {})
+
+    aws_utils.collect_instance_metrics('key', 'secret', [
+        ('EC2', 'i-1', 'us-east-1'),
+        ('EC2', 'i-2', 'us-east-1'),
+        ('RDS', 'db-1', 'eu-west-1')
+    ], 1)
+
+    assert sorted(created) == [('cloudwatch', 'eu-west-1'), ('cloudwatch', 'us-east-1'),
+                               ('ec2', 'us-east-1'), ('rds', 'eu-west-1')]
+
+def test_throttled_page_is_retried_without_restarting_pagination(monkeypatch):
+    class Throttled(Exception):
+        response = {'Error': {'Code': 'Throttling'}}
+
+    monkeypatch.setattr(concurrency_utils.time, 'sleep', lambda delay: None)
+    pages = {None: {'DBInstances': [1], 'Marker': 'b'}, 'b': {'DBInstances': [2], 'Marker': 'c'},
+             'c': {'DBInstances': [3]}}
+    requests = []
+
+    def describe_db_instances(**request):
+        requests.append(request.get('Marker'))
+        if requests.count('c') == 1 and request.get('Marker') == 'c':
+            raise Throttled()
+        return pages[request.get('Marker')]
+
+    result = [page['DBInstances'] for page in aws_utils.paginate_with_retry(describe_db_instances, 'Marker')]
+
+    assert result == [[1], [2], [3]]
+    assert requests == [None, 'b', 'c', 'c']
+
+class FakeDescribeClient:
+    """EC2 and RDS client serving describe results in pages of one instance."""
+
+    def __init__(self, region):
+        self.region = region
+
+    def describe_instances(self, Filters, NextToken=None):
+        index = int(NextToken or 0)
+        page = {'Reservations': [{'Instances': [{
+            'InstanceId': f'i-{self.region}-{index}',
+            'InstanceType': 't3.micro',
+            'State': {'Name': 'running'},
+            'Tags': [{'Key': 'Name', 'Value': f'web-{index}'}]
+        }]}]}
+        if index < 2:
+            page['NextToken'] = str(index + 1)
+        return page
+
+    def describe_db_instances(self, Marker=None):
+        index = int(Marker or 0)
+        page = {'DBInstances': [{
+            'DBInstanceIdentifier': f'db-{self.region}-{index}',
+            'DBInstanceClass': 'db.t3.medium',
+            'DBInstanceStatus': 'available',
+            'Engine': 'postgres'
+        }]}
+        if index < 1:
+            page['Marker'] = str(index + 1)
+        return page
+
+def test_discover_resources_reads_every_page_and_streams_each_region(monkeypatch):
+    monkeypatch.setattr(aws_utils, 'get_aws_client',
+                        lambda service, region, access_key, secret_key: FakeDescribeClient(region))
+    listings = []
+
+    instances = list(aws_utils.discover_resources(
+        'key', 'secret', regions=['us-east-1', 'eu-west-1'],
+        callback=lambda region, service_type, found: listings.append((region, service_type, len(found)))))
+
+    assert sorted(listings) == [('eu-west-1', 'EC2', 3), ('eu-west-1', 'RDS', 2),
+                                ('us-east-1', 'EC2', 3), ('us-east-1', 'RDS', 2)]
+    assert sorted(instance['id'] for instance in instances) == sorted(
+        [f'i-{region}-{index}' for region in ('us-east-1', 'eu-west-1') for index in range(3)] +
+        [f'db-{region}-{index}' for region in ('us-east-1', 'eu-west-1') for index in range(2)])
+    assert {instance['name'] for instance in instances if instance['service_type'] == 'EC2'} == {
+        'web-0', 'web-1', 'web-2'}
+
+def stubbed_client(service):
+    """Return a real boto3 client answered by a botocore Stubber, and the list of requests it receives."""
+    import boto3
+    from botocore.stub import Stubber
+
+    client = boto3.client(service, region_name='us-east-1', aws_access_key_id='key', aws_secret_access_key='secret')
+    requests = []
+    client.meta.events.register(f'provide-client-params.{service}.*',
+                                lambda params, **kwargs: requests.append(params))
+    stubber = Stubber(client)
+    stubber.activate()
+    return client, stubber, requests
+
+def metric_results(ids_points, next_token=None):
+    from datetime import datetime, timezone
+
+    response = {'MetricDataResults': [
+        {'Id': query_id, 'StatusCode': 'Complete',
+         'Timestamps': [datetime.fromtimestamp(ts, timezone.utc) for ts, _ in series_points],
+         'Values': [value for _, value in series_points]}
+        for query_id, series_points in ids_points
+    ]}
+    if next_token:
+        response['NextToken'] = next_token
+    return response
+
+def cpu_query(instance_id):
+    return {'path': ('cpu',), 'metric_name': 'CPUUtilization', 'namespace': 'AWS/EC2',
+            'dimensions': [{'Name': 'InstanceId', 'Value': instance_id}]}
+
+def test_metric_queries_are_split_at_the_get_metric_data_limit():
+    cloudwatch, stubber, requests = stubbed_client('cloudwatch')
+    queries = [cpu_query(f'i-{index}') for index in range(aws_utils.MAX_METRIC_DATA_QUERIES + 1)]
+    stubber.add_response('get_metric_data', metric_results(
+        [(f'm{index}', [(600, float(index))]) for index in range(aws_utils.MAX_METRIC_DATA_QUERIES)]))
+    stubber.add_response('get_metric_data', metric_results([('m0', [(600, -1.0)])]))
+
+    results = aws_utils.get_metric_data_batch(cloudwatch, queries, 1)
+
+    stubber.assert_no_pending_responses()
+    assert [len(request['MetricDataQueries']) for request in requests] == [500, 1]
+    assert requests[1]['MetricDataQueries'][0]['MetricStat']['Metric']['Dimensions'][0]['Value'] == 'i-500'
+    assert [series.values[0] for series in results[:3]] == [0.0, 1.0, 2.0]
+    assert results[-1].values.tolist() == [-1.0]
+
+def test_metric_data_pages_are_followed_and_joined_per_series():
+    cloudwatch, stubber, requests = stubbed_client('cloudwatch')
+    stubber.add_response('get_metric_data', metric_results(
+        [('m1', [(0, 5.0)]), ('m0', [(0, 1.0), (300, 2.0)])], next_token='page-2'))
+    stubber.add_response('get_metric_data', metric_results([('m0', [(600, 3.0)])]))
+
+    results = aws_utils.get_metric_data_batch(cloudwatch, [cpu_query('i-a'), cpu_query('i-b')], 1)
+
+    assert 'NextToken' not in requests[0]
+    assert requests[1]['NextToken'] == 'page-2'
+    assert results[0].timestamps.tolist() == [0, 300, 600]
+    assert results[0].values.tolist() == [1.0, 2.0, 3.0]
+    assert results[1].values.tolist() == [5.0]
+
+def test_batched_results_are_mapped_back_to_instances_and_windows_drives(monkeypatch):
+    ec2, ec2_stubber, _ = stubbed_client('ec2')
+    cloudwatch, cloudwatch_stubber, requests = stubbed_client('cloudwatch')
+    clients = {'ec2': ec2, 'cloudwatch': cloudwatch}
+    monkeypatch.setattr(aws_utils, 'get_aws_client', lambda service, *args: clients[service])
+    ec2_stubber.add_response('describe_instances', {'Reservations': [{'Instances': [
+        {'InstanceId': 'i-linux', 'InstanceType': 't3.micro', 'State': {'Name': 'running'}},
+        {'InstanceId': 'i-win', 'InstanceType': 't3.large', 'State': {'Name': 'stopped'}, 'Platform': 'windows'}
+    ]}]})
+    # Queries: i-linux cpu, memory, disk /; i-win cpu, memory, disk C, D, E. Results come back unordered.
+    cloudwatch_stubber.add_response('get_metric_data', metric_results(
+        [(f'm{index}', [(0, float(index))]) for index in (7, 0, 5, 2, 6, 1, 3, 4)]))
+
+    instances = aws_utils.collect_instance_metrics('key', 'secret', [
+        ('EC2', 'i-linux', 'us-east-1'), ('EC2', 'i-win', 'us-east-1')], 1)
+
+    queries = requests[0]['MetricDataQueries']
+    assert [query['Id'] for query in queries] == [f'm{index}' for index in range(8)]
+    assert [dimension['Value'] for dimension in queries[5]['MetricStat']['Metric']['Dimensions']] == ['i-win', 'C:']
+
+    linux = instances[('EC2', 'i-linux', 'us-east-1')]
+    assert (linux['cpu'].values[0], linux['memory'].values[0], linux['disk_metrics']['disk'].values[0]) == (0, 1, 2)
+    windows = instances[('EC2', 'i-win', 'us-east-1')]
+    assert (windows['os'], windows['state']) == ('windows', 'stopped')
+    assert (windows['cpu'].values[0], windows['memory'].values[0]) == (3, 4)
+    assert {drive: series.values[0] for drive, series in windows['disk_metrics'].items()} == {
+        'disk C': 5, 'disk D': 6, 'disk E': 7}
+
+def test_cached_batch_requests_only_the_missing_tail(monkeypatch, tmp_path):
+    from datetime import datetime, timezone
+
+    from metrics_cache import MetricsCache
+
+    cache = MetricsCache(str(tmp_path / 'metrics.db'), settle_seconds=600)
+    monkeypatch.setattr(aws_utils, 'get_metrics_cache', lambda: cache)
+    cloudwatch, stubber, requests = stubbed_client('cloudwatch')
+    queries = [cpu_query('i-a'), cpu_query('i-b')]
+    now = 1791763200
+    start = now - 86400
+
+    monkeypatch.setattr(aws_utils.time, 'time', lambda: now)
+    stubber.add_response('get_metric_data', metric_results(
+        [('m0', [(start, 1.0), (now - 300, 2.0)]), ('m1', [(start, 5.0)])]))
+    first = aws_utils.get_cached_metric_data_batch(cloudwatch, queries, 1, 'account', 'us-east-1')
+
+    # An hour later only the last hour and the still-settling 10 minutes before it are requested
+    later = now + 3600
+    monkeypatch.setattr(aws_utils.time, 'time', lambda: later)
+    stubber.add_response('get_metric_data', metric_results(
+        [('m0', [(now - 300, 2.5), (later - 300, 3.0)]), ('m1', [(later, 6.0)])]))
+    second = aws_utils.get_cached_metric_data_batch(cloudwatch, queries, 1, 'account', 'us-east-1')
+
+    # Straight away, only the settling tail is requested again
+    stubber.add_response('get_metric_data', metric_results([('m0', [(later - 300, 3.0)]), ('m1', [(later, 6.0)])]))
+    third = aws_utils.get_cached_metric_data_batch(cloudwatch, queries, 1, 'account', 'us-east-1')
+
+    stubber.assert_no_pending_responses()
+    assert len(requests) == 3
+    assert requests[0]['StartTime'] == datetime.fromtimestamp(start, timezone.utc)
+    assert requests[1]['StartTime'] == datetime.fromtimestamp(now - 600, timezone.utc)
+    assert requests[1]['EndTime'] == datetime.fromtimestamp(later, timezone.utc)
+    assert requests[2]['StartTime'] == datetime.fromtimestamp(later - 600, timezone.utc)
+    assert first[0].values.tolist() == [1.0, 2.0]
+    # The refetched tail replaces the cached datapoints it overlaps; the window moved on by an hour
+    assert second[0].timestamps.tolist() == [now - 300, later - 300]
+    assert second[0].values.tolist() == [2.5, 3.0]
+    assert second[1].values.tolist() == [6.0]
+    assert [series.values.tolist() for series in third] == [series.values.tolist() for series in second]
+    cache.close()
+
+def test_cached_batch_skips_series_the_cache_covers(monkeypatch, tmp_path):
+    from metrics_cache import MetricsCache
+
+    cache = MetricsCache(str(tmp_path / 'metrics.db'), settle_seconds=0)
+    monkeypatch.setattr(aws_utils, 'get_metrics_cache', lambda: cache)
+    monkeypatch.setattr(aws_utils.time, 'time', lambda: 1791763200)
+    cloudwatch, stubber, requests = stubbed_client('cloudwatch')
+    stubber.add_response('get_metric_data', metric_results([('m0', [(1791763200 - 600, 1.0)])]))
+    aws_utils.get_cached_metric_data_batch(cloudwatch, [cpu_query('i-a')], 1, 'account', 'us-east-1')
+
+    # i-a is answered from the cache; only i-b is requested, as the batch's only query
+    stubber.add_response('get_metric_data', metric_results([('m0', [(1791763200 - 300, 7.0)])]))
+    results = aws_utils.get_cached_metric_data_batch(cloudwatch, [cpu_query('i-a'), cpu_query('i-b')], 1,
+                                                     'account', 'us-east-1')
+
+    assert len(requests) == 2
+    assert [query['MetricStat']['Metric']['Dimensions'][0]['Value']
+            for query in requests[1]['MetricDataQueries']] == ['i-b']
+    assert [series.values.tolist() for series in results] == [[1.0], [7.0]]
+    cache.close()
+
+def test_throttled_calls_are_retried_by_call_with_retry_only():
+    from botocore.exceptions import ClientError
+
+    import cost_explorer_stub
+
+    server, state = cost_explorer_stub.start_stub_server(
+        state=cost_explorer_stub.StubState(throttle_rate=1.0))
+    ce = aws_utils.get_aws_client('ce', 'us-east-1', 'AKIARETRIES', 'secret',
+                                  endpoint_url=f'http://127.0.0.1:{server.server_port}')
+    request = {'TimePeriod': {'Start': '2026-09-01', 'End': '2026-09-02'}, 'Granularity': 'DAILY',
+               'Metrics': ['UnblendedCost']}
+    try:
+        with pytest.raises(ClientError) as error:
+            ce.get_cost_and_usage(**request)
+        assert error.value.response['Error']['Code'] == 'ThrottlingException'
+        # botocore makes a single attempt
+        assert state.calls['throttled'] == 1
+
+        with pytest.raises(ClientError):
+            concurrency_utils.call_with_retry(lambda: ce.get_cost_and_usage(**request),
+                                              max_attempts=3, base_delay=0)
+        assert state.calls['throttled'] == 4
+    finally:
+        server.shutdown()
+        server.server_close()
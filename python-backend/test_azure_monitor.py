@@ -0,0 +1,135 @@
+import threading
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('urllib3')
+
+import azure_monitor
+
+def test_token_request_for_one_tenant_does_not_block_others(monkeypatch):
+    release_slow = threading.Event()
+    requests = []
+
+    def fake_request_json(operation, method, url, **kwargs):
+        requests.append(url)
+        if '/slow/' in url:
+            assert release_slow.wait(5)
+        return {'access_token': url.split('/')[-4], 'expires_in': 3600}
+
+    monkeypatch.setattr(azure_monitor, 'request_json', fake_request_json)
+    cache = azure_monitor.TokenCache()
+    slow_tokens = []
+    waiters = [threading.Thread(target=lambda: slow_tokens.append(cache.get_token('client', 'secret', 'slow')))
+               for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+
+    try:
+        # Answered while the slow tenant's request is still outstanding
+        assert cache.get_token('client', 'secret', 'fast') == 'fast'
+    finally:
+        release_slow.set()
+        for thread in waiters:
+            thread.join(5)
+
+    assert slow_tokens == ['slow', 'slow', 'slow']
+    assert sum('/slow/' in url for url in requests) == 1
+    assert cache.get_token('client', 'secret', 'slow') == 'slow'
+    assert len(requests) == 2
+
+def test_token_is_refreshed_shortly_before_it_expires(monkeypatch):
+    responses = iter([{'access_token': 'first', 'expires_in': 30}, {'access_token': 'second', 'expires_in': 3600}])
+    monkeypatch.setattr(azure_monitor, 'request_json', lambda *args, **kwargs: next(responses))
+    cache = azure_monitor.TokenCache(refresh_margin=60)
+
+    assert cache.get_token('client', 'secret', 'tenant') == 'first'
+    assert cache.get_token('client', 'secret', 'tenant') == 'second'
+    assert cache.get_token('client', 'secret', 'tenant') == 'second'
+
+def test_resources_of_a_failed_batch_are_counted_once(monkeypatch):
+    from instrumentation import start_trace
+
+    def fake_fetch(token, subscription_id, region, *args):
+        if region == 'westus':
+            raise azure_monitor.AzureMonitorError('throttled')
+        return []
+
+    monkeypatch.setattr(azure_monitor, 'get_access_token', lambda *args: 'token')
+    monkeypatch.setattr(azure_monitor, 'fetch_metrics_batch', fake_fetch)
+    resources = [('VM', '/vms/a', 'westus'), ('VM', '/vms/b', 'westus'), ('VM', '/vms/c', 'eastus')]
+    with start_trace() as trace:
+        assert azure_monitor.collect_azure_metrics('client', 'secret', 'tenant', 'sub', resources, 1) == []
+
+    # Both resources of the failed batch and the one the service left out
+    assert trace.counters['collectionFailures'] == 3
+
+def recorded_entry(resource_id, metrics):
+    return {'resourceid': resource_id, 'value': [{
+        'name': {'value': name},
+        'timeseries': [{'data': [{'timeStamp': '2026-10-01T00:00:00Z', 'average': values[0]},
+                                 {'timeStamp': '2026-10-01T00:30:00Z', 'average': values[1]},
+                                 {'timeStamp': '2026-10-01T01:00:00Z'}]}]
+    } for name, values in metrics.items()]}
+
+def test_metrics_round_trip_through_the_stub_in_per_region_batches(monkeypatch):
+    import azure_monitor_stub
+    from azure_utils import parse_azure_resource
+
+    sub = '/subscriptions/sub/resourceGroups/rg/providers'
+    database = f'{sub}/Microsoft.Sql/servers/sql/databases/orders'
+    recorded_vm = f'{sub}/Microsoft.Compute/virtualMachines/vm-0'
+    recordings = {
+        recorded_vm.lower(): recorded_entry(
+            recorded_vm, {'Percentage CPU': (12.5, 40.0), 'Available Memory Percentage': (25.0, 60.0)}),
+        database.lower(): recorded_entry(database, {'cpu_percent': (30.0, 50.0), 'storage': (2 * 1024 ** 3, 3 * 1024 ** 3)})
+    }
+    server, state = azure_monitor_stub.start_stub_server(state=azure_monitor_stub.StubState(recordings, seed=0))
+    stub_url = f'http://127.0.0.1:{server.server_port}'
+
+    batches = []
+    fetch_metrics_batch = azure_monitor.fetch_metrics_batch
+
+    def recording_fetch(token, subscription_id, region, namespace, metric_names, resource_ids, *args):
+        batches.append((region, namespace, list(resource_ids)))
+        return fetch_metrics_batch(token, subscription_id, region, namespace, metric_names, resource_ids, *args)
+
+    monkeypatch.setattr(azure_monitor, 'MAX_BATCH_RESOURCES', 2)
+    monkeypatch.setattr(azure_monitor, 'fetch_metrics_batch', recording_fetch)
+    resources = [parse_azure_resource(f'VM|{sub}/Microsoft.Compute/virtualMachines/vm-{index}|{region}')
+                 for index, region in enumerate(['eastus', 'westus', 'eastus', 'eastus'])]
+    resources.append(parse_azure_resource(f'Database|{database}|eastus'))
+    try:
+        metrics_data = azure_monitor.collect_azure_metrics('client', 'secret', 'tenant', 'sub', resources, 1,
+                                                           authority_host=stub_url,
+                                                           metrics_endpoint=f'{stub_url}/{{region}}')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # One batch per region and service type, split at MAX_BATCH_RESOURCES
+    vms = 'Microsoft.Compute/virtualMachines'
+    assert sorted(batches) == sorted([
+        ('eastus', vms, [resources[0][1], resources[2][1]]),
+        ('eastus', vms, [resources[3][1]]),
+        ('westus', vms, [resources[1][1]]),
+        ('eastus', 'Microsoft.Sql/servers/databases', [database])
+    ])
+    assert state.calls['getBatch'] == 4
+    assert state.calls['token'] == 1
+
+    assert [resource['id'] for resource in metrics_data] == [resource_id for _, resource_id, _ in resources]
+    vm, db = metrics_data[0], metrics_data[-1]
+    assert vm['name'] == 'VM-vm-0' and vm['region'] == 'eastus' and vm['service_type'] == 'VM'
+    assert vm['metrics']['cpu'].values.tolist() == [12.5, 40.0]
+    assert vm['metrics']['cpu'].timestamps.tolist() == [1790812800, 1790814600]
+    # Available memory is turned into used memory; points without an average are dropped
+    assert vm['metrics']['memory'].values.tolist() == [75.0, 40.0]
+    assert len(vm['metrics']['disk']) == 0
+    # Storage bytes are reported in GB
+    assert db['metrics']['disk'].values.tolist() == [2.0, 3.0]
+    assert db['service_type'] == 'Database' and db['name'] == 'DB-orders'
+    # Synthetic resources get every metric of their service type
+    assert all(len(metrics_data[1]['metrics'][key]) > 0 for key in ('cpu', 'memory', 'disk'))
+    # Azure Monitor has no power state or OS to report
+    assert all('state' not in resource and 'platform' not in resource for resource in metrics_data)
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip('boto3')
+pytest.importorskip('numpy')
+pytest.importorskip('reportlab')
+pytest.importorskip('matplotlib')
+
+import benchmark
+
+def scenario(provider, size):
+    return {'provider': provider, 'size': size, 'window': 'daily', 'chartFormat': 'vector', 'throttleRate': 0.0}
+
+def test_in_process_aws_scenarios_use_their_own_fleet():
+    first = benchmark.run_scenario(scenario('aws', 3))
+    second = benchmark.run_scenario(scenario('aws', 6))
+
+    assert first['resources'] == 3
+    assert second['resources'] == 6
+    assert second['apiCallsTotal'] > 0
+    assert second['apiCalls'].get('GetMetricData', 0) > 0
+
+def test_in_process_azure_monitor_scenarios_use_their_own_stub():
+    first = benchmark.run_scenario(scenario('azure-monitor', 2))
+    second = benchmark.run_scenario(scenario('azure-monitor', 4))
+
+    assert first['resources'] == 2
+    assert second['resources'] == 4
+    # Each scenario's stub is asked for a token and at least one batch
+    assert second['apiCallsTotal'] >= 2
+
+def test_in_process_scenarios_leave_report_generator_unpatched():
+    import report_generator
+
+    render_chart_flowables = report_generator.render_chart_flowables
+    result = benchmark.run_scenario(scenario('aws', 2))
+
+    assert report_generator.render_chart_flowables is render_chart_flowables
+    # Three charts per resource, counted by the report trace
+    assert result['charts'] == 6
+    assert 0 < result['stages']['charts'] <= result['stages']['render']
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('matplotlib')
+pytest.importorskip('reportlab')
+
+from reportlab.graphics.shapes import Drawing
+from reportlab.platypus import Image
+
+import chart_renderer
+import report_generator
+from metric_series import MetricSeries
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def chart_args(instance_name, metric_name, values):
+    series = MetricSeries([1790812800 + 1800 * index for index in range(len(values))], values)
+    return series, metric_name, instance_name, series.average, series.min, series.max
+
+CPU = chart_args('web-1', 'CPU Utilization', [10.0, 55.0, 30.0, 80.0])
+DISK = chart_args('db-1', 'Disk Usage', [120.0, 121.5, 119.0])
+EMPTY = chart_args('idle-1', 'Memory Utilization', [])
+
+def artist_counts(renderer):
+    return (len(renderer.axes.lines), len(renderer.axes.texts), len(renderer.figure.texts),
+            len(renderer.axes.collections), len(renderer.axes.patches))
+
+def test_reused_renderer_draws_the_same_charts_as_fresh_ones():
+    renderer = chart_renderer.ChartRenderer()
+    artists = artist_counts(renderer)
+
+    reused = [renderer.render(*args) for args in (CPU, DISK, EMPTY, CPU)]
+
+    # Nothing from earlier charts is left on the figure
+    assert artist_counts(renderer) == artists
+    assert reused == [chart_renderer.ChartRenderer().render(*args) for args in (CPU, DISK, EMPTY, CPU)]
+    assert all(chart.startswith(PNG_SIGNATURE) for chart in reused)
+    assert len(set(reused[:3])) == 3
+
+def test_each_thread_gets_its_own_renderer():
+    renderers = []
+    threads = [threading.Thread(target=lambda: renderers.append(chart_renderer.get_chart_renderer()))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    own = chart_renderer.get_chart_renderer()
+    assert own is chart_renderer.get_chart_renderer()
+    assert len({id(renderer) for renderer in renderers + [own]}) == 3
+
+def test_failed_chart_is_replaced_by_an_error_chart():
+    error_chart = chart_renderer.render_error_chart('Error creating chart: boom')
+    assert error_chart.startswith(PNG_SIGNATURE)
+
+    chart, ok = report_generator.create_chart_result((None, 'CPU Utilization', 'web-1', 0, 0, 0))
+    assert not ok
+    assert chart.startswith(PNG_SIGNATURE)
+    assert report_generator.create_chart_result(CPU) == (chart_renderer.get_chart_renderer().render(*CPU), True)
+
+def test_chart_format_selects_images_or_drawings(monkeypatch):
+    monkeypatch.setattr(report_generator, 'CHART_FORMAT', 'vector')
+    assert all(isinstance(flowable, Drawing) for flowable in report_generator.render_chart_flowables([CPU, DISK]))
+    assert all(isinstance(flowable, Image)
+               for flowable in report_generator.render_chart_flowables([CPU, DISK], workers=1, chart_format='png'))
+
+    monkeypatch.setattr(report_generator, 'CHART_FORMAT', 'png')
+    assert all(isinstance(flowable, Image) for flowable in report_generator.render_chart_flowables([CPU], workers=1))
+
+def test_chart_format_is_read_from_the_environment():
+    env = dict(os.environ, CHART_FORMAT='Vector')
+    output = subprocess.run([sys.executable, '-c', 'import chart_renderer; print(chart_renderer.CHART_FORMAT)'],
+                            cwd=os.path.dirname(os.path.abspath(chart_renderer.__file__)), env=env,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == 'vector'
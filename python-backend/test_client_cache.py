@@ -0,0 +1,83 @@
+import threading
+import time
+
+from client_cache import TTLCache, credentials_fingerprint
+
+def test_fingerprint_hides_secrets_and_separates_parts():
+    fingerprint = credentials_fingerprint('AKIAEXAMPLE', 'secret')
+
+    assert 'secret' not in fingerprint
+    assert fingerprint == credentials_fingerprint('AKIAEXAMPLE', 'secret')
+    assert fingerprint != credentials_fingerprint('AKIAEXAMPL', 'Esecret')
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(ttl=60)
+    cache.get_or_create('key', lambda: 'first')
+
+    now[0] += 59
+    assert cache.get('key') == 'first'
+    now[0] += 2
+    assert cache.get('key') is None
+    assert cache.get_or_create('key', lambda: 'second') == 'second'
+
+def test_purge_expired_drops_only_expired_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(ttl=60)
+    cache.get_or_create('old', lambda: 1)
+    now[0] += 30
+    cache.get_or_create('new', lambda: 2)
+    now[0] += 40
+
+    assert cache.purge_expired() == 1
+    assert cache.get('old') is None
+    assert cache.get('new') == 2
+
+def test_least_recently_used_entry_is_evicted_and_left_open():
+    class Client:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    cache = TTLCache(max_size=2)
+    first = cache.get_or_create('a', Client)
+    cache.get_or_create('b', Client)
+    cache.get('a')
+    cache.get_or_create('c', Client)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is first
+    assert len(cache) == 2
+    # A caller may still be using an evicted value, so it is never closed
+    cache.clear()
+    assert not first.closed
+
+def test_same_key_is_built_once_while_other_keys_proceed():
+    release = threading.Event()
+    calls = []
+
+    def slow_factory():
+        calls.append('slow')
+        assert release.wait(5)
+        return 'slow'
+
+    cache = TTLCache()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_create('slow', slow_factory)))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        # The cache lock is not held while the slow value is built
+        assert cache.get_or_create('fast', lambda: 'fast') == 'fast'
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+    assert calls == ['slow']
+    assert results == ['slow', 'slow', 'slow']
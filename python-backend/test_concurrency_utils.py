@@ -0,0 +1,68 @@
+import pytest
+
+import concurrency_utils
+from concurrency_utils import call_with_retry, is_throttling_error, run_ordered
+
+class ThrottledError(Exception):
+    def __init__(self, code='Throttling'):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': 400}}
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(concurrency_utils.time, 'sleep', sleeps.append)
+    # Full jitter draws from [0, bound]; the bound itself shows the backoff
+    monkeypatch.setattr(concurrency_utils.random, 'uniform', lambda low, high: high)
+    return sleeps
+
+def flaky(failures, error=ThrottledError):
+    calls = []
+
+    def func():
+        calls.append(len(calls))
+        if len(calls) <= failures:
+            raise error()
+        return 'ok'
+    return func, calls
+
+def test_throttling_errors_are_recognised():
+    assert is_throttling_error(ThrottledError('ThrottlingException'))
+    assert is_throttling_error(ThrottledError('RequestLimitExceeded'))
+    # A quota error, which retrying cannot fix
+    assert not is_throttling_error(ThrottledError('LimitExceededException'))
+    assert not is_throttling_error(ThrottledError('AccessDenied'))
+    assert not is_throttling_error(ValueError('boom'))
+
+def test_retries_throttled_calls_with_exponential_backoff(sleeps):
+    func, calls = flaky(3)
+
+    assert call_with_retry(func, max_attempts=6, base_delay=0.5, max_delay=20) == 'ok'
+    assert len(calls) == 4
+    assert sleeps == [0.5, 1.0, 2.0]
+
+def test_backoff_is_capped_at_max_delay(sleeps):
+    func, _ = flaky(5)
+
+    call_with_retry(func, max_attempts=6, base_delay=1, max_delay=3)
+    assert sleeps == [1, 2, 3, 3, 3]
+
+def test_gives_up_after_max_attempts(sleeps):
+    func, calls = flaky(10)
+
+    with pytest.raises(ThrottledError):
+        call_with_retry(func, max_attempts=3, base_delay=0.1)
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+
+def test_other_errors_are_not_retried(sleeps):
+    func, calls = flaky(1, error=lambda: ThrottledError('AccessDenied'))
+
+    with pytest.raises(ThrottledError):
+        call_with_retry(func)
+    assert len(calls) == 1
+    assert sleeps == []
+
+def test_run_ordered_keeps_task_order():
+    assert run_ordered([lambda value=value: value * 2 for value in range(20)], max_workers=4) == \
+        [value * 2 for value in range(20)]
@@ -0,0 +1,44 @@
+from cost_cache import CostCache
+
+def item(day, amount, service='Amazon EC2', usage_type='BoxUsage'):
+    return (day, service, usage_type, amount, 'USD')
+
+def test_month_state_of_unknown_month_is_none():
+    cache = CostCache(':memory:')
+
+    assert cache.month_state('acct', '2026-09') is None
+    assert cache.load('acct', '2026-09-01', '2026-10-01') == []
+
+def test_store_records_fetched_until_and_closed():
+    cache = CostCache(':memory:')
+    cache.store('acct', '2026-09', '2026-09-01', '2026-09-15', [item('2026-09-01', 1.0)], closed=False)
+    assert cache.month_state('acct', '2026-09') == ('2026-09-15', False)
+
+    cache.store('acct', '2026-09', '2026-09-12', '2026-10-01', [], closed=True)
+    assert cache.month_state('acct', '2026-09') == ('2026-10-01', True)
+
+def test_refresh_replaces_only_the_fetched_days():
+    cache = CostCache(':memory:')
+    cache.store('acct', '2026-09', '2026-09-01', '2026-09-04', [
+        item('2026-09-01', 1.0), item('2026-09-02', 2.0), item('2026-09-03', 3.0),
+        item('2026-09-03', 0.5, usage_type='EBS')
+    ], closed=False)
+    # Revised estimates for the last day; the EBS item of that day disappeared
+    cache.store('acct', '2026-09', '2026-09-03', '2026-09-05', [
+        item('2026-09-03', 3.5), item('2026-09-04', 4.0)
+    ], closed=False)
+
+    assert cache.load('acct', '2026-09-01', '2026-10-01') == [
+        item('2026-09-01', 1.0), item('2026-09-02', 2.0), item('2026-09-03', 3.5), item('2026-09-04', 4.0)
+    ]
+
+def test_load_is_limited_to_account_and_days(tmp_path):
+    cache = CostCache(str(tmp_path / 'costs.db'))
+    cache.store('a', '2026-09', '2026-09-01', '2026-10-01', [item('2026-09-30', 1.0)], closed=True)
+    cache.store('a', '2026-10', '2026-10-01', '2026-10-02', [item('2026-10-01', 2.0)], closed=False)
+    cache.store('b', '2026-09', '2026-09-01', '2026-10-01', [item('2026-09-30', 9.0)], closed=True)
+    cache.close()
+
+    reopened = CostCache(str(tmp_path / 'costs.db'))
+    assert reopened.load('a', '2026-09-01', '2026-10-01') == [item('2026-09-30', 1.0)]
+    assert reopened.month_state('b', '2026-09') == ('2026-10-01', True)
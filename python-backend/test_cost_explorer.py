@@ -0,0 +1,90 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip('boto3')
+
+import cost_explorer
+import cost_explorer_stub
+from aws_utils import get_aws_client
+from cost_cache import CostCache
+
+@pytest.fixture
+def stub(monkeypatch):
+    server, state = cost_explorer_stub.start_stub_server(state=cost_explorer_stub.StubState(seed=0, page_days=7))
+    monkeypatch.setattr(cost_explorer, 'COST_EXPLORER_ENDPOINT', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setattr(cost_explorer, 'COST_REFRESH_DAYS', 3)
+    monkeypatch.setattr(cost_explorer, 'COST_FINALIZE_DAYS', 5)
+    yield state
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = CostCache(':memory:')
+    monkeypatch.setattr(cost_explorer, 'get_cost_cache', lambda: cache)
+    return cache
+
+def days_of(items):
+    return sorted({day for day, *_ in items})
+
+def test_fetch_follows_next_page_token(stub):
+    ce = get_aws_client('ce', cost_explorer.COST_EXPLORER_REGION, 'AKIAPAGES', 'secret',
+                        endpoint_url=cost_explorer.COST_EXPLORER_ENDPOINT)
+    items = cost_explorer.fetch_cost_and_usage(ce, date(2026, 9, 1), date(2026, 10, 1))
+
+    # 30 days in pages of 7 days
+    assert stub.calls['GetCostAndUsage'] == 5
+    assert len(items) == 30 * len(cost_explorer_stub.USAGE_TYPES)
+    assert days_of(items)[0] == '2026-09-01' and days_of(items)[-1] == '2026-09-30'
+    day, service, usage_type, amount, unit = items[0]
+    typical = next(cost for name, usage, cost in cost_explorer_stub.USAGE_TYPES
+                   if (name, usage) == (service, usage_type))
+    assert amount == cost_explorer_stub.daily_cost(0, day, service, usage_type, typical)
+    assert unit == 'USD'
+
+def test_closed_month_is_fetched_once(stub, cache):
+    today = date(2026, 10, 6)
+    items, closed = cost_explorer.get_month_costs('AKIACLOSED', 'secret', 2026, 9, today)
+    assert closed
+    assert stub.calls['days'] == 30
+
+    cached_items, closed = cost_explorer.get_month_costs('AKIACLOSED', 'secret', 2026, 9, date(2026, 10, 20))
+    assert closed
+    assert sorted(cached_items) == sorted(items)
+    assert stub.calls['days'] == 30
+
+def test_month_within_finalize_days_is_refreshed(stub, cache):
+    _, closed = cost_explorer.get_month_costs('AKIASETTLING', 'secret', 2026, 9, date(2026, 10, 5))
+    assert not closed
+    assert stub.calls['days'] == 30
+
+    # Not final yet: the last COST_REFRESH_DAYS days are fetched again, then it is closed
+    items, closed = cost_explorer.get_month_costs('AKIASETTLING', 'secret', 2026, 9, date(2026, 10, 6))
+    assert closed
+    assert stub.calls['days'] == 33
+    assert len(days_of(items)) == 30
+
+def test_open_month_refetches_only_the_last_refresh_days(stub, cache):
+    items, closed = cost_explorer.get_month_costs('AKIAOPEN', 'secret', 2026, 10, date(2026, 10, 10))
+    assert not closed
+    assert stub.calls['days'] == 10
+    assert days_of(items)[-1] == '2026-10-10'
+
+    # Fetched until 10-11, so 10-08 through 10-12 are requested
+    items, closed = cost_explorer.get_month_costs('AKIAOPEN', 'secret', 2026, 10, date(2026, 10, 12))
+    assert not closed
+    assert stub.calls['days'] == 15
+    assert days_of(items) == [f'2026-10-{day:02d}' for day in range(1, 13)]
+    assert len(items) == 12 * len(cost_explorer_stub.USAGE_TYPES)
+
+def test_billing_data_compares_with_the_previous_month(stub, cache):
+    billing = cost_explorer.get_billing_data('AKIABILLING', 'secret', 10, 2026, today=date(2026, 10, 10))
+
+    assert billing['month'] == 10 and billing['year'] == 2026
+    assert not billing['closed']
+    assert billing['lastDay'] == '2026-10-10'
+    assert billing['currency'] == 'USD'
+    assert billing['total'] == pytest.approx(sum(amount for _, amount in billing['services']))
+    assert billing['previousTotal'] > billing['total'] > 0
+    assert set(billing['previousServices']) == {service for service, _ in billing['services']}
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip('flask')
+
+import import_budget
+
+def assert_within_budget(result):
+    assert result['error'] is None
+    assert result['forbiddenLoaded'] == []
+    assert result['ok'], f"{result['check']} took {result['seconds']}s, budget {result['budget']}s"
+
+def test_import_app_stays_light_and_within_budget():
+    result = import_budget.check_import_app(import_budget.IMPORT_BUDGET_SECONDS)
+
+    assert_within_budget(result)
+    assert result['seconds'] > 0
+
+def test_cli_test_stays_light_and_within_budget():
+    assert_within_budget(import_budget.check_cli_test(import_budget.STARTUP_BUDGET_SECONDS))
+
+def test_parse_importtime_reads_cumulative_seconds():
+    stderr = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        120 |   _io',
+        'import time:      2000 |     350000 | flask',
+        'Traceback (most recent call last):'
+    ])
+
+    assert import_budget.parse_importtime(stderr) == {'_io': 0.00012, 'flask': 0.35}
+    assert import_budget.forbidden_loaded(['botocore.client', 'flask', 'numpy'],
+                                          import_budget.STARTUP_FORBIDDEN) == ['botocore', 'numpy']
@@ -0,0 +1,73 @@
+import json
+import threading
+
+import instrumentation
+from concurrency_utils import run_ordered
+from instrumentation import count, current_trace, span, start_trace, trace_path, write_trace
+
+def test_spans_and_counters_aggregate_per_name():
+    with start_trace('report') as trace:
+        for _ in range(3):
+            with span('render_charts', charts=2):
+                count('charts', 2)
+        with span('build_pdf'):
+            pass
+        count('pdfBytes', 1000)
+
+    assert trace.stages['render_charts']['count'] == 3
+    assert trace.stages['build_pdf']['count'] == 1
+    assert trace.counters == {'charts': 6, 'pdfBytes': 1000}
+    assert [s['name'] for s in trace.spans] == ['render_charts'] * 3 + ['build_pdf']
+    assert trace.spans[0]['attrs'] == {'charts': 2}
+    assert trace.summary()['counters'] == {'charts': 6, 'pdfBytes': 1000}
+    assert set(trace.summary()['stages']) == {'render_charts', 'build_pdf'}
+
+def test_recording_outside_a_trace_is_a_no_op():
+    assert current_trace() is None
+    with span('build_pdf'):
+        count('charts')
+    assert current_trace() is None
+
+def test_run_ordered_tasks_record_into_their_callers_trace():
+    barrier = threading.Barrier(2)
+    traces = {}
+
+    def generate(name):
+        with start_trace(name) as trace:
+            barrier.wait(5)
+            # Both reports fan out at once; each task's count goes to its own report
+            run_ordered([lambda: count('collected') for _ in range(4)], max_workers=4)
+        traces[name] = trace
+
+    threads = [threading.Thread(target=generate, args=(name,)) for name in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert traces['a'].counters == traces['b'].counters == {'collected': 4}
+
+def test_api_calls_are_aggregated_per_operation(monkeypatch):
+    monkeypatch.setattr(instrumentation.service_metrics, 'record_api_call', lambda *args: None)
+    with start_trace() as trace:
+        instrumentation.record_api_call('cloudwatch', 'GetMetricData', 0.5)
+        instrumentation.record_api_call('cloudwatch', 'GetMetricData', 1.5, error='Throttling', throttled=True,
+                                        retries=2)
+
+    stats = trace.to_dict()['apiCalls']['cloudwatch.GetMetricData']
+    assert (stats['count'], stats['errors'], stats['throttles'], stats['retries']) == (2, 1, 1, 2)
+    assert stats['maxSeconds'] == 1.5
+    assert trace.summary()['apiCalls'] == {'cloudwatch.GetMetricData': 2}
+    assert trace.summary()['throttles'] == 1
+
+def test_write_trace_beside_the_report(tmp_path):
+    output = str(tmp_path / 'report.pdf')
+    with start_trace('nightly') as trace:
+        count('charts', 3)
+
+    assert write_trace(trace, output) == trace_path(output) == output + '.trace.json'
+    with open(trace_path(output)) as f:
+        written = json.load(f)
+    assert written['name'] == 'nightly'
+    assert written['counters'] == {'charts': 3}
+    assert write_trace(trace, str(tmp_path / 'missing' / 'report.pdf')) is None
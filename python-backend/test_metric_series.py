@@ -0,0 +1,58 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from metric_series import BYTES_PER_GB, MetricSeries, get_metric_period
+
+def test_points_are_sorted_by_time():
+    series = MetricSeries([300, 0, 600], [3.0, 1.0, 6.0])
+
+    assert series.timestamps.tolist() == [0, 300, 600]
+    assert series.values.tolist() == [1.0, 3.0, 6.0]
+
+def test_mismatched_columns_are_rejected():
+    with pytest.raises(ValueError):
+        MetricSeries([0, 60], [1.0])
+
+def test_aggregates():
+    series = MetricSeries.from_pairs([(0, 2.0), (60, 4.0), (120, 9.0)])
+
+    assert series.average == 5.0
+    assert series.min == 2.0
+    assert series.max == 9.0
+    assert series.percentile(50) == 4.0
+    assert series.bytes_to_gb().values.tolist() == [v / BYTES_PER_GB for v in (2.0, 4.0, 9.0)]
+
+def test_empty_series_aggregates_are_zero():
+    series = MetricSeries()
+
+    assert (series.average, series.min, series.max, series.percentile(95)) == (0, 0, 0, 0)
+    assert series.start_datetime() is None
+
+def test_short_series_is_not_downsampled():
+    series = MetricSeries(np.arange(10) * 60, np.arange(10.0))
+
+    assert series.downsampled(10) is series
+    assert series.downsampled(2) is series
+
+def test_downsampling_keeps_ends_and_extremes():
+    count = 10000
+    values = np.sin(np.linspace(0, 20, count))
+    values[3333] = 50.0
+    values[6666] = -50.0
+    series = MetricSeries(np.arange(count) * 60, values)
+
+    sampled = series.downsampled(200)
+
+    assert len(sampled) == 200
+    assert sampled.timestamps[0] == 0
+    assert sampled.timestamps[-1] == (count - 1) * 60
+    assert np.all(np.diff(sampled.timestamps) > 0)
+    assert sampled.max == 50.0
+    assert sampled.min == -50.0
+    # Every kept point is a point of the original series
+    assert np.array_equal(sampled.values, values[sampled.timestamps // 60])
+
+def test_metric_period():
+    assert get_metric_period(1) == 300
+    assert get_metric_period(7) == 1800
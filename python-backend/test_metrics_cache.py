@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from metrics_cache import MetricsCache, make_series_key
+
+DAY = 86400
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetricsCache(str(tmp_path / 'metrics.db'), max_points=1000, max_age_days=1, settle_seconds=0)
+    # Evict only when a test asks for it
+    cache._last_eviction = time.monotonic()
+    yield cache
+    cache.close()
+
+def points(start, end, step=300, value=1.0):
+    return [(ts, value) for ts in range(start, end + 1, step)]
+
+def series_row(cache, series_key):
+    return cache._conn.execute('SELECT fetched_from, fetched_until, points FROM series WHERE series_key = ?',
+                               (series_key,)).fetchone()
+
+def test_series_key_ignores_dimension_order():
+    first = make_series_key('acct', 'us-east-1', 'AWS/EC2', 'CPUUtilization',
+                            [{'Name': 'A', 'Value': '1'}, {'Name': 'B', 'Value': '2'}], 300, 'Average')
+    second = make_series_key('acct', 'us-east-1', 'AWS/EC2', 'CPUUtilization',
+                             [{'Name': 'B', 'Value': '2'}, {'Name': 'A', 'Value': '1'}], 300, 'Average')
+    other_region = make_series_key('acct', 'eu-west-1', 'AWS/EC2', 'CPUUtilization',
+                                   [{'Name': 'A', 'Value': '1'}, {'Name': 'B', 'Value': '2'}], 300, 'Average')
+
+    assert first == second
+    assert first != other_region
+
+def test_tail_refresh_replaces_overlap_and_keeps_count(cache):
+    now = int(time.time())
+    now -= now % 300
+    cache.store('cpu', points(now - 3600, now - 600), now - 3600, now - 600)
+    cache.store('cpu', points(now - 1200, now, value=2.0), now - 1200, now)
+
+    assert series_row(cache, 'cpu') == (now - 3600, now, 13)
+    assert len(cache.load('cpu', now - 3600, now)) == 13
+    assert cache.load('cpu', now - 1200, now - 1200) == [(now - 1200, 2.0)]
+    assert cache.missing_interval('cpu', now - 1800, now, 300) is None
+    assert cache.missing_interval('cpu', now - 1800, now + 900, 300) == (now, now + 900)
+
+def test_evict_prunes_old_datapoints_and_advances_coverage(cache):
+    now = int(time.time())
+    start = now - DAY - 3600
+    cache.store('cpu', points(start, now), start, now)
+
+    cache.evict()
+    fetched_from, fetched_until, count = series_row(cache, 'cpu')
+
+    assert fetched_from >= now - DAY
+    assert fetched_until == now
+    assert count == len(cache.load('cpu', start, now))
+    # The pruned hour is no longer reported as covered
+    assert cache.missing_interval('cpu', start, now, 300) == (start, now)
+
+def test_evict_drops_least_recently_read_series_over_the_limit(cache):
+    now = int(time.time())
+    for series_key in ('old', 'recent'):
+        cache.store(series_key, points(now - 600 * 60, now - 60, step=60), now - 600 * 60, now - 60)
+    cache.load('recent', now - 3600, now)
+
+    cache.evict()
+
+    assert series_row(cache, 'old') is None
+    assert series_row(cache, 'recent')[2] == 600
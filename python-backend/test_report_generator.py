@@ -0,0 +1,113 @@
+import gc
+import re
+import weakref
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('reportlab')
+pytest.importorskip('matplotlib')
+
+import report_generator
+from metric_series import MetricSeries
+
+def vm(index):
+    series = MetricSeries([0, 3600, 7200], [10.0 + index, 20.0, 30.0])
+    return {'id': f'vm-{index}', 'name': f'VM-{index}', 'type': 'Standard_B2s', 'platform': 'Linux',
+            'state': 'running', 'region': 'eastus', 'service_type': 'VM',
+            'metrics': {'cpu': series, 'memory': series, 'disk': series}}
+
+def page_count(pdf):
+    return len(re.findall(rb'/Type /Page\b', pdf))
+
+def test_utilization_report_releases_each_chunk_of_charts(monkeypatch):
+    monkeypatch.setattr(report_generator, 'REPORT_CHUNK_SIZE', 2)
+    render_chart_flowables = report_generator.render_chart_flowables
+    chunks = []
+    live_at_render = []
+
+    def tracked_render(chart_jobs, workers=None, chart_format=None):
+        gc.collect()
+        live_at_render.append(sum(ref() is not None for chunk in chunks for ref in chunk))
+        flowables = render_chart_flowables(chart_jobs, workers, chart_format)
+        chunks.append([weakref.ref(flowable) for flowable in flowables])
+        return flowables
+
+    monkeypatch.setattr(report_generator, 'render_chart_flowables', tracked_render)
+    pdf = report_generator.generate_pdf_report('Test account', [vm(index) for index in range(5)], 'Azure',
+                                               chart_workers=1, chart_format='png')
+
+    # Three chunks of resources, each rendered once the previous one's images were laid out and freed
+    assert [len(chunk) for chunk in chunks] == [6, 6, 3]
+    assert live_at_render == [0, 0, 0]
+    # A cover page, then two pages per resource, as when the report is laid out in one chunk
+    assert page_count(pdf) == 11
+    monkeypatch.setattr(report_generator, 'REPORT_CHUNK_SIZE', 10)
+    assert page_count(report_generator.generate_pdf_report('Test account', [vm(index) for index in range(5)],
+                                                           'Azure', chart_workers=1, chart_format='png')) == 11
+
+def test_process_pool_renders_charts_in_input_order_like_the_serial_path():
+    import multiprocessing
+
+    jobs = report_generator.collect_chart_jobs([vm(index) for index in range(3)])
+    serial = report_generator.render_chart_results(jobs, workers=1)
+    try:
+        parallel = report_generator.render_chart_results(jobs, workers=2)
+        pool_pids = {process.pid for process in multiprocessing.active_children()}
+        assert pool_pids
+    finally:
+        report_generator.shutdown_chart_executor()
+
+    assert len(parallel) == len(jobs) == 9
+    assert all(ok for _, ok in parallel)
+    assert [chart for chart, _ in parallel] == [chart for chart, _ in serial]
+    # Charts of different values differ, so equal lists mean the same order
+    assert len({chart for chart, _ in serial}) > 1
+    # Shutting the pool down reaps its workers
+    assert not pool_pids & {process.pid for process in multiprocessing.active_children()}
+    assert report_generator._chart_executor is None
+
+def billing_data(closed=True):
+    return {'month': 9, 'year': 2026, 'closed': closed, 'currency': 'USD', 'total': 150.0,
+            'services': [('Amazon EC2', 100.0), ('Amazon S3 & Glacier', 50.0)],
+            'usageTypes': [('Amazon EC2', 'BoxUsage:t3.medium', 100.0), ('Amazon S3 & Glacier', 'TimedStorage', 50.0)],
+            'days': [('2026-09-01', 150.0)], 'lastDay': '2026-09-01',
+            'previousTotal': 120.0, 'previousServices': {'Amazon EC2': 120.0}}
+
+def element_text(elements):
+    texts = []
+    for element in elements:
+        if hasattr(element, 'getPlainText'):
+            texts.append(element.getPlainText())
+        for row in getattr(element, '_cellvalues', []):
+            texts.extend(cell.getPlainText() if hasattr(cell, 'getPlainText') else str(cell) for cell in row)
+    return '\n'.join(texts)
+
+def test_billing_report_lists_costs_per_service_and_usage_type():
+    elements = []
+    report_generator.create_billing_report(None, elements, 'Test account', 'AWS', 9, 2026, billing_data(closed=False))
+    text = element_text(elements)
+
+    assert 'AWS BILLING' in text
+    assert 'September 2026' in text
+    assert 'Amazon S3 & Glacier' in text
+    assert 'BoxUsage:t3.medium' in text
+    assert '2026-09-01' in text
+    assert '+25.0%' in text
+    assert 'not available' not in text
+
+    pdf = report_generator.generate_pdf_report('Test account', cloud_provider='AWS', report_type='billing',
+                                               month=9, year=2026, billing_data=billing_data())
+    assert pdf.startswith(b'%PDF') and page_count(pdf) >= 1
+
+def test_billing_report_without_billing_data_says_it_is_not_available():
+    elements = []
+    report_generator.create_billing_report(None, elements, 'Test account', 'Azure', 9, 2026)
+    text = element_text(elements)
+
+    assert 'Billing data is not available for Azure accounts yet.' in text
+    assert 'Total Cost' not in text
+
+    pdf = report_generator.generate_pdf_report('Test account', cloud_provider='Azure', report_type='billing',
+                                               month=9, year=2026)
+    assert pdf.startswith(b'%PDF') and page_count(pdf) == 1
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+import report_jobs
+from report_jobs import FAILED, QUEUED, SUCCEEDED, JobQueueFull, ReportJobManager
+
+def wait_done(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.done
+
+def write_report(output_path, progress):
+    progress('collecting metrics', 0.25)
+    progress('rendering', 0.75)
+    # Progress never goes backwards
+    progress('rendering', 0.5)
+    with open(output_path, 'wb') as f:
+        f.write(b'%PDF-')
+
+def test_job_records_progress_and_trace(tmp_path):
+    manager = ReportJobManager(workers=1)
+    job = manager.submit(write_report, str(tmp_path / 'report.pdf'), 'report.pdf')
+    wait_done(job)
+
+    assert job.status == SUCCEEDED
+    assert job.stage == SUCCEEDED
+    assert job.progress == 1.0
+    assert job.trace.name == f'report-job-{job.id}'
+    assert job.to_dict()['trace'] is not None
+    assert manager.get(job.id) is job
+    assert manager.pending_count() == 0
+
+def test_progress_is_published_while_running(tmp_path):
+    release = threading.Event()
+
+    def run(output_path, progress):
+        progress('rendering', 0.5)
+        assert release.wait(5)
+
+    manager = ReportJobManager(workers=1)
+    job = manager.submit(run, str(tmp_path / 'report.pdf'), 'report.pdf')
+    try:
+        deadline = time.monotonic() + 5
+        while job.stage != 'rendering' and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert job.to_dict()['progress'] == 0.5
+        assert manager.pending_count() == 1
+    finally:
+        release.set()
+    wait_done(job)
+
+def test_failed_job_removes_its_output(tmp_path):
+    def fail(output_path, progress):
+        with open(output_path, 'wb') as f:
+            f.write(b'partial')
+        raise RuntimeError('collector failed')
+
+    output = tmp_path / 'report.pdf'
+    job = ReportJobManager(workers=1).submit(fail, str(output), 'report.pdf')
+    wait_done(job)
+
+    assert job.status == FAILED
+    assert job.error == 'collector failed'
+    assert not output.exists()
+
+def test_submissions_beyond_max_pending_are_refused(tmp_path):
+    release = threading.Event()
+    manager = ReportJobManager(workers=1, max_pending=2)
+    blocked = lambda output_path, progress: release.wait(5)
+    try:
+        first = manager.submit(blocked, str(tmp_path / 'a.pdf'), 'a.pdf')
+        second = manager.submit(blocked, str(tmp_path / 'b.pdf'), 'b.pdf')
+        assert second.status == QUEUED
+        with pytest.raises(JobQueueFull):
+            manager.submit(blocked, str(tmp_path / 'c.pdf'), 'c.pdf')
+    finally:
+        release.set()
+    wait_done(first)
+    wait_done(second)
+
+    # Finished jobs no longer count as pending
+    wait_done(manager.submit(write_report, str(tmp_path / 'c.pdf'), 'c.pdf'))
+
+def test_finished_jobs_and_files_are_purged_after_the_ttl(tmp_path, monkeypatch):
+    manager = ReportJobManager(workers=1, ttl=60)
+    output = tmp_path / 'report.pdf'
+    job = manager.submit(write_report, str(output), 'report.pdf')
+    wait_done(job)
+
+    assert manager.purge_expired() == 0
+    assert output.exists()
+
+    now = time.time()
+    monkeypatch.setattr(report_jobs.time, 'time', lambda: now + 61)
+    assert manager.get(job.id) is None
+    assert not output.exists()
+    assert manager.purge_expired() == 0
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from report_scheduler import ReportScheduler, load_schedule_file, period_start
+
+# Monday 2026-10-12 00:00 UTC
+MONDAY = 1791763200
+DAY = 86400
+
+def make_scheduler(calls, fail_prefetch=False, fail_render=False, busy=None, delay=600):
+    def prefetch(params):
+        calls.append(('prefetch', params['name']))
+        if fail_prefetch:
+            raise RuntimeError('prefetch failed')
+        return params['name'] + '-data'
+
+    def render(params, data, start):
+        calls.append(('render', data, start))
+        if fail_render:
+            raise RuntimeError('render failed')
+
+    return ReportScheduler(prefetch, render, lambda params: params['periodDays'],
+                           is_busy=busy, delay=delay, idle_wait=0, poll=1)
+
+def test_period_start():
+    assert period_start(1, MONDAY + 2 * DAY + 3600) == MONDAY + 2 * DAY
+    assert period_start(1, MONDAY) == MONDAY
+    # Weekly periods start on Mondays
+    assert period_start(7, MONDAY + 6 * DAY + 3600) == MONDAY
+    assert period_start(7, MONDAY + 7 * DAY) == MONDAY + 7 * DAY
+
+def test_reports_are_due_after_the_delay_and_once_per_period():
+    calls = []
+    scheduler = make_scheduler(calls)
+    daily = scheduler.add({'name': 'daily', 'periodDays': 1}, 'daily')
+    weekly = scheduler.add({'name': 'weekly', 'periodDays': 7}, 'weekly')
+
+    assert scheduler.due(MONDAY + 599) == []
+    assert scheduler.run_pending(MONDAY + DAY + 600) == 2
+    # Both are prefetched before anything is rendered
+    assert calls == [('prefetch', 'daily'), ('prefetch', 'weekly'),
+                     ('render', 'daily-data', MONDAY + DAY), ('render', 'weekly-data', MONDAY)]
+    assert daily.status == weekly.status == 'ready'
+
+    assert scheduler.run_pending(MONDAY + DAY + 3600) == 0
+    assert [report.id for report, _ in scheduler.due(MONDAY + 2 * DAY + 600)] == ['daily']
+
+@pytest.mark.parametrize('failure', ['fail_prefetch', 'fail_render'])
+def test_failed_reports_are_retried_next_period(failure):
+    calls = []
+    scheduler = make_scheduler(calls, **{failure: True})
+    report = scheduler.add({'name': 'daily', 'periodDays': 1}, 'daily')
+
+    assert scheduler.run_pending(MONDAY + 600) == 0
+    assert report.status == 'failed'
+    assert 'failed' in report.error
+    assert report.last_period == MONDAY
+    assert scheduler.due(MONDAY + 3600) == []
+    assert scheduler.due(MONDAY + DAY + 600) == [(report, MONDAY + DAY)]
+
+def test_rendering_waits_for_on_demand_work():
+    calls = []
+    busy = iter([True, False])
+    scheduler = make_scheduler(calls, busy=lambda: next(busy, False))
+    scheduler.idle_wait = 5
+    scheduler.add({'name': 'daily', 'periodDays': 1})
+
+    assert scheduler.run_pending(MONDAY + 600) == 1
+    assert next(busy, None) is None
+
+def test_remove_and_to_dict():
+    scheduler = make_scheduler([])
+    report = scheduler.add({'name': 'weekly', 'periodDays': 7, 'resources': [{}, {}],
+                            'awsAccessKey': 'secret'}, 'weekly')
+
+    assert report.to_dict()['frequency'] == 'weekly'
+    assert report.to_dict()['resources'] == 2
+    assert 'secret' not in json.dumps(report.to_dict())
+    assert scheduler.remove('weekly')
+    assert not scheduler.remove('weekly')
+    assert scheduler.list() == []
+
+def test_load_schedule_file(tmp_path):
+    path = tmp_path / 'schedule.json'
+    path.write_text(json.dumps([
+        {'id': 'nightly', 'params': {'periodDays': 1}},
+        {'periodDays': 7}
+    ]))
+
+    assert load_schedule_file(str(path)) == [('nightly', {'periodDays': 1}), (None, {'periodDays': 7})]
@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip('reportlab')
+
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, Table
+
+from report_styles import PARAGRAPH_STYLES, TABLE_STYLES, create_table, is_plain_cell, wrap_table_data
+
+WIDTH = 2 * inch
+
+@pytest.mark.parametrize('text', ['<b>Name</b>', 'a > b', 'Amazon S3 & Glacier', 'two\nlines'])
+def test_markup_cells_are_wrapped_in_paragraphs(text):
+    assert not is_plain_cell(text, WIDTH)
+    [[cell]] = wrap_table_data([[text]], [WIDTH])
+
+    assert isinstance(cell, Paragraph)
+    assert cell.style is PARAGRAPH_STYLES['Normal']
+
+def test_cells_wider_than_their_column_are_wrapped_in_paragraphs():
+    long_name = 'i-0123456789abcdef0 ' * 4
+
+    assert not is_plain_cell(long_name, WIDTH)
+    assert isinstance(wrap_table_data([[long_name]], [WIDTH])[0][0], Paragraph)
+    # The same text fits a wide enough column
+    assert wrap_table_data([[long_name]], [8 * inch]) == [[long_name]]
+
+def test_short_plain_cells_stay_strings():
+    existing = Paragraph('Kept', PARAGRAPH_STYLES['Normal'])
+    rows = wrap_table_data([['Instance ID', 42, existing]], [WIDTH, WIDTH, WIDTH])
+
+    assert rows == [['Instance ID', '42', existing]]
+    assert rows[0][2] is existing
+
+def test_every_cell_is_a_paragraph_without_column_widths():
+    assert all(isinstance(cell, Paragraph) for cell in wrap_table_data([['Name', 'web-1']])[0])
+
+def test_create_table_wraps_cells_for_its_columns():
+    table = create_table([['Account', 'Test & Co'], ['Report', 'Billing Report']], [1.5 * inch, 3 * inch],
+                         'ReportInfo')
+
+    assert isinstance(table, Table)
+    assert table._cellvalues[1] == ['Report', 'Billing Report']
+    assert isinstance(table._cellvalues[0][1], Paragraph)
+    with pytest.raises(KeyError):
+        create_table([['a']], [WIDTH], 'Missing')
+
+def test_style_registries_are_read_only():
+    with pytest.raises(TypeError):
+        PARAGRAPH_STYLES['Normal'] = PARAGRAPH_STYLES['Title']
+    with pytest.raises(TypeError):
+        TABLE_STYLES['Custom'] = TABLE_STYLES['Summary']
+    with pytest.raises(TypeError):
+        del TABLE_STYLES['Summary']
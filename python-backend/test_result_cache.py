@@ -0,0 +1,123 @@
+import io
+import os
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache, digest, make_chart_key, make_report_key
+
+def set_mtime(cache, key, mtime):
+    os.utime(cache.path(key), (mtime, mtime))
+
+def test_report_key_ignores_dict_order_but_not_values():
+    request = {'reportType': 'utilization', 'resources': [{'id': 'i-1'}, {'id': 'i-2'}], 'periodDays': 7}
+    reordered = {'periodDays': 7, 'resources': [{'id': 'i-1'}, {'id': 'i-2'}], 'reportType': 'utilization'}
+
+    assert make_report_key(request, 3600) == make_report_key(reordered, 3600)
+    assert make_report_key(request, 3600) != make_report_key(request, 5400)
+    # Resource order is the order of the report's sections
+    swapped = dict(request, resources=[{'id': 'i-2'}, {'id': 'i-1'}])
+    assert make_report_key(request, 3600) != make_report_key(swapped, 3600)
+
+def test_digest_separates_parts():
+    assert digest(b'ab', b'c') != digest(b'a', b'bc')
+    assert digest('report', {'a': 1}) != digest('chart', {'a': 1})
+
+def test_chart_key_covers_data_style_and_labels():
+    np = pytest.importorskip('numpy')
+    from metric_series import MetricSeries
+
+    series = MetricSeries(np.arange(0, 600, 60), np.arange(10.0))
+    key = make_chart_key(series, {'color': 'blue'}, 'CPU', '%')
+
+    assert key == make_chart_key(MetricSeries(np.arange(0, 600, 60), np.arange(10.0)), {'color': 'blue'}, 'CPU', '%')
+    assert key != make_chart_key(series.scaled(2), {'color': 'blue'}, 'CPU', '%')
+    assert key != make_chart_key(series, {'color': 'red'}, 'CPU', '%')
+    assert key != make_chart_key(series, {'color': 'blue'}, 'Memory', '%')
+
+def test_put_get_and_copy_to(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=1024)
+    source = tmp_path / 'report.pdf'
+    source.write_bytes(b'%PDF-report')
+
+    assert cache.get('missing') is None
+    assert not cache.copy_to('missing', str(tmp_path / 'out.pdf'))
+
+    cache.put('chart', b'png-bytes')
+    cache.put_file('report', str(source))
+    assert cache.get('chart') == b'png-bytes'
+
+    output = io.BytesIO()
+    assert cache.copy_to('report', output)
+    assert output.getvalue() == b'%PDF-report'
+    assert cache.copy_to('report', str(tmp_path / 'out.pdf'))
+    assert (tmp_path / 'out.pdf').read_bytes() == b'%PDF-report'
+    # No temporary files are left behind
+    assert sorted(os.listdir(cache.directory)) == ['chart', 'report']
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=25)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    cache.get('a')
+    cache.put('c', b'x' * 10)
+
+    assert cache.get('b') is None
+    assert not os.path.exists(cache.path('b'))
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+
+def test_replacing_an_entry_counts_its_size_once(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=25)
+    cache.put('a', b'x' * 10)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is not None
+
+def test_an_oversized_entry_is_kept_alone(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=5)
+    cache.put('a', b'x' * 3)
+    cache.put('big', b'x' * 10)
+
+    assert cache.get('a') is None
+    assert cache.get('big') == b'x' * 10
+
+def test_index_is_rebuilt_in_mtime_order(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=100)
+    cache.put('old', b'x' * 10)
+    cache.put('new', b'x' * 10)
+    set_mtime(cache, 'old', 1000)
+    set_mtime(cache, 'new', 2000)
+
+    reopened = ResultCache(str(tmp_path), max_bytes=25)
+    reopened.put('newest', b'x' * 10)
+
+    assert reopened.get('old') is None
+    assert reopened.get('new') is not None
+    assert reopened.get('newest') is not None
+
+def test_entry_removed_by_another_process_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=100)
+    cache.put('a', b'data')
+    os.remove(cache.path('a'))
+
+    assert cache.get('a') is None
+    cache.put('b', b'x' * 100)
+    assert cache.get('b') is not None
+
+def test_processes_sharing_a_directory_keep_it_under_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, 'INDEX_REFRESH_SECONDS', 0)
+    first = ResultCache(str(tmp_path), max_bytes=35)
+    second = ResultCache(str(tmp_path), max_bytes=35)
+    first.put('a', b'x' * 10)
+    second.put('b', b'x' * 10)
+    first.put('c', b'x' * 10)
+    set_mtime(first, 'a', 1000)
+    second.put('d', b'x' * 10)
+
+    # second never saw a or c being written, but its eviction pass does
+    assert sorted(name for name in os.listdir(str(tmp_path)) if not name.startswith('.')) == ['b', 'c', 'd']
+    assert second.get('c') == b'x' * 10
+    assert first.get('a') is None
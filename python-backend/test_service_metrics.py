@@ -0,0 +1,48 @@
+import service_metrics
+from service_metrics import Counter, Gauge, Histogram
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('request_seconds', 'Request time.', ('route',), buckets=(0.5, 0.1, 1))
+    for value in (0.05, 0.1, 0.3, 2):
+        histogram.observe(value, ('/reports',))
+
+    # Bounds are inclusive and sorted; +Inf counts every observation
+    assert '\n'.join(histogram.render()) == '\n'.join([
+        '# HELP request_seconds Request time.',
+        '# TYPE request_seconds histogram',
+        'request_seconds_bucket{route="/reports",le="0.1"} 2',
+        'request_seconds_bucket{route="/reports",le="0.5"} 3',
+        'request_seconds_bucket{route="/reports",le="1"} 3',
+        'request_seconds_bucket{route="/reports",le="+Inf"} 4',
+        'request_seconds_sum{route="/reports"} 2.45',
+        'request_seconds_count{route="/reports"} 4'
+    ])
+
+def test_counter_escapes_label_values():
+    counter = Counter('calls_total', 'Calls.', ('operation', 'outcome'))
+    counter.inc(('Get"Metric"Data', 'error'))
+    counter.inc(('C:\\path\nnext', 'success'), 2.5)
+    counter.inc(('Get"Metric"Data', 'error'))
+
+    assert counter.render() == [
+        '# HELP calls_total Calls.',
+        '# TYPE calls_total counter',
+        'calls_total{operation="C:\\\\path\\nnext",outcome="success"} 2.5',
+        'calls_total{operation="Get\\"Metric\\"Data",outcome="error"} 2'
+    ]
+
+def test_gauges_without_labels_and_from_functions():
+    gauge = Gauge('in_flight', 'In flight.')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    assert gauge.samples() == ['in_flight 1']
+    assert Gauge('started', 'Start time.', function=lambda: 1.5).samples() == ['started 1.5']
+
+def test_render_metrics_ends_with_a_newline(monkeypatch):
+    counter = Counter('calls_total', 'Calls.')
+    counter.inc()
+    monkeypatch.setattr(service_metrics, '_registry', [counter])
+
+    assert service_metrics.render_metrics() == '# HELP calls_total Calls.\n# TYPE calls_total counter\ncalls_total 1\n'
@@ -0,0 +1,45 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import synthetic_metrics
+from synthetic_metrics import demo_timestamps, generate_resource_series, generate_series_batch, get_rng
+
+BOUNDS = [(0.0, 100.0), (2.0, 8.0), (40.0, 40.5)]
+
+@pytest.mark.parametrize('shape', synthetic_metrics.SHAPES)
+def test_same_seed_gives_identical_series(shape):
+    timestamps = demo_timestamps(7, end=1791763200)
+
+    first = generate_series_batch(timestamps, BOUNDS, shape, get_rng(42))
+    second = generate_series_batch(timestamps, BOUNDS, shape, get_rng(42))
+
+    assert np.array_equal(first, second)
+    assert not np.array_equal(first, generate_series_batch(timestamps, BOUNDS, shape, get_rng(43)))
+
+@pytest.mark.parametrize('shape', synthetic_metrics.SHAPES)
+def test_series_stay_within_their_bounds(shape):
+    timestamps = demo_timestamps(30, end=1791763200)
+    values = generate_series_batch(timestamps, BOUNDS, shape, get_rng(7))
+
+    assert values.shape == (len(BOUNDS), len(timestamps))
+    for row, (low, high) in zip(values, BOUNDS):
+        assert row.min() >= low and row.max() <= high
+
+def test_seed_is_read_from_the_environment_setting(monkeypatch):
+    monkeypatch.setattr(synthetic_metrics, 'DEMO_METRICS_SEED', '5')
+    timestamps = demo_timestamps(1, end=1791763200)
+
+    assert np.array_equal(generate_series_batch(timestamps, BOUNDS, 'uniform'),
+                          generate_series_batch(timestamps, BOUNDS, 'uniform'))
+
+def test_resource_series_are_split_per_resource():
+    timestamps = demo_timestamps(1, end=1791763200)
+    series = generate_resource_series(timestamps, [BOUNDS[:2], BOUNDS[2:]], 'uniform', get_rng(1))
+
+    assert [rows.shape for rows in series] == [(2, len(timestamps)), (1, len(timestamps))]
+    assert np.array_equal(np.vstack(series), generate_series_batch(timestamps, BOUNDS, 'uniform', get_rng(1)))
+
+def test_unknown_shape_is_rejected():
+    with pytest.raises(ValueError, match='Unknown demo metrics shape'):
+        generate_series_batch(demo_timestamps(1), BOUNDS, 'sawtooth')
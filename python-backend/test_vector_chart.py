@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('reportlab')
+
+from reportlab.graphics.shapes import Drawing, PolyLine
+
+from metric_series import MetricSeries
+from vector_chart import create_chart_drawing, nice_ticks
+
+def assert_covers(ticks, low, high):
+    assert ticks[0] <= low and ticks[-1] >= high
+    steps = {round(b - a, 9) for a, b in zip(ticks, ticks[1:])}
+    assert len(steps) == 1 and steps.pop() > 0
+
+@pytest.mark.parametrize('low, high', [(0, 100), (12.3, 87.6), (-5, 5), (0.001, 0.004), (3, 3), (0, 0), (7, 2)])
+def test_nice_ticks_cover_the_range_with_even_steps(low, high):
+    ticks = nice_ticks(low, high)
+
+    assert_covers(ticks, low, max(low, high))
+    assert 2 <= len(ticks) <= 12
+
+def test_nice_ticks_use_round_steps():
+    assert nice_ticks(0, 100) == [0, 20, 40, 60, 80, 100]
+    # A flat series still gets an axis
+    assert nice_ticks(5, 5) == pytest.approx([5, 5.2, 5.4, 5.6, 5.8, 6])
+    assert nice_ticks(0, 0) == pytest.approx([0, 0.2, 0.4, 0.6, 0.8, 1])
+
+def lines_of(drawing):
+    return [shape for shape in drawing.getContents() if isinstance(shape, PolyLine)]
+
+@pytest.mark.parametrize('series', [
+    MetricSeries([0, 3600, 7200], [40.0, 40.0, 40.0]),
+    MetricSeries([3600], [12.5])
+], ids=['flat', 'single-point'])
+def test_chart_of_degenerate_series(series):
+    drawing = create_chart_drawing(series, 'CPU Utilization', 'vm-1', series.average, series.min, series.max)
+
+    assert isinstance(drawing, Drawing)
+    points = lines_of(drawing)[0].points
+    assert len(points) == 2 * len(series)
+    # Every point lies inside the plot area
+    assert all(0 <= coordinate <= max(drawing.width, drawing.height) for coordinate in points)
+
+def test_chart_of_empty_series_has_no_data_line():
+    drawing = create_chart_drawing(MetricSeries([], []), 'Memory Utilization', 'vm-1', 0.0, 0.0, 0.0)
+
+    assert lines_of(drawing) == []
+    texts = [shape.text for shape in drawing.getContents() if hasattr(shape, 'text')]
+    assert 'No data available' in texts
+    assert 'Min: 0.00 GB | Max: 0.00 GB | Avg: 0.00 GB' in texts
+
+def test_vector_report_embeds_no_images(monkeypatch, tmp_path):
+    pytest.importorskip('matplotlib')
+    # Away from the page header's logo image
+    monkeypatch.chdir(tmp_path)
+    import report_generator
+
+    series = MetricSeries([0, 3600, 7200], [10.0, 20.0, 30.0])
+    resource = {'id': 'vm-1', 'name': 'VM-1', 'type': 'Standard_B2s', 'platform': 'Linux', 'state': 'running',
+                'region': 'eastus', 'service_type': 'VM', 'metrics': {'cpu': series}}
+    flowables = report_generator.render_chart_flowables(report_generator.collect_chart_jobs([resource]),
+                                                        chart_format='vector')
+    pdf = report_generator.generate_pdf_report('Test account', [resource], 'Azure', chart_format='vector')
+
+    assert [type(flowable) for flowable in flowables] == [Drawing]
+    assert pdf.startswith(b'%PDF-')
+    assert b'/Subtype /Image' not in pdf
@@ -0,0 +1,156 @@
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+from reportlab.graphics.shapes import Drawing, Group, Line, PolyLine, Rect, String
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+
+# Same look as the PNG charts, scaled from the 10-inch figure to 6.5 inches
+LINE_COLOR = colors.HexColor('#FF0066')
+AVERAGE_COLOR = colors.Color(1, 0, 0.4, alpha=0.5)
+GRID_COLOR = colors.Color(0.69, 0.69, 0.69, alpha=0.7)
+FONT = 'Helvetica'
+BOLD_FONT = 'Helvetica-Bold'
+
+# Plot area margins in points
+MARGIN_LEFT = 48
+MARGIN_RIGHT = 10
+MARGIN_TOP = 30
+MARGIN_BOTTOM = 40
+
+# Candidate x tick spacings in hours
+TICK_HOURS = [1, 3, 6, 12, 24, 48]
+
+def nice_ticks(low, high, target=6):
+    """Return round tick values covering [low, high], like matplotlib's MaxNLocator."""
+    if high <= low:
+        high = low + 1
+    raw_step = (high - low) / target
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw_step)
+    first = math.floor(low / step) * step
+    last = math.ceil(high / step) * step
+    count = int(round((last - first) / step))
+    return [first + i * step for i in range(count + 1)]
+
+def format_tick(value):
+    """Format a y tick without trailing zeros."""
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+def create_chart_drawing(series, metric_name, instance_name, avg, min_val, max_val,
+                         width=6.5 * inch, height=3 * inch):
+    """
+    Create the chart for a MetricSeries as a reportlab Drawing.
+
+    The chart is drawn with PDF vector operators instead of being rasterised,
+    so a line series costs a few KB in the PDF and renders sharply at any zoom.
+    """
+    drawing = Drawing(width, height)
+    plot_left = MARGIN_LEFT
+    plot_bottom = MARGIN_BOTTOM
+    plot_width = width - MARGIN_LEFT - MARGIN_RIGHT
+    plot_height = height - MARGIN_TOP - MARGIN_BOTTOM
+
+    # Check if the metric is memory or disk (where we use GB)
+    if 'gb' in metric_name.lower() or any(word in metric_name.lower() for word in ['memory', 'disk']):
+        unit = 'GB'
+    else:
+        unit = 'Percent'
+
+    # Title
+    if len(series):
+        start_time = series.start_datetime()
+        end_time = series.end_datetime()
+        subtitle = f"{start_time.strftime('%Y-%m-%d %H:%M')} to {end_time.strftime('%Y-%m-%d %H:%M')}"
+    else:
+        subtitle = 'No data available'
+    drawing.add(String(width / 2, height - 10, f'{instance_name}: {metric_name}',
+                       fontName=BOLD_FONT, fontSize=8, textAnchor='middle'))
+    drawing.add(String(width / 2, height - 20, subtitle, fontName=BOLD_FONT, fontSize=8, textAnchor='middle'))
+
+    # Axis ranges
+    if len(series):
+        x_low, x_high = int(series.timestamps[0]), int(series.timestamps[-1])
+        y_low, y_high = min(series.min, avg), max(series.max, avg)
+    else:
+        x_low, x_high = 0, 1
+        y_low, y_high = 0, 1
+    if x_high <= x_low:
+        x_high = x_low + 1
+    y_ticks = nice_ticks(y_low, y_high)
+    y_low, y_high = y_ticks[0], y_ticks[-1]
+
+    def x_pos(x):
+        return plot_left + (x - x_low) / (x_high - x_low) * plot_width
+
+    def y_pos(y):
+        return plot_bottom + (y - y_low) / (y_high - y_low) * plot_height
+
+    # Grid and y ticks
+    for tick in y_ticks:
+        y = y_pos(tick)
+        drawing.add(Line(plot_left, y, plot_left + plot_width, y, strokeColor=GRID_COLOR,
+                         strokeWidth=0.5, strokeDashArray=[2, 2]))
+        drawing.add(String(plot_left - 3, y - 2.5, format_tick(tick), fontName=FONT, fontSize=6.5,
+                           textAnchor='end'))
+
+    # Grid and x ticks on whole hours, spaced so at most ~10 are shown
+    if len(series):
+        span_hours = (x_high - x_low) / 3600
+        step_hours = next((h for h in TICK_HOURS if span_hours / h <= 10), TICK_HOURS[-1])
+        step = step_hours * 3600
+        tick = math.ceil(x_low / step) * step
+        label_format = '%H:%M' if step_hours < 24 else '%m-%d'
+        while tick <= x_high:
+            x = x_pos(tick)
+            drawing.add(Line(x, plot_bottom, x, plot_bottom + plot_height, strokeColor=GRID_COLOR,
+                             strokeWidth=0.5, strokeDashArray=[2, 2]))
+            label = datetime.fromtimestamp(tick, timezone.utc).strftime(label_format)
+            drawing.add(String(x, plot_bottom - 9, label, fontName=FONT, fontSize=6.5, textAnchor='middle'))
+            tick += step
+
+    # Data line and average line. Markers are left out: at this size they
+    # vanish under the line but would cost a path per datapoint.
+    if len(series):
+        points = np.empty(2 * len(series))
+        points[0::2] = x_pos(series.timestamps.astype(np.float64))
+        points[1::2] = y_pos(series.values)
+        drawing.add(PolyLine(points.tolist(), strokeColor=LINE_COLOR, strokeWidth=1.6, strokeLineJoin=1))
+        average_y = y_pos(avg)
+        drawing.add(Line(plot_left, average_y, plot_left + plot_width, average_y,
+                         strokeColor=AVERAGE_COLOR, strokeWidth=0.8))
+
+    # Plot frame
+    drawing.add(Rect(plot_left, plot_bottom, plot_width, plot_height, fillColor=None,
+                     strokeColor=colors.black, strokeWidth=0.6))
+
+    # Legend in the upper right corner
+    legend_x = plot_left + plot_width - 62
+    legend_y = plot_bottom + plot_height - 26
+    drawing.add(Rect(legend_x, legend_y, 58, 22, fillColor=colors.Color(1, 1, 1, alpha=0.8),
+                     strokeColor=colors.lightgrey, strokeWidth=0.5))
+    drawing.add(Line(legend_x + 4, legend_y + 15, legend_x + 18, legend_y + 15, strokeColor=LINE_COLOR,
+                     strokeWidth=1.6))
+    drawing.add(String(legend_x + 22, legend_y + 13, 'Average', fontName=FONT, fontSize=6.5))
+    drawing.add(Line(legend_x + 4, legend_y + 6, legend_x + 18, legend_y + 6, strokeColor=AVERAGE_COLOR,
+                     strokeWidth=0.8))
+    drawing.add(String(legend_x + 22, legend_y + 4, 'Average', fontName=FONT, fontSize=6.5))
+
+    # Axis labels
+    drawing.add(String(plot_left + plot_width / 2, plot_bottom - 20, 'Time', fontName=BOLD_FONT,
+                       fontSize=7, textAnchor='middle'))
+    y_label = Group(String(0, 0, f"{metric_name} ({unit})", fontName=BOLD_FONT, fontSize=7,
+                           textAnchor='middle'))
+    y_label.translate(12, plot_bottom + plot_height / 2)
+    y_label.rotate(90)
+    drawing.add(y_label)
+
+    # Add statistics
+    if unit == 'Percent':
+        stats_text = f"Min: {min_val:.2f}% | Max: {max_val:.2f}% | Avg: {avg:.2f}%"
+    else:
+        stats_text = f"Min: {min_val:.2f} GB | Max: {max_val:.2f} GB | Avg: {avg:.2f} GB"
+    drawing.add(String(width / 2, 4, stats_text, fontName=BOLD_FONT, fontSize=6.5, textAnchor='middle'))
+
+    return drawing
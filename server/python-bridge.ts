@@ -1,4 +1,5 @@
-import { exec } from 'child_process';
+import { exec, spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import * as readline from 'readline';
 import * as path from 'path';
 import * as os from 'os';
 import * as fs from 'fs/promises';
@@ -17,8 +18,191 @@ interface GenerateReportParams {
   outputFilename?: string;
 }
 
+// Number of report processes behind the persistent Python worker; when unset
+// the worker uses its own default (REPORT_WORKERS in app.py)
+const PYTHON_REPORT_WORKERS = process.env.PYTHON_REPORT_WORKERS;
+
+// Set PYTHON_WORKER_MODE=0 to fall back to one python3 process per report
+const USE_PYTHON_WORKER = process.env.PYTHON_WORKER_MODE !== '0';
+
+// Milliseconds a job may wait for the Python worker's answer before it is
+// failed and the worker, presumed hung, is restarted
+const PYTHON_WORKER_JOB_TIMEOUT_MS = parseInt(process.env.PYTHON_WORKER_JOB_TIMEOUT_MS || '900000', 10);
+
+// Response line written by `app.py --worker`
+interface WorkerResponse {
+  id: string | null;
+  success?: boolean;
+  output?: string;
+  error?: string;
+  status?: string;
+}
+
+interface PythonWorker {
+  child: ChildProcessWithoutNullStreams;
+  pending: Map<string, (response: WorkerResponse) => void>;
+}
+
+let pythonWorker: PythonWorker | null = null;
+
+// Start the long-running Python worker, or return the one already running.
+// Keeping it alive avoids re-importing boto3/matplotlib/reportlab per report
+// and lets the Python side reuse its client pools and caches.
+function getPythonWorker(): PythonWorker {
+  if (pythonWorker) {
+    return pythonWorker;
+  }
+
+  const pythonScript = path.join(process.cwd(), 'python-backend', 'app.py');
+  const args = [pythonScript, '--worker'];
+  if (PYTHON_REPORT_WORKERS) {
+    args.push('--workers', String(parseInt(PYTHON_REPORT_WORKERS, 10)));
+  }
+  // Its own process group, so a restart also stops its report processes
+  const child = spawn('python3', args, { detached: process.platform !== 'win32' });
+  const worker: PythonWorker = { child, pending: new Map() };
+
+  readline.createInterface({ input: child.stdout }).on('line', (line) => {
+    let response: WorkerResponse;
+    try {
+      response = JSON.parse(line);
+    } catch (e) {
+      console.warn(`Python worker output: ${line}`);
+      return;
+    }
+
+    const resolve = response.id ? worker.pending.get(response.id) : undefined;
+    if (resolve && response.id) {
+      worker.pending.delete(response.id);
+      resolve(response);
+    } else {
+      console.warn(`Python worker response without a pending job: ${line}`);
+    }
+  });
+
+  child.stderr.on('data', (data) => {
+    console.warn(`Python stderr: ${data}`);
+  });
+
+  const fail = (reason: string) => {
+    if (pythonWorker === worker) {
+      pythonWorker = null;
+    }
+    for (const [id, resolve] of Array.from(worker.pending.entries())) {
+      resolve({ id, success: false, error: reason });
+    }
+    worker.pending.clear();
+  };
+
+  child.stdin.on('error', (err) => {
+    // Writing to a worker that just died; its exit handler fails the jobs
+    console.error(`Python worker stdin error: ${err.message}`);
+  });
+
+  child.on('error', (err) => {
+    console.error(`Python worker error: ${err.message}`);
+    fail(err.message);
+  });
+
+  child.on('exit', (code, signal) => {
+    console.error(`Python worker exited with ${code ?? signal}`);
+    fail(`Python worker exited with ${code ?? signal}`);
+  });
+
+  pythonWorker = worker;
+  return worker;
+}
+
+// Kill a worker that stopped answering; its exit handler fails its other
+// jobs and the next job starts a new worker
+function restartPythonWorker(worker: PythonWorker) {
+  if (pythonWorker === worker) {
+    pythonWorker = null;
+  }
+  try {
+    if (process.platform !== 'win32' && worker.child.pid) {
+      process.kill(-worker.child.pid, 'SIGKILL');
+    } else {
+      worker.child.kill('SIGKILL');
+    }
+  } catch (err: any) {
+    console.error(`Failed to stop Python worker: ${err.message}`);
+  }
+}
+
+// Send one job to the Python worker and wait for its response line, for at
+// most PYTHON_WORKER_JOB_TIMEOUT_MS
+function sendWorkerJob(job: Record<string, unknown>): Promise<WorkerResponse> {
+  const worker = getPythonWorker();
+  const id = crypto.randomBytes(8).toString('hex');
+
+  return new Promise((resolve) => {
+    const timer = setTimeout(() => {
+      if (!worker.pending.delete(id)) {
+        return;
+      }
+      const error = `Python worker did not answer within ${PYTHON_WORKER_JOB_TIMEOUT_MS / 1000}s`;
+      console.error(`${error}; restarting it`);
+      resolve({ id, success: false, error });
+      restartPythonWorker(worker);
+    }, PYTHON_WORKER_JOB_TIMEOUT_MS);
+
+    worker.pending.set(id, (response) => {
+      clearTimeout(timer);
+      resolve(response);
+    });
+    worker.child.stdin.write(JSON.stringify({ ...job, id }) + '\n');
+  });
+}
+
+// Create the output directory and pick the output path of a report
+async function getOutputPath(params: GenerateReportParams): Promise<string> {
+  const outputDir = path.join(process.cwd(), 'output');
+  try {
+    await fs.mkdir(outputDir, { recursive: true });
+  } catch (err) {
+    // Directory might already exist, ignore this error
+  }
+
+  return path.join(outputDir, params.outputFilename || `report_${Date.now()}_${crypto.randomBytes(4).toString('hex')}.pdf`);
+}
+
 // Main function to generate a report using Python backend
 export async function generateReport(params: GenerateReportParams): Promise<{ success: boolean; filePath?: string; error?: string }> {
+  if (!USE_PYTHON_WORKER) {
+    return generateReportInSubprocess(params);
+  }
+
+  try {
+    const outputPath = await getOutputPath(params);
+
+    // Parameters, including credentials, travel over the worker's stdin
+    // instead of a temporary file
+    const response = await sendWorkerJob({ params, output: outputPath });
+
+    if (!response.success) {
+      console.error(`Python worker error: ${response.error}`);
+      return { success: false, error: response.error || 'Report generation failed' };
+    }
+
+    try {
+      // Check if the output file was created
+      await fs.access(outputPath);
+      return { success: true, filePath: outputPath };
+    } catch (accessErr) {
+      return {
+        success: false,
+        error: 'Report generation failed: Output file not created'
+      };
+    }
+  } catch (err: any) {
+    console.error('Error in generate report bridge:', err);
+    return { success: false, error: err.message };
+  }
+}
+
+// Generate a report by running one python3 process for it
+async function generateReportInSubprocess(params: GenerateReportParams): Promise<{ success: boolean; filePath?: string; error?: string }> {
   try {
     // Create a temporary directory for storing credentials safely
     const tempDir = await fs.mkdtemp(path.join(os.tmpdir(), 'cloud-report-'));
@@ -27,17 +211,9 @@ export async function generateReport(params: GenerateReportParams): Promise<{ su
     const paramsPath = path.join(tempDir, 'params.json');
     await fs.writeFile(paramsPath, JSON.stringify(params), 'utf8');
     
-    // Create output directory if it doesn't exist
-    const outputDir = path.join(process.cwd(), 'output');
-    try {
-      await fs.mkdir(outputDir, { recursive: true });
-    } catch (err) {
-      // Directory might already exist, ignore this error
-    }
-    
     // Execute Python script
     const pythonScript = path.join(process.cwd(), 'python-backend', 'app.py');
-    const outputPath = path.join(outputDir, params.outputFilename || `report_${Date.now()}_${crypto.randomBytes(4).toString('hex')}.pdf`);
+    const outputPath = await getOutputPath(params);
     
     return new Promise((resolve, reject) => {
       exec(
@@ -83,6 +259,14 @@ export async function generateReport(params: GenerateReportParams): Promise<{ su
 
 // Function to call Python API directly for testing
 export async function testPythonBackend(): Promise<{ status: string }> {
+  if (USE_PYTHON_WORKER) {
+    const response = await sendWorkerJob({ command: 'test' });
+    if (!response.status) {
+      throw new Error(response.error || 'Python worker is not running');
+    }
+    return { status: response.status };
+  }
+
   return new Promise((resolve, reject) => {
     exec('python3 python-backend/app.py --test', (error, stdout, stderr) => {
       if (error) {